@@ -2,13 +2,21 @@
 ACQC Demo - Entry Point
 
 Run with: python -m acqc_demo
+Streaming mode: python -m acqc_demo stream
+Load-test data: python -m acqc_demo generate
+Backtest: python -m acqc_demo backtest ./output/data/shards
+KPI report: python -m acqc_demo evaluate ./output/predictions.jsonl --lab lab_results.jsonl
 """
 
 import argparse
+import asyncio
+import json
+import os
 import sys
-from dataclasses import asdict
+import time
 from pathlib import Path
 
+from acqc_demo import instrument, serialize
 from acqc_demo.data_gen import generate_demo_dataset
 from acqc_demo.infer import SoftSensor, save_predictions
 from acqc_demo.trace import AuditLog
@@ -32,28 +40,248 @@ def main() -> int:
         default=Path("./output"),
         help="Output directory (default: ./output)",
     )
+    parser.add_argument(
+        "--seed",
+        type=int,
+        default=None,
+        help="Random seed for reproducible data (default: unseeded)",
+    )
+    parser.add_argument(
+        "--dataset-format",
+        choices=("json", "binary"),
+        default="json",
+        help="Format of the saved dataset: dataset.json or memory-mappable dataset.acqc (default: json)",
+    )
+    parser.add_argument(
+        "--output-format",
+        choices=serialize.FORMATS,
+        default="json",
+        help=(
+            "Format of predictions and audit log: indented json, compact json, ndjson "
+            "(one record per line) or binary (predictions.acqc, audit log as ndjson) "
+            "(default: json)"
+        ),
+    )
+    parser.add_argument(
+        "--audit-stream",
+        action="store_true",
+        help="Append audit entries to a rotating JSONL log as they are logged",
+    )
+    parser.add_argument(
+        "--metrics",
+        type=Path,
+        default=None,
+        help="Record per-stage latency spans and write them here (.prom: Prometheus text, else JSON)",
+    )
     parser.add_argument(
         "-v", "--verbose",
         action="store_true",
         help="Verbose output",
     )
     
+    subparsers = parser.add_subparsers(dest="command")
+    stream = subparsers.add_parser(
+        "stream",
+        help="Run the online streaming inference service",
+    )
+    stream.add_argument(
+        "--replay",
+        type=Path,
+        default=None,
+        help="Replay a dataset.json, dataset.acqc or JSONL tag records (default: generated demo data)",
+    )
+    stream.add_argument(
+        "--port",
+        type=int,
+        default=None,
+        help="Listen for JSONL tag records on this TCP port instead of replaying",
+    )
+    stream.add_argument(
+        "--speed",
+        type=float,
+        default=None,
+        help="Replay speed relative to real time (default: as fast as possible)",
+    )
+    stream.add_argument(
+        "--tick",
+        type=float,
+        default=1.0,
+        help="Tick interval in seconds (default: 1.0)",
+    )
+    stream.add_argument(
+        "--max-batch",
+        type=int,
+        default=512,
+        help="Maximum updates per micro-batch (default: 512)",
+    )
+    stream.add_argument(
+        "--max-queue",
+        type=int,
+        default=10_000,
+        help="Update queue bound for backpressure (default: 10000)",
+    )
+    stream.add_argument(
+        "--metrics-port",
+        type=int,
+        default=None,
+        help="Serve latency metrics at http://127.0.0.1:PORT/metrics while running",
+    )
+    stream.add_argument(
+        "--model-dir",
+        type=Path,
+        default=None,
+        help="Serve the newest model artifact of this directory, hot-swapping new ones",
+    )
+    stream.add_argument(
+        "--shadow",
+        action="store_true",
+        help="With --model-dir: evaluate new models in shadow mode instead of activating them",
+    )
+    
+    generate = subparsers.add_parser(
+        "generate",
+        help="Generate a large sharded synthetic dataset (binary shards) for load tests",
+    )
+    generate.add_argument(
+        "--tags",
+        type=int,
+        default=4,
+        help="Number of tags (default: 4)",
+    )
+    generate.add_argument(
+        "--shard-rows",
+        type=int,
+        default=100_000,
+        help="Samples per shard (default: 100000)",
+    )
+    generate.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Processes generating shards in parallel (default: 1)",
+    )
+    generate.add_argument(
+        "--compress",
+        action="store_true",
+        help="zlib-compress the shards",
+    )
+    
+    backtest = subparsers.add_parser(
+        "backtest",
+        help="Re-score historical data through a model in parallel chunks",
+    )
+    backtest.add_argument(
+        "input",
+        type=Path,
+        help="dataset.acqc, dataset.json or a directory of .acqc shards",
+    )
+    backtest.add_argument(
+        "--model",
+        type=Path,
+        default=None,
+        help="ModelConfig artifact to score (default: baseline model)",
+    )
+    backtest.add_argument(
+        "--start",
+        default=None,
+        help="Start of the time range, ISO 8601 (default: first sample)",
+    )
+    backtest.add_argument(
+        "--end",
+        default=None,
+        help="End of the time range (exclusive), ISO 8601 (default: last sample)",
+    )
+    backtest.add_argument(
+        "--chunk-rows",
+        type=int,
+        default=50_000,
+        help="Rows per parallel task (default: 50000)",
+    )
+    backtest.add_argument(
+        "--workers",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="Processes scoring chunks in parallel (default: CPU count)",
+    )
+    backtest.add_argument(
+        "--tolerance",
+        type=float,
+        default=None,
+        help="Maximum age in seconds of the prediction paired with a lab value (default: none)",
+    )
+    
+    evaluate = subparsers.add_parser(
+        "evaluate",
+        help="KPI report of saved predictions against lab results (ssot/kpi_acceptance.csv)",
+    )
+    evaluate.add_argument(
+        "predictions",
+        type=Path,
+        help="Predictions saved by the demo (.acqc, .jsonl or .json)",
+    )
+    evaluate.add_argument(
+        "--lab",
+        type=Path,
+        required=True,
+        help="Lab results (JSONL/JSON per schemas/lab_result.schema.json) or a dataset .acqc with quality",
+    )
+    evaluate.add_argument(
+        "--window",
+        type=float,
+        default=60.0,
+        help="Process window in seconds matching each lab result (default: 60)",
+    )
+    evaluate.add_argument(
+        "--delay",
+        type=float,
+        default=0.0,
+        help="Transport delay in seconds between process and sampling point (default: 0)",
+    )
+    evaluate.add_argument(
+        "--bucket",
+        type=float,
+        default=86_400.0,
+        help="Report bucket width in seconds (default: 86400, daily)",
+    )
+    evaluate.add_argument(
+        "--kpi",
+        type=Path,
+        default=None,
+        help="KPI acceptance CSV (default: kpi_acceptance.csv in ssot/ or $ACQC_SSOT_DIR)",
+    )
+    
     args = parser.parse_args()
+    if args.metrics is not None:
+        instrument.enable()
+    
+    if args.command == "stream":
+        return run_stream(args)
+    if args.command == "generate":
+        return run_generate(args)
+    if args.command == "backtest":
+        return run_backtest(args)
+    if args.command == "evaluate":
+        return run_evaluate(args)
     
     print("=" * 60)
     print("ACQC Demo - Soft Sensor Inference Skeleton")
     print("=" * 60)
     print()
     
+    start_ns = time.perf_counter_ns()
+    
     # Step 1: Generate synthetic data
     print("[1/4] Generating synthetic data...")
     dataset = generate_demo_dataset(
         n_samples=args.samples,
         output_dir=args.output / "data",
+        columnar=True,
+        dataset_format=args.dataset_format,
+        seed=args.seed,
     )
-    print(f"      Generated {dataset['metadata']['n_samples']} samples")
-    print(f"      Tags: {', '.join(dataset['metadata']['tags'])}")
-    print(f"      Data hash: {dataset['metadata']['hash']}")
+    print(f"      Generated {dataset.metadata['n_samples']} samples")
+    print(f"      Tags: {', '.join(dataset.metadata['tags'])}")
+    print(f"      Data hash: {dataset.metadata['hash']}")
     print()
     
     # Step 2: Initialize soft sensor
@@ -68,33 +296,40 @@ def main() -> int:
     print("[3/4] Running inference...")
     predictions = sensor.predict_batch(dataset)
     
-    n_ok = sum(1 for p in predictions if p.status == "OK")
-    n_degraded = sum(1 for p in predictions if p.status == "DEGRADED")
-    n_ood = sum(1 for p in predictions if p.status == "OOD")
+    counts = predictions.status_counts()
     
     print(f"      Total predictions: {len(predictions)}")
-    print(f"      OK: {n_ok}, DEGRADED: {n_degraded}, OOD: {n_ood}")
+    print(f"      OK: {counts['OK']}, DEGRADED: {counts['DEGRADED']}, OOD: {counts['OOD']}")
     
     # Save predictions
-    save_predictions(predictions, args.output / "predictions.json")
-    print(f"      Saved to: {args.output / 'predictions.json'}")
+    predictions_path = save_predictions(
+        predictions,
+        args.output / f"predictions{serialize.SUFFIXES[args.output_format]}",
+        fmt=args.output_format,
+    )
+    print(f"      Saved to: {predictions_path}")
     print()
     
     # Step 4: Generate audit log
     print("[4/4] Generating audit log...")
-    audit = AuditLog(log_dir=args.output / "audit")
+    if args.audit_stream:
+        audit = AuditLog.streaming(log_dir=args.output / "audit")
+    else:
+        audit = AuditLog(log_dir=args.output / "audit")
     
-    for pred in predictions:
+    for i in range(len(predictions)):
+        prediction = predictions.row(i)
+        # Each entry hashes only the input row it was predicted from
         audit.log_prediction(
-            prediction=asdict(pred),
-            input_data={"tags": dataset["tags"]},
+            prediction=prediction,
+            input_data={"timestamp": prediction["timestamp"], "tags": dataset.row(i)},
             model_hash=sensor.model_hash,
         )
         
-        if pred.status == "OK":
+        if prediction["status"] == "OK":
             audit.log_recommendation(
                 recommendation="Continue current operation (within spec)",
-                prediction=asdict(pred),
+                prediction=prediction,
                 constraints=["y_hat in [88, 95]"],
                 model_hash=sensor.model_hash,
             )
@@ -107,7 +342,9 @@ def main() -> int:
         notes="Demo run - auto-accepted",
     )
     
-    log_path = audit.save()
+    log_path = audit.save(fmt="ndjson" if args.output_format == "binary" else args.output_format)
+    audit.close()
+    instrument.record("end_to_end", time.perf_counter_ns() - start_ns)
     print(f"      Entries: {audit.summary()}")
     print(f"      Saved to: {log_path}")
     print()
@@ -118,9 +355,12 @@ def main() -> int:
     print("=" * 60)
     print()
     print("Output files:")
-    print(f"  - {args.output / 'data' / 'dataset.json'}")
-    print(f"  - {args.output / 'predictions.json'}")
+    dataset_file = "dataset.acqc" if args.dataset_format == "binary" else "dataset.json"
+    print(f"  - {args.output / 'data' / dataset_file}")
+    print(f"  - {predictions_path}")
     print(f"  - {log_path}")
+    if args.metrics is not None:
+        print(f"  - {instrument.write_metrics(args.metrics)}")
     print()
     
     if args.verbose:
@@ -131,5 +371,176 @@ def main() -> int:
     return 0
 
 
+def run_stream(args: argparse.Namespace) -> int:
+    """Run the streaming service until the source ends (or Ctrl+C)."""
+    from acqc_demo.hotswap import ModelWatcher
+    from acqc_demo.stream import StreamingService, replay_dataset, replay_file, socket_source
+    
+    print("=" * 60)
+    print("ACQC Demo - Streaming Soft Sensor Service")
+    print("=" * 60)
+    print()
+    
+    watcher = None
+    if args.model_dir is not None:
+        watcher = ModelWatcher(
+            args.model_dir,
+            shadow=args.shadow,
+            on_swap=lambda old, new: print(f"Model swap: {old.model_hash} -> {new.model_hash}"),
+        )
+        print(f"Watching models in {args.model_dir} (active: {watcher.active.model_hash})")
+        watcher.start()
+    service = StreamingService(
+        sensors=[watcher or SoftSensor()],
+        max_queue=args.max_queue,
+        max_batch=args.max_batch,
+        tick_interval=args.tick,
+    )
+    
+    if args.port is not None:
+        source = socket_source(
+            port=args.port,
+            on_listening=lambda port: print(f"Listening for tag records on port {port}"),
+        )
+    elif args.replay is not None:
+        print(f"Replaying: {args.replay}")
+        source = replay_file(args.replay, speed=args.speed)
+    else:
+        print(f"Replaying {args.samples} generated samples")
+        dataset = generate_demo_dataset(args.samples, columnar=True, seed=args.seed)
+        source = replay_dataset(dataset, args.speed)
+    
+    server = None
+    if args.metrics_port is not None:
+        instrument.enable()
+        server = instrument.serve(args.metrics_port)
+        print(f"Metrics at http://127.0.0.1:{args.metrics_port}/metrics")
+    
+    try:
+        asyncio.run(service.run(source))
+    except KeyboardInterrupt:
+        print("Interrupted")
+    finally:
+        if server is not None:
+            server.shutdown()
+        if watcher is not None:
+            watcher.stop()
+    
+    print()
+    print(json.dumps(service.stats.summary(), indent=2))
+    if watcher is not None:
+        print(json.dumps(watcher.status(), indent=2))
+    if args.metrics is not None:
+        print(f"Metrics: {instrument.write_metrics(args.metrics)}")
+    return 0
+
+
+def run_generate(args: argparse.Namespace) -> int:
+    """Generate sharded load-test data under <output>/data/shards."""
+    from acqc_demo.data_gen import generate_sharded_dataset
+    
+    output_dir = args.output / "data" / "shards"
+    seed = 0 if args.seed is None else args.seed
+    print(f"Generating {args.samples} samples x {args.tags} tags (seed {seed}) into {output_dir}")
+    start = time.perf_counter()
+    manifest = generate_sharded_dataset(
+        output_dir,
+        n_samples=args.samples,
+        n_tags=args.tags,
+        seed=seed,
+        shard_rows=args.shard_rows,
+        workers=args.workers,
+        compress=args.compress,
+    )
+    elapsed = time.perf_counter() - start
+    print(f"  Shards: {len(manifest['shards'])}")
+    print(f"  Dataset hash: {manifest['hash']}")
+    print(f"  Elapsed: {elapsed:.1f} s ({args.samples * args.tags / elapsed:,.0f} values/s)")
+    return 0
+
+
+def run_backtest(args: argparse.Namespace) -> int:
+    """Re-score a historical range and report errors against lab values."""
+    from acqc_demo.backtest import run_backtest as backtest
+    from acqc_demo.infer import load_model_config
+    
+    config = load_model_config(args.model) if args.model is not None else None
+    output_dir = args.output / "backtest"
+    print(f"Backtest of {args.input} with {args.workers} worker(s)")
+    result = backtest(
+        [args.input],
+        config,
+        start=args.start,
+        end=args.end,
+        chunk_rows=args.chunk_rows,
+        workers=args.workers,
+        tolerance_ns=None if args.tolerance is None else int(args.tolerance * 1e9),
+    )
+    
+    fmt = args.output_format
+    predictions_path = save_predictions(
+        result.predictions, output_dir / f"predictions{serialize.SUFFIXES[fmt]}", fmt=fmt
+    )
+    summary = result.summary()
+    summary_path = output_dir / "summary.json"
+    with open(summary_path, "w") as f:
+        json.dump(summary, f, indent=2)
+    
+    print(json.dumps(summary, indent=2))
+    print(f"Predictions: {predictions_path}")
+    print(f"Summary: {summary_path}")
+    return 0
+
+
+def run_evaluate(args: argparse.Namespace) -> int:
+    """KPI report of saved predictions; exit code 1 when a KPI fails."""
+    from acqc_demo.evaluate import (
+        Evaluator,
+        iter_lab_results,
+        iter_prediction_batches,
+        load_kpi_thresholds,
+    )
+    from acqc_demo.storage import BinaryDataset
+    
+    ns = 1_000_000_000
+    if args.lab.suffix == ".acqc":
+        lab_data = BinaryDataset(args.lab).select()
+        if lab_data.quality is None:
+            print(f"No quality column in {args.lab}")
+            return 1
+        lab_results = zip(lab_data.quality_timestamps, lab_data.quality)
+    else:
+        lab_results = iter_lab_results(args.lab)
+    batches = iter_prediction_batches(args.predictions)
+    first = next(batches, None)
+    evaluator = Evaluator(
+        lab_results,
+        window_ns=int(args.window * ns),
+        delay_ns=int(args.delay * ns),
+        bucket_ns=int(args.bucket * ns),
+        variable_id=first.variable_id if first is not None else None,
+    )
+    if first is not None:
+        evaluator.update(first)
+    for batch in batches:
+        evaluator.update(batch)
+    evaluator.finish()
+    report = evaluator.report(load_kpi_thresholds(args.kpi))
+    
+    output_path = args.output / "evaluation" / "kpi_report.json"
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(output_path, "w") as f:
+        json.dump(report, f, indent=2)
+    
+    metrics = report["metrics"]
+    print(f"Predictions: {metrics['n_predictions']}, lab pairs: {metrics['n_pairs']} "
+          f"(unpaired: {metrics['n_unpaired']})")
+    for kpi in report["kpis"]:
+        value = "-" if kpi["value"] is None else f"{kpi['value']:.4g}"
+        print(f"  {kpi['kpi_id']} {kpi['metric']:<22} {value:>10}  {kpi['threshold']:<18} {kpi['status']}")
+    print(f"Report: {output_path}")
+    return 1 if any(kpi["status"] == "fail" for kpi in report["kpis"]) else 0
+
+
 if __name__ == "__main__":
     sys.exit(main())
@@ -0,0 +1,449 @@
+"""
+Alignment module for ACQC demo.
+
+Puts asynchronous tag series (e.g. 1 Hz DCS tags and 0.2 Hz NIR features,
+see ssot/tag_dictionary_template.csv) and late lab results on a common
+time base:
+- As-of joins (backward / forward / nearest) with a staleness tolerance
+- Resampling to a regular grid: last value, window mean, interpolation
+- Lab-to-process window matching (lab ts_sampled vs. process history)
+- StreamingAligner: the same resampling, incrementally over chunks
+
+Every operation is a merge of sorted int64 epoch-ns timestamp arrays:
+each lookup bisects forward from the previous position, so cost grows
+with the number of samples instead of their product.
+"""
+
+from array import array
+from bisect import bisect_left, bisect_right
+from dataclasses import dataclass, field
+from typing import Any, Iterable
+
+from acqc_demo.dataset import ColumnarDataset, QC_BAD, QC_OK
+from acqc_demo.instrument import timed
+from acqc_demo.tags import TagInfo
+
+
+_NAN = float("nan")
+
+METHODS = ("last", "mean", "interpolate")
+
+
+@dataclass
+class TagSeries:
+    """Samples of one tag on its own time base (timestamps sorted ascending)."""
+    timestamps: array = field(default_factory=lambda: array("q"))  # int64 epoch ns
+    values: array = field(default_factory=lambda: array("d"))  # float64
+    qc_flags: array = field(default_factory=lambda: array("B"))  # uint8 QC code
+    unit: str = ""
+    
+    def __len__(self) -> int:
+        return len(self.timestamps)
+    
+    def extend(self, timestamps: Iterable[int], values: Iterable[float], qc_flags: Iterable[int]) -> None:
+        self.timestamps.extend(timestamps)
+        self.values.extend(values)
+        self.qc_flags.extend(qc_flags)
+    
+    def ok_samples(self) -> "TagSeries":
+        """Samples with QC OK and a non-NaN value."""
+        keep = [i for i, (v, q) in enumerate(zip(self.values, self.qc_flags)) if q == QC_OK and v == v]
+        return TagSeries(
+            timestamps=array("q", [self.timestamps[i] for i in keep]),
+            values=array("d", [self.values[i] for i in keep]),
+            qc_flags=array("B", bytes(len(keep))),
+            unit=self.unit,
+        )
+
+
+def series_from_dataset(dataset: ColumnarDataset) -> dict[str, TagSeries]:
+    """Split a ColumnarDataset into per-tag series (sharing its arrays)."""
+    return {
+        tag_id: TagSeries(dataset.timestamps, *dataset.column(tag_id), dataset.units.get(tag_id, ""))
+        for tag_id in dataset.tag_ids
+    }
+
+
+def make_grid(start_ns: int, end_ns: int, interval_ns: int) -> array:
+    """Regular grid of timestamps in [start_ns, end_ns)."""
+    return array("q", range(start_ns, end_ns, interval_ns))
+
+
+def asof_indices(
+    left: Any,
+    right: Any,
+    tolerance_ns: int | None = None,
+    direction: str = "backward",
+) -> array:
+    """
+    As-of join of two sorted timestamp arrays.
+    
+    For every timestamp in `left`, the index of the matching sample in
+    `right`, or -1 when there is none within `tolerance_ns`:
+    - backward: last right timestamp <= left timestamp
+    - forward: first right timestamp >= left timestamp
+    - nearest: closest of the two (ties go backward)
+    
+    The indices can gather any per-sample payload (values, QC flags,
+    PAT spectra, ...).
+    """
+    if direction not in ("backward", "forward", "nearest"):
+        raise ValueError(f"Unknown as-of direction: {direction}")
+    out = array("q", [-1]) * len(left)
+    n = len(right)
+    pos = 0
+    for k, t in enumerate(left):
+        if direction == "forward":
+            pos = bisect_left(right, t, pos)
+            j = pos if pos < n else -1
+        else:
+            pos = bisect_right(right, t, pos)
+            j = pos - 1
+            if direction == "nearest" and pos < n and (j < 0 or right[pos] - t < t - right[j]):
+                j = pos
+        if j >= 0 and (tolerance_ns is None or abs(right[j] - t) <= tolerance_ns):
+            out[k] = j
+    return out
+
+
+def take(series: TagSeries, indices: array) -> tuple[array, array]:
+    """Gather (values, qc_flags) at as-of indices; -1 gives NaN with QC BAD."""
+    values, qc_flags = series.values, series.qc_flags
+    return (
+        array("d", [values[j] if j >= 0 else _NAN for j in indices]),
+        array("B", [qc_flags[j] if j >= 0 else QC_BAD for j in indices]),
+    )
+
+
+def resample(
+    series: TagSeries,
+    grid: Any,
+    method: str = "last",
+    tolerance_ns: int | None = None,
+    window_ns: int | None = None,
+) -> tuple[array, array]:
+    """
+    Resample a tag series onto grid timestamps.
+    
+    Args:
+        method: "last" (as-of backward, keeps the sample's QC flag),
+            "mean" (mean of OK samples in (t - window_ns, t]) or
+            "interpolate" (linear between the OK samples around t)
+        tolerance_ns: Maximum age of a "last" sample, or distance of each
+            "interpolate" neighbour (None: unlimited)
+        window_ns: Averaging window of "mean" (default: grid spacing)
+    
+    Returns:
+        (values, qc_flags); grid points without data are NaN with QC BAD
+    """
+    if method == "last":
+        return take(series, asof_indices(grid, series.timestamps, tolerance_ns))
+    
+    if method == "mean":
+        if window_ns is None:
+            window_ns = grid[1] - grid[0] if len(grid) > 1 else 1
+        ts, values, qc_flags = series.timestamps, series.values, series.qc_flags
+        out_values = array("d", [_NAN]) * len(grid)
+        out_qc = array("B", [QC_BAD]) * len(grid)
+        lo = hi = 0
+        for k, t in enumerate(grid):
+            lo = bisect_right(ts, t - window_ns, lo)
+            hi = bisect_right(ts, t, max(lo, hi))
+            ok = [v for v, q in zip(values[lo:hi], qc_flags[lo:hi]) if q == QC_OK and v == v]
+            if ok:
+                out_values[k] = sum(ok) / len(ok)
+                out_qc[k] = QC_OK
+        return out_values, out_qc
+    
+    if method == "interpolate":
+        ok = series.ok_samples()
+        ts, values = ok.timestamps, ok.values
+        before = asof_indices(grid, ts, tolerance_ns, "backward")
+        after = asof_indices(grid, ts, tolerance_ns, "forward")
+        out_values = array("d", [_NAN]) * len(grid)
+        out_qc = array("B", [QC_BAD]) * len(grid)
+        for k, (t, i, j) in enumerate(zip(grid, before, after)):
+            if i < 0 or j < 0:
+                continue
+            if i == j:
+                out_values[k] = values[i]
+            else:
+                out_values[k] = values[i] + (values[j] - values[i]) * (t - ts[i]) / (ts[j] - ts[i])
+            out_qc[k] = QC_OK
+        return out_values, out_qc
+    
+    raise ValueError(f"Unknown resampling method: {method}")
+
+
+def default_tolerances(
+    tag_ids: Iterable[str],
+    dictionary: dict[str, TagInfo],
+    missed_samples: float = 2.0,
+) -> dict[str, int]:
+    """
+    Staleness tolerance per tag from the tag dictionary: a value expires
+    after `missed_samples` sampling intervals (tags without a sampling
+    frequency are not limited).
+    """
+    tolerances = {}
+    for tag_id in tag_ids:
+        info = dictionary.get(tag_id)
+        interval = info.sampling_interval_ns if info else None
+        if interval is not None:
+            tolerances[tag_id] = round(interval * missed_samples)
+    return tolerances
+
+
+@timed("align")
+def align_to_grid(
+    series: dict[str, TagSeries],
+    grid: Any,
+    method: str = "last",
+    tolerances: dict[str, int] | int | None = None,
+    window_ns: int | None = None,
+) -> ColumnarDataset:
+    """
+    Resample several tags onto one grid as a ColumnarDataset.
+    
+    Args:
+        tolerances: Tolerance for all tags, or per tag_id (see
+            default_tolerances); missing entries are unlimited
+    """
+    values, qc_flags = {}, {}
+    for tag_id, s in series.items():
+        tol = tolerances.get(tag_id) if isinstance(tolerances, dict) else tolerances
+        values[tag_id], qc_flags[tag_id] = resample(s, grid, method, tol, window_ns)
+    return ColumnarDataset(
+        timestamps=array("q", grid),
+        values=values,
+        qc_flags=qc_flags,
+        units={tag_id: s.unit for tag_id, s in series.items()},
+        metadata={"alignment": method},
+    )
+
+
+def match_lab_windows(
+    lab_timestamps: Any,
+    process_timestamps: Any,
+    window_ns: int,
+    delay_ns: int = 0,
+) -> tuple[array, array]:
+    """
+    Process samples matching each lab sample.
+    
+    A lab result sampled at t (ts_sampled, not ts_reported) matches the
+    process samples in (t - delay_ns - window_ns, t - delay_ns], where
+    delay_ns is the transport delay between the process measurement and
+    the sampling point.
+    
+    Returns:
+        (starts, stops) index ranges into the process timestamps
+    """
+    starts = array("q", bytes(8 * len(lab_timestamps)))
+    stops = array("q", bytes(8 * len(lab_timestamps)))
+    lo = hi = 0
+    for k, t in enumerate(lab_timestamps):
+        end = t - delay_ns
+        lo = bisect_right(process_timestamps, end - window_ns, lo)
+        hi = bisect_right(process_timestamps, end, max(lo, hi))
+        starts[k], stops[k] = lo, hi
+    return starts, stops
+
+
+def window_means(
+    values: Any,
+    qc_flags: Any,
+    starts: array,
+    stops: array,
+) -> tuple[array, array]:
+    """Mean of the OK samples in each [start, stop) range, and their count."""
+    means = array("d", [_NAN]) * len(starts)
+    counts = array("q", bytes(8 * len(starts)))
+    for k, (lo, hi) in enumerate(zip(starts, stops)):
+        ok = [v for v, q in zip(values[lo:hi], qc_flags[lo:hi]) if q == QC_OK and v == v]
+        if ok:
+            means[k] = sum(ok) / len(ok)
+            counts[k] = len(ok)
+    return means, counts
+
+
+@timed("align")
+def lab_window_dataset(
+    dataset: ColumnarDataset,
+    lab_timestamps: Any,
+    lab_values: Any,
+    window_ns: int,
+    delay_ns: int = 0,
+    variable_id: str | None = None,
+    unit: str | None = None,
+) -> ColumnarDataset:
+    """
+    Training pairs: one row per lab result, with each tag averaged over the
+    process window matching it (rows without OK samples are NaN/BAD).
+    """
+    starts, stops = match_lab_windows(lab_timestamps, dataset.timestamps, window_ns, delay_ns)
+    values, qc_flags = {}, {}
+    for tag_id in dataset.tag_ids:
+        means, counts = window_means(*dataset.column(tag_id), starts, stops)
+        values[tag_id] = means
+        qc_flags[tag_id] = array("B", [QC_OK if c else QC_BAD for c in counts])
+    timestamps = array("q", lab_timestamps)
+    return ColumnarDataset(
+        timestamps=timestamps,
+        values=values,
+        qc_flags=qc_flags,
+        units=dict(dataset.units),
+        metadata={"alignment": "lab_window", "window_ns": window_ns, "delay_ns": delay_ns},
+        quality=array("d", lab_values),
+        quality_timestamps=timestamps,
+        quality_variable=variable_id or dataset.quality_variable,
+        quality_unit=unit or dataset.quality_unit,
+        quality_source="LAB",
+    )
+
+
+class _TagBuffer:
+    """Unemitted tail of one tag in a StreamingAligner."""
+    
+    def __init__(self, unit: str):
+        self.series = TagSeries(unit=unit)
+        self.last_ns: int | None = None
+        self.last_ok_ns: int | None = None
+
+
+class StreamingAligner:
+    """
+    Incremental resampling of tag chunks onto a regular grid.
+    
+    Chunks are pushed per tag as they arrive (timestamps strictly
+    increasing per tag). emit() returns the grid rows that can no longer
+    change, i.e. the same rows align_to_grid() would give on the complete
+    series, and drops the samples no later row needs, so memory stays
+    bounded for unbounded streams.
+    
+    Args:
+        tag_ids: Tags to align
+        interval_ns: Grid spacing
+        start_ns: First grid point (default: first pushed timestamp,
+            rounded down to a multiple of interval_ns)
+        method / tolerances / window_ns: As in align_to_grid()
+        max_lag_ns: Emit even when a tag lags the most recent tag by more
+            than this (a silent tag then reads as missing instead of
+            stalling the output)
+    """
+    
+    def __init__(
+        self,
+        tag_ids: list[str],
+        interval_ns: int,
+        start_ns: int | None = None,
+        method: str = "last",
+        tolerances: dict[str, int] | int | None = None,
+        window_ns: int | None = None,
+        units: dict[str, str] | None = None,
+        max_lag_ns: int | None = None,
+    ):
+        if method not in METHODS:
+            raise ValueError(f"Unknown resampling method: {method}")
+        self.interval_ns = interval_ns
+        self.next_ns = start_ns
+        self.method = method
+        self.window_ns = interval_ns if window_ns is None else window_ns
+        self.max_lag_ns = max_lag_ns
+        self.tolerances = {
+            t: tolerances.get(t) if isinstance(tolerances, dict) else tolerances
+            for t in tag_ids
+        }
+        units = units or {}
+        self._buffers = {t: _TagBuffer(units.get(t, "")) for t in tag_ids}
+    
+    def push(
+        self,
+        tag_id: str,
+        timestamps: Iterable[int],
+        values: Iterable[float],
+        qc_flags: Iterable[int],
+    ) -> None:
+        """Append a chunk of samples for one tag."""
+        buffer = self._buffers[tag_id]
+        series = buffer.series
+        n = len(series)
+        series.extend(timestamps, values, qc_flags)
+        for i in range(len(series) - 1, n - 1, -1):
+            if series.qc_flags[i] == QC_OK and series.values[i] == series.values[i]:
+                buffer.last_ok_ns = series.timestamps[i]
+                break
+        if len(series) > n:
+            buffer.last_ns = series.timestamps[-1]
+            if self.next_ns is None:
+                first = series.timestamps[n]
+                self.next_ns = first - first % self.interval_ns
+    
+    def _ready_until(self, tag_id: str) -> int | None:
+        """Latest grid time whose value for this tag is final."""
+        buffer = self._buffers[tag_id]
+        if buffer.last_ns is None:
+            return None
+        if self.method != "interpolate":
+            return buffer.last_ns
+        # Interpolation needs the next OK sample, or proof that none is close enough
+        tol = self.tolerances[tag_id]
+        ready = buffer.last_ok_ns
+        if tol is not None:
+            expired = buffer.last_ns - tol
+            ready = expired if ready is None else max(ready, expired)
+        return ready
+    
+    @timed("align")
+    def emit(self, final: bool = False) -> ColumnarDataset | None:
+        """
+        Grid rows that are complete, or None.
+        
+        Args:
+            final: End of stream: emit every grid row up to the latest sample
+        """
+        if self.next_ns is None:
+            return None
+        latest = [b.last_ns for b in self._buffers.values() if b.last_ns is not None]
+        if final:
+            watermark = max(latest)
+        else:
+            ready = [r for r in map(self._ready_until, self._buffers) if r is not None]
+            watermark = min(ready) if len(ready) == len(self._buffers) else None
+            if self.max_lag_ns is not None:
+                floor = max(latest) - self.max_lag_ns
+                watermark = floor if watermark is None else max(watermark, floor)
+        if watermark is None or watermark < self.next_ns:
+            return None
+        
+        grid = make_grid(self.next_ns, watermark + 1, self.interval_ns)
+        dataset = align_to_grid(
+            {t: b.series for t, b in self._buffers.items()},
+            grid,
+            self.method,
+            self.tolerances,
+            self.window_ns,
+        )
+        self.next_ns = grid[-1] + self.interval_ns
+        for buffer in self._buffers.values():
+            self._trim(buffer)
+        return dataset
+    
+    def _trim(self, buffer: _TagBuffer) -> None:
+        """Drop samples that no grid point from next_ns on can use."""
+        series = buffer.series
+        ts = series.timestamps
+        if self.method == "mean":
+            cut = bisect_right(ts, self.next_ns - self.window_ns)
+        else:
+            # Keep the last sample before the next grid point (the last OK one
+            # for interpolation)
+            cut = bisect_left(ts, self.next_ns) - 1
+            if self.method == "interpolate":
+                while cut >= 0 and not (
+                    series.qc_flags[cut] == QC_OK and series.values[cut] == series.values[cut]
+                ):
+                    cut -= 1
+            cut = max(cut, 0)
+        if cut:
+            buffer.series = TagSeries(ts[cut:], series.values[cut:], series.qc_flags[cut:], series.unit)
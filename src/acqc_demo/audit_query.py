@@ -0,0 +1,525 @@
+"""
+Audit query module for ACQC demo.
+
+Indexed queries over persisted JSONL audit logs (see trace.JsonlAuditWriter):
+- Sidecar index directory next to each log file (`<file>.idx/`) of
+  append-only binary files, memory-mapped when opened: nothing is parsed
+  up front, and refresh() only appends the entries written since
+- Per entry: byte offset, length, timestamp and indexed field values
+- Inverted indexes on event_type, model_hash and operator_id: one file of
+  positions per value, in log order (which is time order)
+- entry_id -> position: sorted runs of (digest, position) pairs, one per
+  refresh, merged as they grow (at most ~log2(n) runs), each bisected
+- Rotated `.gz` segments are indexed on uncompressed offsets; a read
+  decompresses only the gzip member holding the entry (JsonlAuditWriter
+  compresses segments in members of trace.GZIP_MEMBER_BYTES)
+
+Time bounds are bisected in each posting list and the lists are
+intersected by searching the others from the shortest one, so query time
+depends on the number of matches rather than on the size of the log.
+Entries appended out of time order are kept in a side list that every
+query scans.
+"""
+
+import hashlib
+import heapq
+import json
+import mmap
+import shutil
+import zlib
+from array import array
+from bisect import bisect_left, bisect_right
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Iterator
+
+from acqc_demo.dataset import datetime_to_ns, iso_to_ns
+from acqc_demo.trace import audit_log_files
+
+
+INDEX_VERSION = 3
+INDEXED_FIELDS = ("event_type", "model_hash", "operator_id")
+
+# entries.q holds one record of int64 per entry: offset, length, timestamp
+# (epoch ns) and the value id of each indexed field (-1: field absent)
+_OFFSET, _LENGTH, _TS, _VALUES = range(4)
+_RECORD = _VALUES + len(INDEXED_FIELDS)
+_NO_VALUE = -1
+_GZIP_READ = 64 * 1024
+
+
+def _to_ns(ts: str | datetime | int) -> int:
+    if isinstance(ts, int):
+        return ts
+    if isinstance(ts, datetime):
+        return datetime_to_ns(ts)
+    return iso_to_ns(ts)
+
+
+def _entry_key(entry_id: str) -> int:
+    digest = hashlib.blake2b(entry_id.encode(), digest_size=8).digest()
+    return int.from_bytes(digest, "little", signed=True)
+
+
+def _gzip_members(data: bytes | mmap.mmap) -> Iterator[tuple[int, bytes]]:
+    """(compressed start, decompressed bytes) per member of a gzip file."""
+    view = memoryview(data)
+    pos = start = 0
+    parts: list[bytes] = []
+    decoder = zlib.decompressobj(wbits=31)
+    while pos < len(view):
+        chunk = view[pos:pos + _GZIP_READ]
+        parts.append(decoder.decompress(chunk))
+        if not decoder.eof:
+            pos += len(chunk)
+            continue
+        pos += len(chunk) - len(decoder.unused_data)
+        yield start, b"".join(parts)
+        start, parts = pos, []
+        decoder = zlib.decompressobj(wbits=31)
+    if start < len(view):
+        raise ValueError("Truncated gzip member")
+
+
+class _Column:
+    """Append-only file of int64, read through a memory map."""
+    
+    def __init__(self, path: Path):
+        self.path = path
+        self._raw: Any = None
+    
+    def raw(self) -> Any:
+        """The mapped bytes (b"" while the file is empty or missing)."""
+        if self._raw is None:
+            try:
+                with open(self.path, "rb") as f:
+                    self._raw = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except (FileNotFoundError, ValueError):  # ValueError: empty file
+                self._raw = b""
+        return self._raw
+    
+    def view(self) -> memoryview:
+        return memoryview(self.raw()).cast("q")
+    
+    def append(self, data: bytes | array) -> None:
+        with open(self.path, "ab") as f:
+            f.write(data)
+        self.close()
+    
+    def close(self) -> None:
+        if isinstance(self._raw, mmap.mmap):
+            try:
+                self._raw.close()
+            except BufferError:  # a view is still in use; unmapped when released
+                pass
+        self._raw = None
+
+
+class AuditIndex:
+    """
+    Sidecar index over one JSONL audit file (plain, or a rotated `.gz`
+    segment).
+    
+    Entries are numbered by position (line order). The log is append-only,
+    so refresh() only scans bytes written since the index was built; a
+    replaced or truncated file is indexed again from scratch.
+    """
+    
+    def __init__(self, log_path: Path):
+        self.log_path = Path(log_path)
+        self.index_dir = self.log_path.with_name(self.log_path.name + ".idx")
+        self.compressed = self.log_path.suffix == ".gz"
+        self.n_entries = 0
+        self.indexed_bytes = 0
+        self.file_id: list[int] = []  # (st_dev, st_ino) of the indexed file
+        self.last_ts: int | None = None  # latest timestamp of the in-order entries
+        self.values: dict[tuple[str, Any], int] = {}  # (field, value) -> value id
+        self.id_runs: list[list[Any]] = []  # [column name, pairs] of sorted entry_id runs
+        self.next_run = 0
+        self._columns: dict[str, _Column] = {}
+        self._member: tuple[int, bytes] = (-1, b"")  # last decompressed gzip member
+    
+    @classmethod
+    def open(cls, log_path: Path) -> "AuditIndex":
+        """Map the sidecar index (building or extending it as needed)."""
+        index = cls(log_path)
+        index._load()
+        index.refresh()
+        return index
+    
+    def __len__(self) -> int:
+        return self.n_entries
+    
+    def _column(self, name: str) -> _Column:
+        column = self._columns.get(name)
+        if column is None:
+            column = self._columns[name] = _Column(self.index_dir / f"{name}.q")
+        return column
+    
+    def _load(self) -> None:
+        try:
+            header = json.loads((self.index_dir / "index.json").read_text())
+        except (OSError, ValueError):
+            header = {}
+        n = header.get("n_entries", 0)
+        if (
+            header.get("index_version") != INDEX_VERSION
+            or len(self._column("entries").raw()) != n * _RECORD * 8  # interrupted refresh
+        ):
+            self._reset()
+            return
+        self.n_entries = n
+        self.indexed_bytes = header["indexed_bytes"]
+        self.file_id = header["file_id"]
+        self.last_ts = header["last_ts"]
+        self.id_runs = header["id_runs"]
+        self.next_run = header["next_run"]
+        with open(self.index_dir / "values.jsonl", "rb") as f:
+            for value_id, line in zip(range(header["n_values"]), f):
+                name, value = json.loads(line)
+                self.values[name, value] = value_id
+    
+    def _reset(self) -> None:
+        shutil.rmtree(self.index_dir, ignore_errors=True)
+        self.__init__(self.log_path)
+        self.index_dir.mkdir(parents=True)
+    
+    def _save_header(self) -> None:
+        header = {
+            "index_version": INDEX_VERSION,
+            "n_entries": self.n_entries,
+            "indexed_bytes": self.indexed_bytes,
+            "file_id": self.file_id,
+            "last_ts": self.last_ts,
+            "n_values": len(self.values),
+            "id_runs": self.id_runs,
+            "next_run": self.next_run,
+        }
+        path = self.index_dir / "index.json"
+        tmp = path.with_name(path.name + ".tmp")
+        tmp.write_text(json.dumps(header))
+        tmp.replace(path)
+    
+    def refresh(self) -> bool:
+        """Index entries appended since the last build; returns True if updated."""
+        st = self.log_path.stat()
+        file_id = [st.st_dev, st.st_ino]
+        if self.indexed_bytes and (
+            file_id != self.file_id
+            or st.st_size < self.indexed_bytes
+            or self.compressed and st.st_size != self.indexed_bytes
+        ):
+            self._reset()  # rotated, replaced or truncated
+        if st.st_size == self.indexed_bytes:
+            return False
+        
+        records = array("q")
+        ids: list[tuple[int, int]] = []  # (entry_id digest, position)
+        in_order = array("q")
+        late = array("q")
+        postings: dict[int, array] = {}
+        new_values: list[tuple[str, Any]] = []
+        members = array("q")
+        lines = self._scan_gzip(members) if self.compressed else self._scan()
+        
+        pos = self.n_entries
+        last_ts = self.last_ts
+        for line, offset in lines:
+            entry = json.loads(line)
+            ts = iso_to_ns(entry["timestamp"])
+            value_ids = []
+            for name in INDEXED_FIELDS:
+                value = entry.get(name)
+                if value is None:
+                    value_ids.append(_NO_VALUE)
+                    continue
+                value_id = self.values.get((name, value))
+                if value_id is None:
+                    value_id = self.values[name, value] = len(self.values)
+                    new_values.append((name, value))
+                value_ids.append(value_id)
+            records.extend((offset, len(line), ts, *value_ids))
+            ids.append((_entry_key(entry["entry_id"]), pos))
+            if last_ts is None or ts >= last_ts:
+                last_ts = ts
+                in_order.append(pos)
+                for value_id in value_ids:
+                    if value_id != _NO_VALUE:
+                        postings.setdefault(value_id, array("q")).append(pos)
+            else:
+                late.append(pos)
+            pos += 1
+        
+        # Records first, header last: a refresh interrupted in between leaves
+        # entries.q longer than the header says, and _load() rebuilds
+        self._column("entries").append(records)
+        self._column("all").append(in_order)
+        self._column("late").append(late)
+        self._column("members").append(members)
+        for value_id, posting in postings.items():
+            self._column(f"p{value_id}").append(posting)
+        with open(self.index_dir / "values.jsonl", "a") as f:
+            f.writelines(json.dumps(v) + "\n" for v in new_values)
+        
+        obsolete = self._add_id_run(ids)
+        
+        self.n_entries = pos
+        self.last_ts = last_ts
+        self.file_id = file_id
+        self._save_header()
+        for name in obsolete:
+            self._columns.pop(name).close()
+            (self.index_dir / f"{name}.q").unlink()
+        return True
+    
+    def _add_id_run(self, ids: list[tuple[int, int]]) -> list[str]:
+        """
+        Write the new (digest, position) pairs as a sorted run and merge runs
+        while the last is at least half the size of the one before, so run
+        sizes at least double towards the oldest. Returns the merged-away runs
+        (removed once the header no longer lists them).
+        """
+        obsolete: list[str] = []
+        run = sorted(ids)
+        while run and self.id_runs and self.id_runs[-1][1] <= 2 * len(run):
+            name, n = self.id_runs.pop()
+            view = self._column(name).view()
+            older = zip(view[0:2 * n:2].tolist(), view[1:2 * n:2].tolist())
+            run = list(heapq.merge(older, run))
+            obsolete.append(name)
+        if run:
+            name = f"ids-{self.next_run}"
+            self.next_run += 1
+            data = array("q", [x for pair in run for x in pair])
+            column = self._column(name)
+            column.close()
+            with open(column.path, "wb") as f:  # may overwrite a run orphaned by a crash
+                f.write(data)
+            self.id_runs.append([name, len(run)])
+        return obsolete
+    
+    def _scan(self) -> Iterator[tuple[bytes, int]]:
+        """(line, offset) of complete lines past indexed_bytes."""
+        with open(self.log_path, "rb") as f:
+            f.seek(self.indexed_bytes)
+            offset = self.indexed_bytes
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break  # partial line still being written
+                if line.strip():
+                    yield line, offset
+                offset += len(line)
+        self.indexed_bytes = offset
+    
+    def _scan_gzip(self, members: array) -> Iterator[tuple[bytes, int]]:
+        """(line, uncompressed offset) of a whole segment; fills (start, offset) per member."""
+        with open(self.log_path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            offset = 0
+            tail = b""
+            for start, data in _gzip_members(mm):
+                members.extend((start, offset))
+                buf = tail + data
+                base = offset - len(tail)
+                i = 0
+                while (j := buf.find(b"\n", i)) >= 0:
+                    line = buf[i:j + 1]
+                    if line.strip():
+                        yield line, base + i
+                    i = j + 1
+                tail = buf[i:]
+                offset += len(data)
+            self.indexed_bytes = len(mm)
+    
+    def positions(
+        self,
+        start: str | datetime | int | None = None,
+        end: str | datetime | int | None = None,
+        **filters: str,
+    ) -> list[int]:
+        """
+        Positions of entries matching all filters, in log order.
+        
+        Args:
+            start: Inclusive lower time bound (ISO string, datetime or epoch ns)
+            end: Exclusive upper time bound
+            **filters: event_type / model_hash / operator_id equality filters
+        """
+        wanted: list[tuple[int, int]] = []  # (field number, value id)
+        postings: list[memoryview] = []
+        for name, value in filters.items():
+            if name not in INDEXED_FIELDS:
+                raise ValueError(f"Field is not indexed: {name}")
+            if value is None:
+                continue
+            value_id = self.values.get((name, value))
+            if value_id is None:
+                return []
+            wanted.append((INDEXED_FIELDS.index(name), value_id))
+            postings.append(self._column(f"p{value_id}").view())
+        if not postings:
+            postings.append(self._column("all").view())
+        
+        records = self._column("entries").view()
+        start_ns = None if start is None else _to_ns(start)
+        end_ns = None if end is None else _to_ns(end)
+        
+        def timestamp(pos: int) -> int:
+            return records[pos * _RECORD + _TS]
+        
+        # Posting lists are in position and time order: bisect the time range
+        ranges = []
+        for posting in postings:
+            lo = 0 if start_ns is None else bisect_left(posting, start_ns, key=timestamp)
+            hi = len(posting) if end_ns is None else bisect_left(posting, end_ns, key=timestamp)
+            ranges.append((hi - lo, posting, lo, hi))
+        ranges.sort(key=lambda r: r[0])
+        
+        # Intersect from the shortest range, searching forward in the others
+        _, posting, lo, hi = ranges[0]
+        result = posting[lo:hi].tolist()
+        for _, other, lo, hi in ranges[1:]:
+            kept = []
+            for pos in result:
+                lo = bisect_left(other, pos, lo, hi)
+                if lo == hi:
+                    break
+                if other[lo] == pos:
+                    kept.append(pos)
+            result = kept
+        
+        late = self._column("late").view()
+        if late:
+            extra = [
+                pos for pos in late.tolist()
+                if (start_ns is None or timestamp(pos) >= start_ns)
+                and (end_ns is None or timestamp(pos) < end_ns)
+                and all(records[pos * _RECORD + _VALUES + k] == v for k, v in wanted)
+            ]
+            if extra:
+                result = sorted(result + extra)
+        return result
+    
+    def get(self, entry_id: str) -> dict[str, Any] | None:
+        """Entry by entry_id, or None."""
+        key = _entry_key(entry_id)
+        for name, n in self.id_runs:
+            pairs = self._column(name).view()
+            i = bisect_left(range(n), key, key=lambda j: pairs[2 * j])
+            while i < n and pairs[2 * i] == key:  # digest collisions are checked
+                entry = next(self.read([pairs[2 * i + 1]]))
+                if entry.get("entry_id") == entry_id:
+                    return entry
+                i += 1
+        return None
+    
+    def read(self, positions: list[int]) -> Iterator[dict[str, Any]]:
+        """Decode the entries at `positions`."""
+        if not positions:
+            return
+        records = self._column("entries").view()
+        with open(self.log_path, "rb") as f, mmap.mmap(
+            f.fileno(), 0, access=mmap.ACCESS_READ
+        ) as mm:
+            for pos in positions:
+                offset = records[pos * _RECORD + _OFFSET]
+                length = records[pos * _RECORD + _LENGTH]
+                if self.compressed:
+                    yield json.loads(self._read_gzip(mm, offset, length))
+                else:
+                    yield json.loads(mm[offset:offset + length])
+    
+    def _read_gzip(self, mm: mmap.mmap, offset: int, length: int) -> bytes:
+        members = self._column("members").view()
+        n = len(members) // 2
+        k = bisect_right(range(n), offset, key=lambda m: members[2 * m + 1]) - 1
+        start = offset - members[2 * k + 1]
+        data = b""
+        while len(data) < start + length:
+            data += self._member_data(mm, members, k)
+            k += 1
+        return data[start:start + length]
+    
+    def _member_data(self, mm: mmap.mmap, members: memoryview, k: int) -> bytes:
+        if self._member[0] != k:
+            end = members[2 * k + 2] if 2 * k + 2 < len(members) else len(mm)
+            self._member = (k, zlib.decompress(mm[members[2 * k]:end], wbits=31))
+        return self._member[1]
+
+
+class AuditQuery:
+    """
+    Query JSONL audit files through their sidecar indexes.
+    
+    Args:
+        paths: Audit file(s), or a streaming log directory (every rotated
+            segment and the active file, see trace.audit_log_files)
+        basename: Streaming log base name, for a directory
+    """
+    
+    def __init__(self, paths: Path | list[Path], basename: str = "audit_log"):
+        if isinstance(paths, (str, Path)):
+            path = Path(paths)
+            paths = audit_log_files(path, basename) if path.is_dir() else [path]
+        self.indexes = [AuditIndex.open(Path(p)) for p in paths]
+    
+    def refresh(self) -> None:
+        """Pick up entries appended since the indexes were opened."""
+        for index in self.indexes:
+            index.refresh()
+    
+    def find(
+        self,
+        event_type: str | None = None,
+        model_hash: str | None = None,
+        operator_id: str | None = None,
+        start: str | datetime | int | None = None,
+        end: str | datetime | int | None = None,
+        limit: int | None = None,
+    ) -> Iterator[dict[str, Any]]:
+        """
+        Yield matching entries in log order.
+        
+        Example: all DECISION entries for a model in a week::
+            
+            AuditQuery(path).find(event_type="DECISION", model_hash=h,
+                                  start="2026-01-01T00:00:00Z",
+                                  end="2026-01-08T00:00:00Z")
+        """
+        n = 0
+        for index in self.indexes:
+            positions = index.positions(
+                start=start,
+                end=end,
+                event_type=event_type,
+                model_hash=model_hash,
+                operator_id=operator_id,
+            )
+            for entry in index.read(positions):
+                if limit is not None and n >= limit:
+                    return
+                n += 1
+                yield entry
+    
+    def count(self, **kwargs: Any) -> int:
+        """Number of matching entries (read from the indexes only)."""
+        return sum(len(index.positions(**kwargs)) for index in self.indexes)
+    
+    def get(self, entry_id: str) -> dict[str, Any] | None:
+        """Fetch a single entry by entry_id."""
+        for index in self.indexes:
+            entry = index.get(entry_id)
+            if entry is not None:
+                return entry
+        return None
+
+
+def export_jsonl(json_log: Path, output_path: Path | None = None) -> Path:
+    """Convert an audit_log.json written by AuditLog.save() to queryable JSONL."""
+    json_log = Path(json_log)
+    output_path = Path(output_path or json_log.with_suffix(".jsonl"))
+    with open(json_log) as f:
+        doc = json.load(f)
+    with open(output_path, "w") as f:
+        for entry in doc["entries"]:
+            f.write(json.dumps(entry, default=str) + "\n")
+    return output_path
@@ -0,0 +1,287 @@
+"""
+Backtest module for ACQC demo.
+
+Re-scores historical periods through a SoftSensor after a model change
+(retrospective validation for KPI-01/02/03):
+- The time range is split into chunks of rows; each chunk first replays
+  FeaturePipeline.warmup_rows rows before it, so stateful features start
+  from the history a sequential run would have
+- Chunks fan out to a process pool. Inputs are `.acqc` files that every
+  worker opens memory-mapped (storage.BinaryDataset): a task is only file
+  names and a time window, the workers share the OS page cache, and no
+  input array is pickled. JSON datasets are converted to `.acqc` first
+- Predictions and error accumulators against lab values (MAE, RMSE,
+  MAPE; evaluate.ErrorAccumulator) are merged in chunk order, so results
+  do not depend on the number of workers
+- Converted inputs live in a temporary directory removed when the run
+  ends; the memory maps are closed after planning and after each chunk
+
+Lab results are paired as-of with the last prediction at or before their
+timestamp (conformal.lab_residuals), within the chunk that holds them.
+The calibrator is not replayed: intervals use config.uncertainty_factor.
+"""
+
+import tempfile
+import time
+from array import array
+from bisect import bisect_left, bisect_right
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any
+
+from acqc_demo.conformal import lab_residuals
+from acqc_demo.dataset import ColumnarDataset, iso_to_ns
+from acqc_demo.evaluate import ErrorAccumulator
+from acqc_demo.infer import ModelConfig, PredictionBatch, SoftSensor, create_baseline_model
+from acqc_demo.storage import BinaryDataset, json_to_binary
+
+
+DEFAULT_CHUNK_ROWS = 50_000
+
+
+@dataclass
+class BacktestResult:
+    """Merged output of run_backtest()."""
+    predictions: PredictionBatch
+    errors: ErrorAccumulator
+    n_chunks: int
+    warmup_rows: int
+    workers: int
+    elapsed_s: float = 0.0
+    n_files: int = 0
+    
+    def summary(self) -> dict[str, Any]:
+        n = len(self.predictions)
+        return {
+            "model_id": self.predictions.model_id,
+            "model_hash": self.predictions.model_hash,
+            "n_predictions": n,
+            "status_counts": self.predictions.status_counts(),
+            "n_files": self.n_files,
+            "n_chunks": self.n_chunks,
+            "warmup_rows": self.warmup_rows,
+            "workers": self.workers,
+            "elapsed_s": round(self.elapsed_s, 3),
+            "rows_per_s": round(n / self.elapsed_s) if self.elapsed_s else None,
+            **{k: round(v, 6) if isinstance(v, float) else v for k, v in self.errors.summary().items()},
+        }
+
+
+@dataclass
+class _Span:
+    """Rows of one input file inside the backtest range."""
+    path: str
+    lo: int
+    hi: int
+    first_ns: int
+    last_ns: int
+    source: BinaryDataset = field(repr=False)
+    
+    def timestamp(self, i: int) -> int:
+        return self.source.column("timestamps", self.lo + i, self.lo + i + 1)[0]
+
+
+def input_files(path: Path, work_dir: Path) -> list[Path]:
+    """
+    `.acqc` inputs of a backtest: the file itself, every `.acqc` of a
+    directory (e.g. the shards of data_gen.generate_sharded_dataset), or a
+    dataset.json converted to `.acqc` under `work_dir` (owned by the caller).
+    """
+    path = Path(path)
+    if path.is_dir():
+        files = sorted(path.glob("*.acqc"))
+        if not files:
+            raise ValueError(f"No .acqc files in {path}")
+        return files
+    if path.suffix == ".json":
+        return [json_to_binary(path, Path(work_dir) / path.with_suffix(".acqc").name)]
+    return [path]
+
+
+def _spans(paths: list[Path], start_ns: int | None, end_ns: int | None) -> list[_Span]:
+    spans = []
+    for path in paths:
+        source = BinaryDataset(path)
+        lo = 0 if start_ns is None else source.searchsorted(start_ns)
+        hi = source.n_samples if end_ns is None else source.searchsorted(end_ns)
+        if hi > lo:
+            first, last = (source.column("timestamps", i, i + 1)[0] for i in (lo, hi - 1))
+            spans.append(_Span(str(path), lo, hi, first, last, source))
+        else:
+            source.close()
+    spans.sort(key=lambda s: s.first_ns)
+    return spans
+
+
+def plan_chunks(
+    spans: list[_Span],
+    chunk_rows: int,
+    warmup_rows: int,
+    end_ns: int | None = None,
+) -> list[tuple[list[str], int, int, int]]:
+    """
+    Chunk windows over the rows of all spans, in time order.
+    
+    Returns:
+        (files overlapping the window, warm-up start, output start, output
+        end) per chunk; times are epoch ns and the windows [start, end)
+    """
+    offsets = [0]
+    for span in spans:
+        offsets.append(offsets[-1] + span.hi - span.lo)
+    n = offsets[-1]
+    
+    def timestamp(row: int) -> int:
+        k = bisect_right(offsets, row) - 1
+        return spans[k].timestamp(row - offsets[k])
+    
+    stop_ns = max(spans[-1].last_ns + 1, end_ns or 0) if spans else 0
+    chunks = []
+    for row in range(0, n, chunk_rows):
+        out_start = timestamp(row)
+        warm_start = timestamp(max(row - warmup_rows, 0))
+        out_end = timestamp(row + chunk_rows) if row + chunk_rows < n else stop_ns
+        files = [s.path for s in spans if s.first_ns < out_end and s.last_ns >= warm_start]
+        chunks.append((files, warm_start, out_start, out_end))
+    return chunks
+
+
+def concat_datasets(parts: list[ColumnarDataset]) -> ColumnarDataset:
+    """Join datasets over consecutive time ranges (same tags) into one."""
+    if len(parts) == 1:
+        return parts[0]
+    first = parts[0]
+    
+    def join(columns: list[Any], typecode: str) -> array:
+        out = array(typecode)
+        for column in columns:
+            out.extend(column)
+        return out
+    
+    kwargs: dict[str, Any] = {}
+    if first.quality is not None:
+        kwargs = {
+            "quality": join([p.quality for p in parts], "d"),
+            "quality_timestamps": join([p.quality_timestamps for p in parts], "q"),
+            "quality_variable": first.quality_variable,
+            "quality_unit": first.quality_unit,
+            "quality_source": first.quality_source,
+        }
+    return ColumnarDataset(
+        timestamps=join([p.timestamps for p in parts], "q"),
+        values={t: join([p.values[t] for p in parts], "d") for t in first.tag_ids},
+        qc_flags={t: join([p.qc_flags[t] for p in parts], "B") for t in first.tag_ids},
+        units=dict(first.units),
+        metadata=dict(first.metadata),
+        **kwargs,
+    )
+
+
+def _run_chunk(task: tuple) -> tuple[tuple[array, ...], ErrorAccumulator]:
+    """Score one chunk window from the memory-mapped inputs (pool worker)."""
+    files, warm_start, out_start, out_end, config, tolerance_ns = task
+    sources = [BinaryDataset(f) for f in files]
+    try:
+        # The views over the maps are dropped when _score_chunk returns (copies)
+        return _score_chunk(
+            concat_datasets([s.select(warm_start, out_end) for s in sources]),
+            out_start, config, tolerance_ns,
+        )
+    finally:
+        for source in sources:
+            source.close()
+
+
+def _score_chunk(
+    dataset: ColumnarDataset,
+    out_start: int,
+    config: ModelConfig,
+    tolerance_ns: int | None,
+) -> tuple[tuple[array, ...], ErrorAccumulator]:
+    y_hat, lower, upper, status = SoftSensor(config).predict_columns(dataset)
+    
+    errors = ErrorAccumulator()
+    if dataset.quality is not None:
+        lab_ts = dataset.quality_timestamps
+        j = bisect_left(lab_ts, out_start)
+        lab = dataset.quality[j:]
+        errors.add_many(lab_residuals(dataset.timestamps, y_hat, lab_ts[j:], lab, tolerance_ns), lab)
+    
+    k = bisect_left(dataset.timestamps, out_start)
+    columns = (array("q", dataset.timestamps[k:]), y_hat[k:], lower[k:], upper[k:], status[k:])
+    return columns, errors
+
+
+def run_backtest(
+    paths: list[Path],
+    config: ModelConfig | None = None,
+    start: str | int | None = None,
+    end: str | int | None = None,
+    chunk_rows: int = DEFAULT_CHUNK_ROWS,
+    workers: int = 1,
+    tolerance_ns: int | None = None,
+) -> BacktestResult:
+    """
+    Replay historical inputs through a model.
+    
+    Args:
+        paths: `.acqc` files, directories of them or dataset.json files
+            (see input_files), in any order (they are sorted by time)
+        config: Model to score (default: baseline model)
+        start, end: Time range [start, end) (ISO strings or epoch ns)
+        chunk_rows: Output rows per task; the results depend on it only
+            through EWMA warm-up truncation (EWMA_WARMUP_WEIGHT)
+        workers: Processes scoring chunks in parallel (1: in-process)
+        tolerance_ns: Maximum age of the prediction paired with a lab value
+    """
+    if chunk_rows < 1:
+        raise ValueError(f"chunk_rows must be positive, got {chunk_rows}")
+    started = time.perf_counter()
+    config = config or create_baseline_model()
+    sensor = SoftSensor(config)  # validates the config before any worker starts
+    warmup = sensor.features.warmup_rows if sensor.features is not None else 0
+    start_ns = iso_to_ns(start) if isinstance(start, str) else start
+    end_ns = iso_to_ns(end) if isinstance(end, str) else end
+    
+    with tempfile.TemporaryDirectory(prefix="acqc-backtest-") as work_dir:
+        files = [f for path in paths for f in input_files(path, Path(work_dir))]
+        spans = _spans(files, start_ns, end_ns)
+        try:
+            chunks = plan_chunks(spans, chunk_rows, warmup, end_ns)
+        finally:
+            for span in spans:
+                span.source.close()
+        tasks = [(*chunk, config, tolerance_ns) for chunk in chunks]
+        if workers <= 1 or len(tasks) <= 1:
+            results = [_run_chunk(task) for task in tasks]
+        else:
+            with ProcessPoolExecutor(max_workers=min(workers, len(tasks))) as pool:
+                results = list(pool.map(_run_chunk, tasks))  # in chunk order
+    
+    merged = [array(code) for code in "qddd"] + [array("B")]
+    errors = ErrorAccumulator()
+    for columns, chunk_errors in results:
+        for out, column in zip(merged, columns):
+            out.extend(column)
+        errors.merge(chunk_errors)
+    timestamps, y_hat, lower, upper, status = merged
+    predictions = PredictionBatch(
+        timestamps=timestamps,
+        y_hat=y_hat,
+        uncertainty_lower=lower,
+        uncertainty_upper=upper,
+        status=status,
+        variable_id=config.output_variable,
+        model_id=config.model_id,
+        model_hash=sensor.model_hash,
+    )
+    return BacktestResult(
+        predictions=predictions,
+        errors=errors,
+        n_chunks=len(tasks),
+        warmup_rows=warmup,
+        workers=workers,
+        elapsed_s=time.perf_counter() - started,
+        n_files=len(files),
+    )
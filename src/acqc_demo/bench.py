@@ -0,0 +1,404 @@
+"""
+Benchmark module for ACQC demo.
+
+Throughput and memory sweeps over the hot spots of the demo pipeline:
+- generate: generate_demo_dataset (columnar, n_tags wide)
+- predict_batch: SoftSensor.predict_batch
+- audit: PREDICTION/RECOMMENDATION entries and save(), as in the CLI run
+- save_predictions: predictions JSON
+
+Every (case, n_samples, n_tags) cell runs in a fresh spawned process, so
+its peak RSS is not hidden by the high-water mark of earlier cells. Per
+cell: best-of-`repeat` wall time and rows/s, peak RSS, memory blocks
+still allocated by the result (sys.getallocatedblocks) and the traced
+allocation peak (tracemalloc, one extra run).
+
+Results can be stored as a JSON baseline; a later run compared against
+it fails when throughput drops or memory grows beyond a threshold.
+
+Run with: python -m acqc_demo.bench --samples 100,10000 --tags 4,100
+"""
+
+import argparse
+import gc
+import json
+import multiprocessing
+import platform
+import sys
+import tempfile
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from pathlib import Path
+from time import perf_counter_ns
+from typing import Any, Callable
+
+try:
+    import resource
+except ImportError:  # Windows: no getrusage, peak RSS is not reported
+    resource = None
+
+from acqc_demo.data_gen import generate_demo_dataset
+from acqc_demo.infer import PredictionBatch, SoftSensor, save_predictions
+from acqc_demo.trace import AuditLog
+
+
+BENCH_VERSION = 1
+SAMPLE_SWEEP = (10**2, 10**3, 10**4, 10**5, 10**6, 10**7)
+TAG_SWEEP = (4, 10, 100, 1000)
+DEFAULT_THRESHOLD = 0.25
+# Differences below these are noise whatever the ratio (small cells)
+_ABS_SLACK = {"peak_rss_mb": 2.0, "alloc_peak_mb": 1.0, "alloc_blocks": 1000}
+
+
+@dataclass
+class Case:
+    """
+    One benchmarked operation.
+    
+    setup(n_samples, n_tags, tmp_dir) builds the inputs outside the timed
+    region; run(inputs) is timed and returns what the operation produced.
+    Cells with n_samples * n_tags above `max_values` are skipped unless
+    the caller raises the budget.
+    """
+    name: str
+    setup: Callable[[int, int, Path], Any]
+    run: Callable[[Any], Any]
+    max_values: int
+
+
+def _dataset(n_samples: int, n_tags: int) -> Any:
+    return generate_demo_dataset(n_samples=n_samples, columnar=True, seed=0, n_tags=n_tags)
+
+
+def _setup_generate(n_samples: int, n_tags: int, tmp_dir: Path) -> tuple[int, int]:
+    return n_samples, n_tags
+
+
+def _run_generate(inputs: tuple[int, int]) -> Any:
+    return _dataset(*inputs)
+
+
+def _setup_predict(n_samples: int, n_tags: int, tmp_dir: Path) -> tuple[Any, SoftSensor]:
+    return _dataset(n_samples, n_tags), SoftSensor()
+
+
+def _run_predict(inputs: tuple[Any, SoftSensor]) -> Any:
+    dataset, sensor = inputs
+    return sensor.predict_batch(dataset)
+
+
+def _setup_audit(
+    n_samples: int, n_tags: int, tmp_dir: Path
+) -> tuple[Any, PredictionBatch, str, Path]:
+    dataset, sensor = _setup_predict(n_samples, n_tags, tmp_dir)
+    return dataset, sensor.predict_batch(dataset), sensor.model_hash, tmp_dir / "audit"
+
+
+def _run_audit(inputs: tuple[Any, PredictionBatch, str, Path]) -> AuditLog:
+    dataset, predictions, model_hash, log_dir = inputs
+    audit = AuditLog(log_dir=log_dir)
+    for i in range(len(predictions)):
+        prediction = predictions.row(i)
+        audit.log_prediction(
+            prediction=prediction,
+            input_data={"timestamp": prediction["timestamp"], "tags": dataset.row(i)},
+            model_hash=model_hash,
+        )
+        if prediction["status"] == "OK":
+            audit.log_recommendation(
+                recommendation="Continue current operation (within spec)",
+                prediction=prediction,
+                constraints=["y_hat in [88, 95]"],
+                model_hash=model_hash,
+            )
+    audit.save()
+    return audit
+
+
+def _setup_save(n_samples: int, n_tags: int, tmp_dir: Path) -> tuple[PredictionBatch, Path]:
+    dataset, sensor = _setup_predict(n_samples, n_tags, tmp_dir)
+    return sensor.predict_batch(dataset), tmp_dir / "predictions.json"
+
+
+def _run_save(inputs: tuple[PredictionBatch, Path]) -> None:
+    save_predictions(*inputs)
+
+
+CASES = {
+    case.name: case
+    for case in (
+        Case("generate", _setup_generate, _run_generate, max_values=4 * 10**7),
+        Case("predict_batch", _setup_predict, _run_predict, max_values=4 * 10**6),
+        Case("audit", _setup_audit, _run_audit, max_values=4 * 10**5),
+        Case("save_predictions", _setup_save, _run_save, max_values=4 * 10**6),
+    )
+}
+
+
+def _peak_rss_mb() -> float | None:
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in KiB on Linux and in bytes on macOS
+    return round(peak / (1 << 20 if sys.platform == "darwin" else 1 << 10), 1)
+
+
+def measure(
+    case_name: str,
+    n_samples: int,
+    n_tags: int,
+    repeat: int = 3,
+    trace_alloc: bool = True,
+) -> dict[str, Any]:
+    """Run one benchmark cell in this process and return its metrics."""
+    case = CASES[case_name]
+    with tempfile.TemporaryDirectory() as tmp:
+        inputs = case.setup(n_samples, n_tags, Path(tmp))
+        best_ns = None
+        alloc_blocks = 0
+        for _ in range(repeat):
+            gc.collect()
+            blocks = sys.getallocatedblocks()
+            start = perf_counter_ns()
+            result = case.run(inputs)
+            elapsed = perf_counter_ns() - start
+            alloc_blocks = sys.getallocatedblocks() - blocks
+            del result
+            if best_ns is None or elapsed < best_ns:
+                best_ns = elapsed
+        peak_rss = _peak_rss_mb()
+        
+        alloc_peak = None
+        if trace_alloc:
+            gc.collect()
+            tracemalloc.start()
+            try:
+                result = case.run(inputs)
+                alloc_peak = round(tracemalloc.get_traced_memory()[1] / 2**20, 2)
+            finally:
+                tracemalloc.stop()
+            del result
+    
+    seconds = max(best_ns, 1) / 1e9
+    return {
+        "case": case_name,
+        "n_samples": n_samples,
+        "n_tags": n_tags,
+        "seconds": round(seconds, 6),
+        "rows_per_s": round(n_samples / seconds, 1),
+        "peak_rss_mb": peak_rss,
+        "alloc_blocks": alloc_blocks,
+        "alloc_peak_mb": alloc_peak,
+    }
+
+
+def _measure_task(task: tuple) -> dict[str, Any]:
+    return measure(*task)
+
+
+def run_benchmarks(
+    cases: list[str] | None = None,
+    samples: tuple[int, ...] = SAMPLE_SWEEP,
+    tags: tuple[int, ...] = TAG_SWEEP,
+    repeat: int = 3,
+    max_values: int | None = None,
+    trace_alloc: bool = True,
+    isolate: bool = True,
+    progress: Callable[[dict[str, Any]], None] | None = None,
+) -> list[dict[str, Any]]:
+    """
+    Sweep cases over n_samples x n_tags.
+    
+    Cells over budget (each case's max_values, or `max_values` for all)
+    are reported with "skipped": True. With `isolate` every cell runs in a
+    fresh spawned process; without it peak_rss_mb is the process-wide
+    high-water mark.
+    """
+    results = []
+    for name in cases or list(CASES):
+        budget = CASES[name].max_values if max_values is None else max_values
+        for n_tags in tags:
+            for n_samples in samples:
+                if n_samples * n_tags > budget:
+                    result = {"case": name, "n_samples": n_samples, "n_tags": n_tags, "skipped": True}
+                elif isolate:
+                    with ProcessPoolExecutor(1, mp_context=multiprocessing.get_context("spawn")) as pool:
+                        result = pool.submit(
+                            _measure_task, (name, n_samples, n_tags, repeat, trace_alloc)
+                        ).result()
+                else:
+                    result = measure(name, n_samples, n_tags, repeat, trace_alloc)
+                results.append(result)
+                if progress is not None:
+                    progress(result)
+    return results
+
+
+def _key(result: dict[str, Any]) -> tuple[str, int, int]:
+    return result["case"], result["n_samples"], result["n_tags"]
+
+
+def compare(
+    results: list[dict[str, Any]],
+    baseline: dict[str, Any],
+    threshold: float = DEFAULT_THRESHOLD,
+) -> list[str]:
+    """
+    Regressions of `results` against a baseline: throughput below
+    (1 - threshold) x baseline, or a memory metric above
+    (1 + threshold) x baseline (and beyond its absolute noise floor).
+    Cells missing from either side are not compared.
+    """
+    reference = {_key(r): r for r in baseline["results"] if not r.get("skipped")}
+    regressions = []
+    for result in results:
+        base = reference.get(_key(result))
+        if base is None or result.get("skipped"):
+            continue
+        label = "{}[n={}, tags={}]".format(*_key(result))
+        if result["rows_per_s"] < base["rows_per_s"] * (1 - threshold):
+            regressions.append(
+                f"{label}: {result['rows_per_s']:.0f} rows/s < baseline {base['rows_per_s']:.0f}"
+            )
+        for metric, slack in _ABS_SLACK.items():
+            value, ref = result.get(metric), base.get(metric)
+            if value is None or ref is None:
+                continue
+            if value > ref * (1 + threshold) and value - ref > slack:
+                regressions.append(f"{label}: {metric} {value} > baseline {ref}")
+    return regressions
+
+
+def make_baseline(results: list[dict[str, Any]]) -> dict[str, Any]:
+    return {
+        "bench_version": BENCH_VERSION,
+        "created_at": datetime.now(timezone.utc).isoformat().replace("+00:00", "Z"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": results,
+    }
+
+
+def _int_list(text: str) -> tuple[int, ...]:
+    return tuple(int(float(v)) for v in text.split(","))
+
+
+def _format_row(result: dict[str, Any]) -> str:
+    head = f"{result['case']:<17}{result['n_samples']:>10}{result['n_tags']:>6}"
+    if result.get("skipped"):
+        return f"{head}  skipped (over budget)"
+    
+    def opt(value: Any) -> str:
+        return "-" if value is None else str(value)
+    
+    return (
+        f"{head}{result['seconds']:>11.4f}{result['rows_per_s']:>13.0f}"
+        f"{opt(result['peak_rss_mb']):>9}{result['alloc_blocks']:>11}{opt(result['alloc_peak_mb']):>10}"
+    )
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="acqc_demo.bench",
+        description="Throughput and memory benchmarks of the ACQC demo pipeline",
+    )
+    parser.add_argument(
+        "--cases",
+        default=",".join(CASES),
+        help=f"Comma-separated cases (default: {','.join(CASES)})",
+    )
+    parser.add_argument(
+        "--samples",
+        type=_int_list,
+        default=SAMPLE_SWEEP,
+        help="Comma-separated n_samples values (default: 1e2..1e7)",
+    )
+    parser.add_argument(
+        "--tags",
+        type=_int_list,
+        default=TAG_SWEEP,
+        help="Comma-separated n_tags values (default: 4,10,100,1000)",
+    )
+    parser.add_argument(
+        "--repeat",
+        type=int,
+        default=3,
+        help="Timed runs per cell, best is kept (default: 3)",
+    )
+    parser.add_argument(
+        "--max-values",
+        type=lambda v: int(float(v)),
+        default=None,
+        help="Skip cells with n_samples * n_tags above this (default: per case)",
+    )
+    parser.add_argument(
+        "--no-trace-alloc",
+        action="store_true",
+        help="Skip the tracemalloc run (alloc_peak_mb)",
+    )
+    parser.add_argument(
+        "--json",
+        type=Path,
+        default=None,
+        help="Write the results as JSON",
+    )
+    parser.add_argument(
+        "--save-baseline",
+        type=Path,
+        default=None,
+        help="Store the results as a baseline JSON file",
+    )
+    parser.add_argument(
+        "--baseline",
+        type=Path,
+        default=None,
+        help="Compare against a baseline and exit 1 on regressions",
+    )
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=DEFAULT_THRESHOLD,
+        help=f"Allowed relative regression (default: {DEFAULT_THRESHOLD})",
+    )
+    args = parser.parse_args(argv)
+    
+    cases = args.cases.split(",")
+    unknown = [c for c in cases if c not in CASES]
+    if unknown:
+        parser.error(f"unknown cases: {', '.join(unknown)}")
+    
+    print(
+        f"{'case':<17}{'n_samples':>10}{'tags':>6}{'seconds':>11}{'rows/s':>13}"
+        f"{'rss_mb':>9}{'blocks':>11}{'alloc_mb':>10}"
+    )
+    results = run_benchmarks(
+        cases=cases,
+        samples=args.samples,
+        tags=args.tags,
+        repeat=args.repeat,
+        max_values=args.max_values,
+        trace_alloc=not args.no_trace_alloc,
+        progress=lambda r: print(_format_row(r), flush=True),
+    )
+    
+    report = make_baseline(results)
+    for path in (args.json, args.save_baseline):
+        if path is not None:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_text(json.dumps(report, indent=2))
+    
+    if args.baseline is not None:
+        regressions = compare(results, json.loads(args.baseline.read_text()), args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) against {args.baseline}:")
+            for line in regressions:
+                print(f"  {line}")
+            return 1
+        print(f"\nNo regressions against {args.baseline} (threshold {args.threshold:.0%})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,160 @@
+"""
+Prediction cache module for ACQC demo.
+
+Opt-in memo of model evaluations for SoftSensor.predict():
+- Key: model_hash plus the input vector quantized to per-tag resolution
+  (tags.TagInfo.effective_resolution), so snapshots that differ only
+  below sensor resolution, or hold a slow tag between updates, hit
+- Bounded LRU (OrderedDict) with an optional TTL per entry
+- Hit, miss, eviction and expiration counters
+- Emptied when the model hash it serves changes (see bind())
+
+Only the model evaluation is memoized. Feature history, drift detector
+and conformal calibrator updates still run on every call, so statuses
+and intervals are unaffected.
+"""
+
+import math
+import time
+from collections import OrderedDict
+from dataclasses import asdict, dataclass
+from typing import Any, Callable, Hashable, Sequence
+
+from acqc_demo.tags import TagInfo
+
+
+@dataclass
+class CacheStats:
+    """Counters of a PredictionCache."""
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    expirations: int = 0
+    invalidations: int = 0  # clears on a model hash change
+    
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+    
+    def to_dict(self) -> dict[str, Any]:
+        return {**asdict(self), "hit_rate": round(self.hit_rate, 4)}
+
+
+def resolutions_from_dictionary(
+    dictionary: dict[str, TagInfo],
+    aliases: dict[str, str] | None = None,
+) -> dict[str, float]:
+    """
+    Quantization step per tag from tags.load_tag_dictionary().
+    
+    Args:
+        aliases: Dataset tag -> dictionary tag, for tags named differently
+            in the data (e.g. {"TI-101": "TIC-201.PV"})
+    """
+    names = aliases or {tag_id: tag_id for tag_id in dictionary}
+    resolutions = {}
+    for tag_id, entry in names.items():
+        info = dictionary.get(entry)
+        step = info.effective_resolution if info is not None else None
+        if step:
+            resolutions[tag_id] = step
+    return resolutions
+
+
+class PredictionCache:
+    """
+    LRU/TTL cache of model outputs keyed by quantized inputs.
+    
+    Args:
+        max_entries: Entries kept; the least recently used is evicted
+        ttl_s: Seconds an entry stays valid (None: no expiry)
+        resolution: Quantization step per tag; tags without one must match
+            exactly
+        clock: Monotonic time source in seconds (injectable for tests)
+    """
+    
+    def __init__(
+        self,
+        max_entries: int = 4096,
+        ttl_s: float | None = 60.0,
+        resolution: dict[str, float] | None = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        if max_entries < 1:
+            raise ValueError(f"max_entries must be positive, got {max_entries}")
+        self.max_entries = max_entries
+        self.ttl_s = ttl_s
+        self.resolution = dict(resolution or {})
+        self.clock = clock
+        self.model_hash: str | None = None
+        self.stats = CacheStats()
+        self._entries: OrderedDict[Hashable, tuple[Any, float]] = OrderedDict()
+        self._steps: dict[tuple[str, ...], list[float | None]] = {}
+    
+    @classmethod
+    def from_tag_dictionary(
+        cls,
+        dictionary: dict[str, TagInfo],
+        aliases: dict[str, str] | None = None,
+        **options: Any,
+    ) -> "PredictionCache":
+        return cls(resolution=resolutions_from_dictionary(dictionary, aliases), **options)
+    
+    def __len__(self) -> int:
+        return len(self._entries)
+    
+    def bind(self, model_hash: str) -> None:
+        """Serve `model_hash`; a different hash than the current one empties the cache."""
+        if model_hash != self.model_hash:
+            if self._entries:
+                self._entries.clear()
+                self.stats.invalidations += 1
+            self.model_hash = model_hash
+    
+    def key(
+        self,
+        model_hash: str,
+        tags: tuple[str, ...],
+        values: Sequence[float],
+    ) -> tuple | None:
+        """
+        Cache key of an input vector (values in `tags` order), or None when
+        a value is not finite (such inputs are not cached).
+        """
+        steps = self._steps.get(tags)
+        if steps is None:
+            steps = self._steps[tags] = [self.resolution.get(t) for t in tags]
+        quantized = []
+        for value, step in zip(values, steps):
+            if not math.isfinite(value):
+                return None
+            quantized.append(math.floor(value / step + 0.5) if step else value)
+        return (model_hash, *quantized)
+    
+    def get(self, key: Hashable) -> Any | None:
+        """Cached value for a key, or None (miss or expired)."""
+        item = self._entries.get(key)
+        if item is None:
+            self.stats.misses += 1
+            return None
+        value, expires = item
+        if expires < self.clock():
+            del self._entries[key]
+            self.stats.expirations += 1
+            self.stats.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.stats.hits += 1
+        return value
+    
+    def put(self, key: Hashable, value: Any) -> None:
+        expires = math.inf if self.ttl_s is None else self.clock() + self.ttl_s
+        self._entries[key] = (value, expires)
+        self._entries.move_to_end(key)
+        if len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.stats.evictions += 1
+    
+    def clear(self) -> None:
+        self._entries.clear()
@@ -0,0 +1,125 @@
+"""
+Conformal prediction intervals module for ACQC demo.
+
+Replaces the constant ±uncertainty_factor with split/online conformal
+intervals calibrated on lab comparisons:
+- Absolute residuals |lab - y_hat| are kept in a sliding window, both in
+  arrival order (to expire the oldest) and sorted (bisect insertion), so
+  a new lab result costs O(log n) comparisons and the interval half-width
+  is an O(1) rank lookup; the history is never re-sorted
+- The half-width is the ceil((n + 1) * coverage)-th smallest residual of
+  the window, the finite-sample split conformal quantile
+- sweep() replays predictions and lab results in time order and returns
+  per-row half-widths as arrays (online conformal for the batch path)
+
+Until the window holds enough residuals for the requested coverage, the
+model's uncertainty_factor is used.
+"""
+
+import math
+from array import array
+from bisect import bisect_left, insort
+from collections import deque
+from typing import Any
+
+from acqc_demo.align import asof_indices
+
+
+class ConformalCalibrator:
+    """
+    Sliding-window conformal quantile of absolute prediction residuals.
+    
+    Args:
+        coverage: Target share of lab results inside the interval
+        window: Most recent residuals kept
+    """
+    
+    def __init__(self, coverage: float = 0.95, window: int = 500):
+        if not 0.0 < coverage < 1.0 or window < 1:
+            raise ValueError(f"Invalid conformal parameters: coverage={coverage}, window={window}")
+        self.coverage = coverage
+        self.window = window
+        self._fifo: deque[float] = deque()
+        self._sorted: list[float] = []
+    
+    @property
+    def n(self) -> int:
+        return len(self._fifo)
+    
+    def update(self, residual: float) -> None:
+        """Add one residual (lab - prediction); NaN is ignored."""
+        r = abs(residual)
+        if r != r:
+            return
+        if len(self._fifo) == self.window:
+            oldest = self._fifo.popleft()
+            del self._sorted[bisect_left(self._sorted, oldest)]
+        self._fifo.append(r)
+        insort(self._sorted, r)
+    
+    def extend(self, residuals: Any) -> None:
+        for r in residuals:
+            self.update(r)
+    
+    def half_width(self, default: float) -> float:
+        """Current interval half-width, or `default` while too few residuals."""
+        n = len(self._sorted)
+        # Tolerance keeps e.g. (19 + 1) * 0.95 from rounding up to 20
+        rank = math.ceil((n + 1) * self.coverage - 1e-9)
+        return self._sorted[rank - 1] if rank <= n else default
+    
+    def sweep(
+        self,
+        timestamps: Any,
+        lab_timestamps: Any,
+        residuals: Any,
+        default: float,
+    ) -> array:
+        """
+        Online conformal half-widths for sorted prediction timestamps.
+        
+        Each row uses the residuals of lab results strictly before its own
+        timestamp, like a streaming predict() that is followed by the lab
+        results of its instant. The calibrator is advanced past all of
+        them, so consecutive batches continue where the previous one
+        stopped.
+        """
+        out = array("d", bytes(8 * len(timestamps)))
+        j, m = 0, len(lab_timestamps)
+        for i, t in enumerate(timestamps):
+            while j < m and lab_timestamps[j] < t:
+                self.update(residuals[j])
+                j += 1
+            out[i] = self.half_width(default)
+        while j < m:
+            self.update(residuals[j])
+            j += 1
+        return out
+    
+    def to_dict(self) -> dict[str, Any]:
+        return {"coverage": self.coverage, "window": self.window, "residuals": list(self._fifo)}
+    
+    @classmethod
+    def from_dict(cls, data: dict[str, Any]) -> "ConformalCalibrator":
+        calibrator = cls(data["coverage"], data["window"])
+        calibrator.extend(data["residuals"])
+        return calibrator
+
+
+def lab_residuals(
+    timestamps: Any,
+    y_hat: Any,
+    lab_timestamps: Any,
+    lab_values: Any,
+    tolerance_ns: int | None = None,
+) -> array:
+    """
+    Residual of every lab result against the last prediction at or before
+    its timestamp (NaN when there is none within `tolerance_ns`, or the
+    prediction is NaN).
+    """
+    indices = asof_indices(lab_timestamps, timestamps, tolerance_ns)
+    return array("d", [
+        y - y_hat[j] if j >= 0 else math.nan
+        for j, y in zip(indices, lab_values)
+    ])
@@ -8,13 +8,28 @@ Generates synthetic time series simulating:
 """
 
 import json
-from dataclasses import dataclass, asdict
-from datetime import datetime, timedelta, timezone
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from datetime import datetime, timezone
 from pathlib import Path
 from typing import Iterator
 import hashlib
 import random
 import math
+import time
+
+from acqc_demo.dataset import (
+    ColumnarDataset,
+    QC_BAD,
+    QC_NAMES,
+    QC_OK,
+    QC_SUSPECT,
+    datetime_to_ns,
+    ns_to_iso,
+    ns_to_iso_many,
+)
+from acqc_demo.storage import save_binary
 
 
 @dataclass
@@ -37,14 +52,77 @@ class QualitySample:
     source: str  # "LAB" or "SIMULATED"
 
 
-def _isoformat_z(ts: datetime) -> str:
-    if ts.tzinfo is None:
-        return ts.isoformat() + "Z"
-    return ts.astimezone(timezone.utc).isoformat().replace("+00:00", "Z")
+def _utc_now_iso() -> str:
+    return ns_to_iso(time.time_ns())
 
 
-def _utc_now_iso() -> str:
-    return _isoformat_z(datetime.now(timezone.utc))
+def tag_rng(seed: int, *stream: object) -> random.Random:
+    """
+    Independent random stream for (seed, *stream), e.g. (seed, tag_id, shard).
+    
+    Streams are derived by hashing, so they do not depend on generation
+    order or on which process generates them.
+    """
+    key = ":".join(str(part) for part in (seed, *stream)).encode()
+    return random.Random(int.from_bytes(hashlib.sha256(key).digest()[:8], "little"))
+
+
+def _normal_column(rng: random.Random, n: int, sigma: float) -> list[float]:
+    """n normal(0, sigma) draws by the Box-Muller transform, one column at a time."""
+    rand = rng.random
+    log, sqrt = math.log, math.sqrt
+    two_pi = 2 * math.pi
+    radii = [sigma * sqrt(-2.0 * log(1.0 - rand())) for _ in range((n + 1) // 2)]
+    angles = [two_pi * rand() for _ in radii]
+    cos, sin = math.cos, math.sin
+    draws = [r * cos(a) for r, a in zip(radii, angles)]
+    draws += [r * sin(a) for r, a in zip(radii, angles)]
+    return draws[:n]
+
+
+def generate_tag_columns(
+    base_value: float,
+    noise_std: float,
+    n_samples: int = 100,
+    rng: random.Random | None = None,
+    start_index: int = 0,
+) -> tuple[array, array]:
+    """
+    Generate synthetic (values, qc_flags) arrays for a process tag.
+    
+    Args:
+        rng: Random stream (default: the global `random` state)
+        start_index: Sample index of the first row, so shards continue the
+            trend and drift of the previous shard
+    """
+    rng = rng or random
+    rand = rng.random
+    floor = math.floor
+    nan = float("nan")
+    rows = range(start_index, start_index + n_samples)
+    
+    # Random draws column by column: noise, then the two QC draws
+    noise = _normal_column(rng, n_samples, noise_std)
+    suspect = [rand() < 0.02 for _ in rows]
+    bad = [rand() < 0.005 for _ in rows]
+    
+    # Add trend + noise + occasional drift (period of 50 samples),
+    # rounded to 4 decimals
+    drift = [0.1 * base_value * math.sin(2 * math.pi * k / 50) for k in range(50)]
+    values = array("d", [
+        nan if is_bad else floor(
+            (base_value + 0.001 * i * base_value + e + drift[i % 50]) * 1e4 + 0.5
+        ) / 1e4
+        for i, e, is_bad in zip(rows, noise, bad)
+    ])
+    
+    # Simulate QC flags (BAD samples are NaN)
+    qc_flags = array("B", [
+        QC_BAD if is_bad else QC_SUSPECT if is_suspect else QC_OK
+        for is_suspect, is_bad in zip(suspect, bad)
+    ])
+    
+    return values, qc_flags
 
 
 def generate_tag_series(
@@ -57,31 +135,18 @@ def generate_tag_series(
     start_time: datetime | None = None,
 ) -> Iterator[TagSample]:
     """Generate a synthetic time series for a process tag."""
-    start = start_time or datetime.now(timezone.utc)
+    start_ns = time.time_ns() if start_time is None else datetime_to_ns(start_time)
+    step_ns = interval_seconds * 1_000_000_000
+    timestamps = ns_to_iso_many([start_ns + i * step_ns for i in range(n_samples)])
+    values, qc_flags = generate_tag_columns(base_value, noise_std, n_samples)
     
     for i in range(n_samples):
-        ts = start + timedelta(seconds=i * interval_seconds)
-        # Add trend + noise + occasional drift
-        trend = 0.001 * i * base_value
-        noise = random.gauss(0, noise_std)
-        drift = 0.1 * base_value * math.sin(2 * math.pi * i / 50)
-        
-        value = base_value + trend + noise + drift
-        
-        # Simulate QC flags
-        qc = "OK"
-        if random.random() < 0.02:
-            qc = "SUSPECT"
-        if random.random() < 0.005:
-            qc = "BAD"
-            value = float("nan")
-        
         yield TagSample(
-            timestamp=_isoformat_z(ts),
+            timestamp=timestamps[i],
             tag_id=tag_id,
-            value=round(value, 4),
+            value=values[i],
             unit=unit,
-            qc_flag=qc,
+            qc_flag=QC_NAMES[qc_flags[i]],
         )
 
 
@@ -122,70 +187,252 @@ def generate_quality_variable(
         )
 
 
-def generate_demo_dataset(
-    n_samples: int = 100,
-    output_dir: Path | None = None,
-) -> dict:
+def generate_quality_column(
+    value_columns: list[array],
+    rng: random.Random | None = None,
+) -> array:
     """
-    Generate a complete demo dataset.
+    Generate the simulated quality variable from tag value columns.
     
-    Returns dict with tags and quality data, optionally saves to files.
+    Same relationship as generate_quality_variable(), computed column by
+    column.
     """
-    start_time = datetime(2026, 1, 1, 8, 0, 0, tzinfo=timezone.utc)
-    
-    # Define process tags (simulated)
-    tag_configs = [
-        ("TI-101", 350.0, 5.0, "°C"),      # Temperature
-        ("PI-201", 12.5, 0.3, "bar"),       # Pressure  
-        ("FI-301", 1500.0, 50.0, "kg/h"),   # Flow
-        ("AI-401", 0.85, 0.02, "ratio"),    # Analyzer (simulated PAT)
-    ]
+    n = len(value_columns[0]) if value_columns else 0
+    floor = math.floor
+    
+    base = [90.0] * n
+    for col in value_columns:
+        base = [b + 0.01 * v if v == v else b for b, v in zip(base, col)]  # skip NaN
+    # Add measurement noise (lab uncertainty), rounded to 2 decimals
+    noise = _normal_column(rng or random, n, 0.3)
+    return array("d", [floor((b + e) * 100 + 0.5) / 100 for b, e in zip(base, noise)])
+
+
+def _quality_hash(dataset: ColumnarDataset) -> str:
+    """Hash of the quality rows, identical to hashing the dict format."""
+    rows = dataset.quality_records()
+    return hashlib.sha256(json.dumps(rows).encode()).hexdigest()[:16]
+
+
+# Define process tags (simulated)
+DEMO_TAG_CONFIGS = [
+    ("TI-101", 350.0, 5.0, "°C"),      # Temperature
+    ("PI-201", 12.5, 0.3, "bar"),       # Pressure  
+    ("FI-301", 1500.0, 50.0, "kg/h"),   # Flow
+    ("AI-401", 0.85, 0.02, "ratio"),    # Analyzer (simulated PAT)
+]
+DEMO_START_TIME = datetime(2026, 1, 1, 8, 0, 0, tzinfo=timezone.utc)
+
+
+def synthetic_tag_configs(n_tags: int) -> list[tuple[str, float, float, str]]:
+    """
+    Tag configs for load tests: the demo tags first, then copies of them
+    under new IDs (e.g. TI-105, PI-206, ...).
+    """
+    configs = []
+    for i in range(n_tags):
+        tag_id, base, noise, unit = DEMO_TAG_CONFIGS[i % len(DEMO_TAG_CONFIGS)]
+        if i >= len(DEMO_TAG_CONFIGS):
+            prefix, number = tag_id.split("-")
+            tag_id = f"{prefix}-{int(number) + i}"
+        configs.append((tag_id, base, noise, unit))
+    return configs
+
+
+def _generate_columns(
+    tag_configs: list[tuple[str, float, float, str]],
+    start_ns: int,
+    interval_ns: int,
+    start_index: int,
+    n_samples: int,
+    seed: int | None,
+    shard: int = 0,
+) -> ColumnarDataset:
+    """Rows [start_index, start_index + n_samples) of a synthetic dataset."""
+    first_ns = start_ns + start_index * interval_ns
+    timestamps = array("q", range(first_ns, first_ns + n_samples * interval_ns, interval_ns))
     
-    all_tags = {}
-    tag_lists = []
+    values = {}
+    qc_flags = {}
+    units = {}
     
     for tag_id, base, noise, unit in tag_configs:
-        samples = list(generate_tag_series(
-            tag_id=tag_id,
+        values[tag_id], qc_flags[tag_id] = generate_tag_columns(
             base_value=base,
             noise_std=noise,
-            unit=unit,
             n_samples=n_samples,
-            interval_seconds=60,
-            start_time=start_time,
-        ))
-        all_tags[tag_id] = samples
-        tag_lists.append(samples)
-    
-    # Generate quality variable
-    quality_samples = list(generate_quality_variable(
-        tag_samples=tag_lists,
-        variable_id="RON",
-        unit="octane",
-    ))
-    
-    dataset = {
-        "metadata": {
-            "generated_at": _utc_now_iso(),
-            "n_samples": n_samples,
-            "tags": [t[0] for t in tag_configs],
-            "quality_variable": "RON",
-            "hash": hashlib.sha256(
-                json.dumps([asdict(s) for s in quality_samples]).encode()
-            ).hexdigest()[:16],
-        },
-        "tags": {k: [asdict(s) for s in v] for k, v in all_tags.items()},
-        "quality": [asdict(s) for s in quality_samples],
+            rng=None if seed is None else tag_rng(seed, tag_id, shard),
+            start_index=start_index,
+        )
+        units[tag_id] = unit
+    
+    # Generate quality variable from the demo tags
+    quality_inputs = [values[t[0]] for t in DEMO_TAG_CONFIGS if t[0] in values]
+    return ColumnarDataset(
+        timestamps=timestamps,
+        values=values,
+        qc_flags=qc_flags,
+        units=units,
+        quality=generate_quality_column(
+            quality_inputs,
+            rng=None if seed is None else tag_rng(seed, "RON", shard),
+        ),
+        quality_variable="RON",
+        quality_unit="octane",
+        quality_source="SIMULATED",
+    )
+
+
+def generate_demo_dataset(
+    n_samples: int = 100,
+    output_dir: Path | None = None,
+    columnar: bool = False,
+    dataset_format: str = "json",
+    seed: int | None = None,
+    n_tags: int | None = None,
+) -> dict | ColumnarDataset:
+    """
+    Generate a complete demo dataset.
+    
+    Data is generated directly into a ColumnarDataset. Returns it as-is
+    when `columnar` is True, otherwise converted to the dict format with
+    tags and quality data. Optionally saves to files: dataset.json, or
+    dataset.acqc (storage module) when `dataset_format` is "binary".
+    
+    With a `seed`, every tag gets its own random stream (tag_rng) and
+    the values are reproducible; without one the global `random` state
+    is used. `n_tags` widens the dataset with synthetic_tag_configs() for
+    load tests; the quality variable still depends on the demo tags only.
+    """
+    interval_ns = 60 * 1_000_000_000
+    tag_configs = DEMO_TAG_CONFIGS if n_tags is None else synthetic_tag_configs(n_tags)
+    dataset = _generate_columns(
+        tag_configs,
+        start_ns=datetime_to_ns(DEMO_START_TIME),
+        interval_ns=interval_ns,
+        start_index=0,
+        n_samples=n_samples,
+        seed=seed,
+    )
+    dataset.metadata = {
+        "generated_at": _utc_now_iso(),
+        "n_samples": n_samples,
+        "tags": [t[0] for t in tag_configs],
+        "quality_variable": "RON",
+        "hash": _quality_hash(dataset),
     }
+    if seed is not None:
+        dataset.metadata["seed"] = seed
+    
+    binary = dataset_format == "binary"
+    if (output_dir and not binary) or not columnar:
+        as_dict = dataset.to_dict()
     
     if output_dir:
         output_dir = Path(output_dir)
         output_dir.mkdir(parents=True, exist_ok=True)
         
-        with open(output_dir / "dataset.json", "w") as f:
-            json.dump(dataset, f, indent=2)
+        if binary:
+            save_binary(dataset, output_dir / "dataset.acqc")
+        else:
+            with open(output_dir / "dataset.json", "w") as f:
+                json.dump(as_dict, f, indent=2)
     
-    return dataset
+    return dataset if columnar else as_dict
+
+
+def _generate_shard(task: tuple) -> dict:
+    """Generate one shard, write it to disk and hash it (pool worker)."""
+    output_dir, shard, tag_configs, start_ns, interval_ns, start_index, n_samples, seed, compress = task
+    dataset = _generate_columns(
+        tag_configs, start_ns, interval_ns, start_index, n_samples, seed, shard
+    )
+    # No wall-clock fields: the same seed must give the same bytes
+    dataset.metadata = {"seed": seed, "shard": shard, "start_index": start_index}
+    path = save_binary(dataset, Path(output_dir) / f"shard-{shard:05d}.acqc", compress=compress)
+    
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return {
+        "file": path.name,
+        "start_index": start_index,
+        "n_samples": n_samples,
+        "sha256": digest.hexdigest(),
+    }
+
+
+def generate_sharded_dataset(
+    output_dir: Path,
+    n_samples: int,
+    n_tags: int = 4,
+    seed: int = 0,
+    shard_rows: int = 100_000,
+    workers: int = 1,
+    interval_seconds: int = 60,
+    compress: bool = False,
+) -> dict:
+    """
+    Generate a large synthetic dataset as binary shards for load tests.
+    
+    Each shard holds `shard_rows` consecutive samples of every tag and is
+    generated from its own random streams (tag_rng(seed, tag_id, shard)),
+    so the shard files are bit-identical for a given seed and shard_rows
+    whatever the number of workers.
+    
+    Args:
+        output_dir: Directory for shard-NNNNN.acqc files and manifest.json
+        n_samples: Samples per tag
+        n_tags: Number of tags (see synthetic_tag_configs)
+        seed: Random seed
+        shard_rows: Samples per shard
+        workers: Processes generating shards in parallel
+        interval_seconds: Sampling interval
+        compress: zlib-compress the shards
+    
+    Returns:
+        The manifest (also written to manifest.json); `hash` chains the
+        per-shard SHA-256 digests in shard order
+    """
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    tag_configs = synthetic_tag_configs(n_tags)
+    start_ns = datetime_to_ns(DEMO_START_TIME)
+    interval_ns = interval_seconds * 1_000_000_000
+    tasks = [
+        (
+            str(output_dir), shard, tag_configs, start_ns, interval_ns,
+            start, min(shard_rows, n_samples - start), seed, compress,
+        )
+        for shard, start in enumerate(range(0, n_samples, shard_rows))
+    ]
+    
+    if workers <= 1 or len(tasks) <= 1:
+        shards = [_generate_shard(task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            shards = list(pool.map(_generate_shard, tasks))
+    
+    # Streamed dataset hash: shard digests in order, never the full data
+    dataset_hash = hashlib.sha256()
+    for shard in shards:
+        dataset_hash.update(bytes.fromhex(shard["sha256"]))
+    
+    manifest = {
+        "generated_at": _utc_now_iso(),
+        "seed": seed,
+        "n_samples": n_samples,
+        "tags": [t[0] for t in tag_configs],
+        "quality_variable": "RON",
+        "interval_seconds": interval_seconds,
+        "shard_rows": shard_rows,
+        "shards": shards,
+        "hash": dataset_hash.hexdigest()[:16],
+    }
+    with open(output_dir / "manifest.json", "w") as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
 
 
 if __name__ == "__main__":
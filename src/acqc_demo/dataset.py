@@ -0,0 +1,271 @@
+"""
+Columnar dataset module for ACQC demo.
+
+Stores process data as contiguous typed arrays instead of one dict per sample:
+- int64 epoch-ns timestamps shared by all tags
+- float64 values per tag
+- uint8 QC flag codes per tag
+
+Uses the standard library `array` module, so the runtime stays dependency-free.
+
+Timestamps stay integers through the pipeline; ISO-8601 strings are made
+only at the output boundary (ns_to_iso, ns_to_iso_many) from cached day
+and second prefixes, without a datetime per sample.
+"""
+
+import os
+from array import array
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any
+
+
+QC_OK = 0
+QC_SUSPECT = 1
+QC_BAD = 2
+
+QC_NAMES = ("OK", "SUSPECT", "BAD")
+QC_CODES = {name: code for code, name in enumerate(QC_NAMES)}
+
+# `quality` enum of schemas/tag_timeseries.schema.json -> QC code
+SCHEMA_QUALITY_CODES = {"GOOD": QC_OK, "UNCERTAIN": QC_SUSPECT, "BAD": QC_BAD, "MISSING": QC_BAD}
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+_NS_PER_US = 1_000
+_NS_PER_S = 1_000_000_000
+
+# Epoch day -> "YYYY-MM-DDT"; cleared when full (a long replay spans many days)
+_DAY_PREFIXES: dict[int, str] = {}
+_MAX_DAY_PREFIXES = 4096
+# Last formatted epoch second and its "YYYY-MM-DDTHH:MM:SS" (one tuple: thread-safe swap)
+_last_second: tuple[int, str] = (0, "1970-01-01T00:00:00")
+
+
+def data_dir(name: str, env_var: str) -> Path:
+    """
+    Directory of repository data files (`schemas`, `ssot`): `$env_var`
+    when set, else `name` at the root of the source checkout.
+    
+    Raises FileNotFoundError naming the override when the directory is
+    missing, e.g. in an installed package without the repository files.
+    """
+    override = os.environ.get(env_var)
+    path = Path(override) if override else Path(__file__).resolve().parents[2] / name
+    if not path.is_dir():
+        raise FileNotFoundError(f"{name} directory not found: {path} (set {env_var} to its location)")
+    return path
+
+
+def datetime_to_ns(ts: datetime) -> int:
+    """Convert a datetime to integer epoch nanoseconds (naive means UTC)."""
+    if ts.tzinfo is None:
+        ts = ts.replace(tzinfo=timezone.utc)
+    return (ts - _EPOCH) // timedelta(microseconds=1) * _NS_PER_US
+
+
+def ns_to_datetime(ts_ns: int) -> datetime:
+    """Convert integer epoch nanoseconds to an aware UTC datetime."""
+    return _EPOCH + timedelta(microseconds=ts_ns // _NS_PER_US)
+
+
+def iso_to_ns(ts: str) -> int:
+    """Parse an ISO-8601 timestamp ("Z" or offset suffix) to epoch nanoseconds."""
+    if ts.endswith("Z"):
+        ts = ts[:-1] + "+00:00"
+    return datetime_to_ns(datetime.fromisoformat(ts))
+
+
+def _second_prefix(second: int) -> str:
+    """Text "YYYY-MM-DDTHH:MM:SS" of an epoch second."""
+    global _last_second
+    cached = _last_second
+    if cached[0] == second:
+        return cached[1]
+    day, second_of_day = divmod(second, 86_400)
+    prefix = _DAY_PREFIXES.get(day)
+    if prefix is None:
+        if len(_DAY_PREFIXES) >= _MAX_DAY_PREFIXES:
+            _DAY_PREFIXES.clear()
+        prefix = _DAY_PREFIXES[day] = (_EPOCH + timedelta(days=day)).date().isoformat() + "T"
+    hours, rest = divmod(second_of_day, 3600)
+    minutes, seconds = divmod(rest, 60)
+    prefix = f"{prefix}{hours:02d}:{minutes:02d}:{seconds:02d}"
+    _last_second = (second, prefix)
+    return prefix
+
+
+def ns_to_iso(ts_ns: int) -> str:
+    """
+    Format epoch nanoseconds as an ISO-8601 UTC string with "Z" suffix.
+    
+    Same text as datetime.isoformat(): truncated to microseconds, which are
+    omitted when zero.
+    """
+    second, ns = divmod(ts_ns, _NS_PER_S)
+    us = ns // _NS_PER_US
+    if us:
+        return f"{_second_prefix(second)}.{us:06d}Z"
+    return _second_prefix(second) + "Z"
+
+
+def ns_to_iso_many(timestamps: Any) -> list[str]:
+    """ns_to_iso over a column; samples within the same second share its prefix."""
+    out = []
+    append = out.append
+    last = prefix = None
+    for ts_ns in timestamps:
+        second, ns = divmod(ts_ns, _NS_PER_S)
+        if second != last:
+            last = second
+            prefix = _second_prefix(second)
+        us = ns // _NS_PER_US
+        append(f"{prefix}.{us:06d}Z" if us else prefix + "Z")
+    return out
+
+
+@dataclass
+class ColumnarDataset:
+    """
+    Column-oriented dataset: one typed array per tag over a shared time index.
+    
+    `quality_timestamps` defaults to the tag timestamps; it is kept separate
+    because lab results do not have to share the process sampling grid.
+    
+    Columns loaded from a binary file (storage.load_binary) are read-only
+    memoryviews with the same typecodes instead of arrays.
+    """
+    timestamps: array  # int64 epoch ns ("q")
+    values: dict[str, array]  # tag_id -> float64 ("d")
+    qc_flags: dict[str, array]  # tag_id -> uint8 QC code ("B")
+    units: dict[str, str]
+    metadata: dict[str, Any] = field(default_factory=dict)
+    quality: array | None = None  # float64 ("d")
+    quality_timestamps: array | None = None  # int64 epoch ns ("q")
+    quality_variable: str | None = None
+    quality_unit: str | None = None
+    quality_source: str | None = None
+    
+    def __post_init__(self):
+        if self.quality is not None and self.quality_timestamps is None:
+            self.quality_timestamps = self.timestamps
+    
+    @property
+    def n_samples(self) -> int:
+        return len(self.timestamps)
+    
+    @property
+    def tag_ids(self) -> list[str]:
+        return list(self.values.keys())
+    
+    def column(self, tag_id: str) -> tuple[array, array]:
+        """Return (values, qc_flags) arrays for a tag."""
+        return self.values[tag_id], self.qc_flags[tag_id]
+    
+    def row(self, i: int) -> dict[str, dict[str, Any]]:
+        """Tag values and QC flags at sample index i."""
+        return {
+            tag_id: {"value": values[i], "qc_flag": QC_NAMES[self.qc_flags[tag_id][i]]}
+            for tag_id, values in self.values.items()
+        }
+    
+    def to_dict(self) -> dict[str, Any]:
+        """Convert to the dict-of-lists-of-dicts format of generate_demo_dataset()."""
+        iso = ns_to_iso_many(self.timestamps)
+        
+        tags = {}
+        for tag_id, values in self.values.items():
+            qc_flags = self.qc_flags[tag_id]
+            unit = self.units.get(tag_id, "")
+            tags[tag_id] = [
+                {
+                    "timestamp": iso[i],
+                    "tag_id": tag_id,
+                    "value": values[i],
+                    "unit": unit,
+                    "qc_flag": QC_NAMES[qc_flags[i]],
+                }
+                for i in range(len(values))
+            ]
+        
+        quality = self.quality_records(
+            iso if self.quality_timestamps is self.timestamps else None
+        )
+        
+        metadata = dict(self.metadata)
+        metadata["n_samples"] = self.n_samples
+        metadata["tags"] = self.tag_ids
+        
+        return {"metadata": metadata, "tags": tags, "quality": quality}
+    
+    def quality_records(self, iso: list[str] | None = None) -> list[dict[str, Any]]:
+        """Quality samples as dicts (QualitySample field order)."""
+        if self.quality is None:
+            return []
+        if iso is None:
+            iso = ns_to_iso_many(self.quality_timestamps)
+        return [
+            {
+                "timestamp": iso[i],
+                "variable_id": self.quality_variable,
+                "value": value,
+                "unit": self.quality_unit,
+                "source": self.quality_source,
+            }
+            for i, value in enumerate(self.quality)
+        ]
+    
+    @classmethod
+    def from_dict(cls, dataset: dict[str, Any]) -> "ColumnarDataset":
+        """
+        Build from the dict format of generate_demo_dataset().
+        
+        Tag lists shorter than the longest one are padded with NaN/BAD
+        samples, which is how missing samples were treated downstream.
+        """
+        tags = dataset.get("tags", {})
+        longest = max(tags.values(), key=len, default=[])
+        timestamps = array("q", (iso_to_ns(s["timestamp"]) for s in longest))
+        n = len(timestamps)
+        
+        values = {}
+        qc_flags = {}
+        units = {}
+        for tag_id, samples in tags.items():
+            col = array("d", (float(s["value"]) for s in samples))
+            qc = array("B", (_qc_code(s["qc_flag"]) for s in samples))
+            pad = n - len(samples)
+            if pad:
+                col.extend([float("nan")] * pad)
+                qc.extend([QC_BAD] * pad)
+            values[tag_id] = col
+            qc_flags[tag_id] = qc
+            units[tag_id] = samples[0]["unit"] if samples else ""
+        
+        kwargs: dict[str, Any] = {}
+        quality = dataset.get("quality") or []
+        if quality:
+            quality_ts = array("q", (iso_to_ns(s["timestamp"]) for s in quality))
+            kwargs = {
+                "quality": array("d", (float(s["value"]) for s in quality)),
+                "quality_timestamps": timestamps if quality_ts == timestamps else quality_ts,
+                "quality_variable": quality[0]["variable_id"],
+                "quality_unit": quality[0]["unit"],
+                "quality_source": quality[0]["source"],
+            }
+        
+        return cls(
+            timestamps=timestamps,
+            values=values,
+            qc_flags=qc_flags,
+            units=units,
+            metadata=dict(dataset.get("metadata", {})),
+            **kwargs,
+        )
+
+
+def _qc_code(qc_flag: str) -> int:
+    try:
+        return QC_CODES[qc_flag]
+    except KeyError:
+        raise ValueError(f"Unknown QC flag: {qc_flag!r}") from None
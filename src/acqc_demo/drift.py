@@ -0,0 +1,507 @@
+"""
+Drift and OOD detection module for ACQC demo.
+
+Input-space checks run next to every prediction:
+- Hotelling T² and SPE (squared PCA residual) against a reference model
+  fitted on in-domain data; with all components retained T² is the
+  squared Mahalanobis distance
+- Per-tag range checks (expected min/max from the tag dictionary)
+- Streaming drift tests: two-sided CUSUM per tag (mean shifts in
+  reference standard deviations) and Page-Hinkley on SPE (a slow rise of
+  the residual, i.e. a change in the correlation structure)
+
+Reference statistics are accumulated incrementally (RunningCovariance,
+O(k²) per sample, mergeable across chunks). Scoring one sample costs
+O(k·a) for k tags and a retained components. DriftDetector.update() is
+the streaming mode; DriftDetector.evaluate() scores whole columns for
+retrospective evaluation with the same arithmetic, so both modes give
+identical results.
+"""
+
+import math
+from array import array
+from dataclasses import asdict, dataclass, field
+from statistics import NormalDist
+from typing import Any
+
+from acqc_demo.dataset import ColumnarDataset, QC_OK
+from acqc_demo.linalg import Matrix, jacobi_eigh
+from acqc_demo.tags import TagInfo
+
+
+_NAN = float("nan")
+_INF = float("inf")
+
+
+class RunningCovariance:
+    """
+    Mean and co-moment matrix updated one sample at a time (Welford).
+    
+    update() is O(k²); update_columns() folds in a whole block at once and
+    merge() combines accumulators built on separate chunks (Chan et al.).
+    """
+    
+    def __init__(self, k: int):
+        self.k = k
+        self.n = 0
+        self.mean = [0.0] * k
+        self.comoment = [[0.0] * k for _ in range(k)]
+    
+    def update(self, x: list[float]) -> None:
+        self.n += 1
+        mean = self.mean
+        dx = [xi - mi for xi, mi in zip(x, mean)]
+        inv_n = 1.0 / self.n
+        for i in range(self.k):
+            mean[i] += dx[i] * inv_n
+        dy = [xi - mi for xi, mi in zip(x, mean)]
+        for i, row in enumerate(self.comoment):
+            dxi = dx[i]
+            for j in range(self.k):
+                row[j] += dxi * dy[j]
+    
+    def update_columns(self, columns: list[list[float]]) -> None:
+        """Fold in a block of samples given column-wise (k columns of equal length)."""
+        n = len(columns[0]) if columns else 0
+        if n == 0:
+            return
+        block = RunningCovariance(self.k)
+        block.n = n
+        block.mean = [math.fsum(col) / n for col in columns]
+        centered = [[x - m for x in col] for col, m in zip(columns, block.mean)]
+        for i in range(self.k):
+            for j in range(i, self.k):
+                c = math.fsum(a * b for a, b in zip(centered[i], centered[j]))
+                block.comoment[i][j] = block.comoment[j][i] = c
+        self.merge(block)
+    
+    def merge(self, other: "RunningCovariance") -> None:
+        if other.n == 0:
+            return
+        n = self.n + other.n
+        delta = [b - a for a, b in zip(self.mean, other.mean)]
+        w = self.n * other.n / n
+        for i in range(self.k):
+            for j in range(self.k):
+                self.comoment[i][j] += other.comoment[i][j] + delta[i] * delta[j] * w
+        self.mean = [a + d * other.n / n for a, d in zip(self.mean, delta)]
+        self.n = n
+    
+    def covariance(self) -> Matrix:
+        """Sample covariance (n - 1 denominator)."""
+        if self.n < 2:
+            raise ValueError("Covariance needs at least 2 samples")
+        return [[c / (self.n - 1) for c in row] for row in self.comoment]
+
+
+def chi2_quantile(p: float, dof: float) -> float:
+    """Chi-square quantile (Wilson-Hilferty approximation)."""
+    z = NormalDist().inv_cdf(p)
+    c = 2.0 / (9.0 * dof)
+    return dof * (1.0 - c + z * math.sqrt(c)) ** 3
+
+
+def spe_limit(residual_eigenvalues: list[float], confidence: float) -> float:
+    """SPE (Q statistic) control limit, Jackson-Mudholkar."""
+    theta1 = math.fsum(residual_eigenvalues)
+    theta2 = math.fsum(v ** 2 for v in residual_eigenvalues)
+    theta3 = math.fsum(v ** 3 for v in residual_eigenvalues)
+    if theta1 <= 0.0 or theta2 <= 0.0:
+        return _INF  # no residual space: SPE is identically zero
+    h0 = 1.0 - 2.0 * theta1 * theta3 / (3.0 * theta2 ** 2)
+    z = NormalDist().inv_cdf(confidence)
+    base = (
+        z * math.sqrt(2.0 * theta2 * h0 ** 2) / theta1
+        + 1.0
+        + theta2 * h0 * (h0 - 1.0) / theta1 ** 2
+    )
+    return theta1 * base ** (1.0 / h0)
+
+
+@dataclass
+class PcaMonitor:
+    """
+    Reference model of the inputs: standardization and PCA loadings.
+    
+    Args:
+        tags: Monitored tags (column order)
+        mean, scale: Reference mean and standard deviation per tag
+        loadings: k x a matrix, one retained principal direction per column
+        eigenvalues: Variances of the retained components
+        residual_eigenvalues: Variances of the discarded components
+        t2_limit, spe_limit: Control limits at `confidence`
+        n_reference: Samples the reference was fitted on
+    """
+    tags: list[str]
+    mean: list[float]
+    scale: list[float]
+    loadings: list[list[float]]
+    eigenvalues: list[float]
+    residual_eigenvalues: list[float]
+    t2_limit: float
+    spe_limit: float
+    confidence: float = 0.99
+    n_reference: int = 0
+    
+    @classmethod
+    def from_statistics(
+        cls,
+        tags: list[str],
+        stats: RunningCovariance,
+        explained: float = 0.95,
+        n_components: int | None = None,
+        confidence: float = 0.99,
+    ) -> "PcaMonitor":
+        """
+        Fit the PCA model from accumulated reference statistics.
+        
+        Args:
+            explained: Keep the fewest components explaining this share of
+                the (standardized) variance, leaving at least one for SPE
+            n_components: Explicit number of components (overrides
+                `explained`; len(tags) gives plain Mahalanobis T²)
+        """
+        k = len(tags)
+        cov = stats.covariance()
+        scale = [math.sqrt(cov[i][i]) or 1.0 for i in range(k)]
+        corr = [[cov[i][j] / (scale[i] * scale[j]) for j in range(k)] for i in range(k)]
+        values, vectors = jacobi_eigh(corr)
+        values = [max(v, 0.0) for v in values]
+        
+        if n_components is None:
+            total = math.fsum(values) or 1.0
+            a, acc = 0, 0.0
+            while a < k and acc < explained * total:
+                acc += values[a]
+                a += 1
+            n_components = max(1, min(a, k - 1))
+        a = n_components
+        # Near-singular components would blow up T²
+        floor = 1e-9 * (values[0] or 1.0)
+        retained = [max(v, floor) for v in values[:a]]
+        
+        return cls(
+            tags=list(tags),
+            mean=list(stats.mean),
+            scale=scale,
+            loadings=[row[:a] for row in vectors],
+            eigenvalues=retained,
+            residual_eigenvalues=values[a:],
+            t2_limit=chi2_quantile(confidence, a),
+            spe_limit=spe_limit(values[a:], confidence),
+            confidence=confidence,
+            n_reference=stats.n,
+        )
+    
+    @classmethod
+    def fit(
+        cls,
+        dataset: ColumnarDataset,
+        tags: list[str],
+        **options: Any,
+    ) -> "PcaMonitor":
+        """Fit on the rows of `dataset` where every tag is QC OK and finite."""
+        columns = [dataset.column(t) for t in tags]
+        keep = [
+            i for i in range(dataset.n_samples)
+            if all(qc[i] == QC_OK and values[i] == values[i] for values, qc in columns)
+        ]
+        stats = RunningCovariance(len(tags))
+        stats.update_columns([[values[i] for i in keep] for values, _ in columns])
+        return cls.from_statistics(tags, stats, **options)
+    
+    def scores(self, columns: list[list[float]]) -> tuple[list[float], list[float]]:
+        """
+        T² and SPE for samples given column-wise (one column per tag).
+        
+        Rows with a NaN input score NaN.
+        """
+        z = [
+            [(x - m) / s for x in col]
+            for col, m, s in zip(columns, self.mean, self.scale)
+        ]
+        n = len(z[0]) if z else 0
+        t2 = [0.0] * n
+        recon = [[0.0] * n for _ in z]
+        for c, lam in enumerate(self.eigenvalues):
+            t = [0.0] * n
+            for j, zj in enumerate(z):
+                p = self.loadings[j][c]
+                t = [acc + p * v for acc, v in zip(t, zj)]
+            t2 = [acc + ti * ti / lam for acc, ti in zip(t2, t)]
+            for j in range(len(z)):
+                p = self.loadings[j][c]
+                recon[j] = [r + p * ti for r, ti in zip(recon[j], t)]
+        spe = [0.0] * n
+        for zj, rj in zip(z, recon):
+            spe = [acc + (v - r) ** 2 for acc, v, r in zip(spe, zj, rj)]
+        return t2, spe
+
+
+class Cusum:
+    """Two-sided tabular CUSUM on standardized values (alarm while above h)."""
+    
+    __slots__ = ("k", "h", "upper", "lower")
+    
+    def __init__(self, k: float = 0.5, h: float = 8.0):
+        self.k = k
+        self.h = h
+        self.upper = 0.0
+        self.lower = 0.0
+    
+    def update(self, z: float) -> bool:
+        if z == z:
+            self.upper = max(0.0, self.upper + z - self.k)
+            self.lower = max(0.0, self.lower - z - self.k)
+        return self.upper > self.h or self.lower > self.h
+
+
+class PageHinkley:
+    """Page-Hinkley test for an increase of the mean; restarts after an alarm."""
+    
+    __slots__ = ("delta", "threshold", "n", "mean", "cumulative", "minimum")
+    
+    def __init__(self, delta: float = 0.1, threshold: float = 25.0):
+        self.delta = delta
+        self.threshold = threshold
+        self.reset()
+    
+    def reset(self) -> None:
+        self.n = 0
+        self.mean = 0.0
+        self.cumulative = 0.0
+        self.minimum = 0.0
+    
+    def update(self, x: float) -> bool:
+        if x != x:
+            return False
+        self.n += 1
+        self.mean += (x - self.mean) / self.n
+        self.cumulative += x - self.mean - self.delta
+        self.minimum = min(self.minimum, self.cumulative)
+        if self.cumulative - self.minimum > self.threshold:
+            self.reset()
+            return True
+        return False
+
+
+@dataclass
+class DetectorResult:
+    """Checks for one sample."""
+    t2: float
+    spe: float
+    ood: bool  # T² or SPE above its limit, or a tag out of range
+    out_of_range: list[str] = field(default_factory=list)
+    drift: list[str] = field(default_factory=list)  # tags in CUSUM alarm, "SPE" for Page-Hinkley
+
+
+@dataclass
+class DetectorColumns:
+    """Checks for a whole dataset (batch mode), one entry per row."""
+    t2: array
+    spe: array
+    ood: bytearray
+    out_of_range: bytearray
+    drift: bytearray
+
+
+def ranges_from_dictionary(
+    dictionary: dict[str, TagInfo],
+    aliases: dict[str, str] | None = None,
+) -> dict[str, tuple[float, float]]:
+    """
+    Expected (min, max) per tag from tags.load_tag_dictionary().
+    
+    Args:
+        aliases: Dataset tag -> dictionary tag, for tags named differently
+            in the data (e.g. {"TI-101": "TIC-201.PV"})
+    """
+    names = aliases or {tag_id: tag_id for tag_id in dictionary}
+    ranges = {}
+    for tag_id, entry in names.items():
+        info = dictionary.get(entry)
+        if info is None or (info.expected_min is None and info.expected_max is None):
+            continue
+        ranges[tag_id] = (
+            -_INF if info.expected_min is None else info.expected_min,
+            _INF if info.expected_max is None else info.expected_max,
+        )
+    return ranges
+
+
+class DriftDetector:
+    """
+    OOD and drift checks for a set of input tags.
+    
+    Example::
+        
+        monitor = PcaMonitor.fit(reference, ["TI-101", "PI-201", "FI-301", "AI-401"])
+        detector = DriftDetector(monitor, ranges_from_dictionary(load_tag_dictionary()))
+        sensor = SoftSensor(config, detector=detector)
+    
+    Args:
+        monitor: Reference PCA model
+        ranges: Expected (min, max) per tag; tags may be outside `monitor.tags`
+        cusum_k, cusum_h: CUSUM allowance and decision interval, in
+            reference standard deviations
+        ph_delta, ph_threshold: Page-Hinkley tolerance and threshold, on
+            SPE relative to its control limit
+    """
+    
+    def __init__(
+        self,
+        monitor: PcaMonitor,
+        ranges: dict[str, tuple[float, float]] | None = None,
+        cusum_k: float = 0.5,
+        cusum_h: float = 8.0,
+        ph_delta: float = 0.1,
+        ph_threshold: float = 25.0,
+    ):
+        self.monitor = monitor
+        self.ranges = {t: (float(lo), float(hi)) for t, (lo, hi) in (ranges or {}).items()}
+        self.cusum_k = cusum_k
+        self.cusum_h = cusum_h
+        self.ph_delta = ph_delta
+        self.ph_threshold = ph_threshold
+        self.reset()
+    
+    @classmethod
+    def from_config(cls, config: dict[str, Any]) -> "DriftDetector":
+        """Build from the dict stored in ModelConfig.detector."""
+        options = dict(config)
+        monitor = PcaMonitor(**options.pop("monitor"))
+        return cls(monitor, **options)
+    
+    def to_config(self) -> dict[str, Any]:
+        return {
+            "monitor": asdict(self.monitor),
+            "ranges": {t: list(r) for t, r in self.ranges.items()},
+            "cusum_k": self.cusum_k,
+            "cusum_h": self.cusum_h,
+            "ph_delta": self.ph_delta,
+            "ph_threshold": self.ph_threshold,
+        }
+    
+    @property
+    def tags(self) -> list[str]:
+        """Every tag read by the detector."""
+        return list(dict.fromkeys([*self.monitor.tags, *self.ranges]))
+    
+    def reset(self) -> None:
+        """Forget the drift history used by update()."""
+        self._cusums = [Cusum(self.cusum_k, self.cusum_h) for _ in self.monitor.tags]
+        self._page_hinkley = PageHinkley(self.ph_delta, self.ph_threshold)
+    
+    def update(
+        self,
+        tag_values: dict[str, float],
+        qc_flags: dict[str, int] | None = None,
+    ) -> DetectorResult:
+        """
+        Streaming mode: check one sample and advance the drift tests.
+        
+        Tags absent from `tag_values`, NaN or not QC OK count as missing:
+        T² and SPE are NaN and the sample does not feed the drift tests.
+        """
+        def value(tag_id: str) -> float:
+            x = tag_values.get(tag_id)
+            if x is None or (qc_flags is not None and qc_flags.get(tag_id, QC_OK) != QC_OK):
+                return _NAN
+            return float(x)
+        
+        t2, spe = self.monitor.scores([[value(t)] for t in self.monitor.tags])
+        out_of_range = [
+            tag_id for tag_id, (lo, hi) in self.ranges.items()
+            if (x := value(tag_id)) < lo or x > hi
+        ]
+        drift = self._drift([value(t) for t in self.monitor.tags], spe[0])
+        return DetectorResult(
+            t2=t2[0],
+            spe=spe[0],
+            ood=self._ood(t2[0], spe[0]) or bool(out_of_range),
+            out_of_range=out_of_range,
+            drift=drift,
+        )
+    
+    def evaluate(self, dataset: ColumnarDataset) -> DetectorColumns:
+        """
+        Batch mode: all checks over a dataset, drift tests from a fresh
+        history (the streaming state is left untouched).
+        """
+        columns = self._columns(dataset, self.monitor.tags)
+        t2, spe = self.monitor.scores(columns)
+        out_of_range = self._range_mask(dataset)
+        
+        saved = self._cusums, self._page_hinkley
+        self.reset()
+        try:
+            drift = bytearray(
+                bool(self._drift(row, s)) for row, s in zip(zip(*columns), spe)
+            )
+        finally:
+            self._cusums, self._page_hinkley = saved
+        
+        return DetectorColumns(
+            t2=array("d", t2),
+            spe=array("d", spe),
+            ood=bytearray(
+                self._ood(a, b) or bool(r) for a, b, r in zip(t2, spe, out_of_range)
+            ),
+            out_of_range=out_of_range,
+            drift=drift,
+        )
+    
+    def ood_mask(self, dataset: ColumnarDataset) -> bytearray:
+        """OOD flag per row (T², SPE and ranges only: no drift history needed)."""
+        t2, spe = self.monitor.scores(self._columns(dataset, self.monitor.tags))
+        out_of_range = self._range_mask(dataset)
+        return bytearray(
+            self._ood(a, b) or bool(r) for a, b, r in zip(t2, spe, out_of_range)
+        )
+    
+    def _ood(self, t2: float, spe: float) -> bool:
+        return t2 > self.monitor.t2_limit or spe > self.monitor.spe_limit
+    
+    def _drift(self, row: list[float] | tuple[float, ...], spe: float) -> list[str]:
+        drift = []
+        if spe == spe:
+            monitor = self.monitor
+            for tag_id, cusum, x, m, s in zip(
+                monitor.tags, self._cusums, row, monitor.mean, monitor.scale
+            ):
+                if cusum.update((x - m) / s):
+                    drift.append(tag_id)
+            if self._page_hinkley.update(spe / monitor.spe_limit):
+                drift.append("SPE")
+        return drift
+    
+    @staticmethod
+    def _columns(dataset: ColumnarDataset, tags: list[str]) -> list[list[float]]:
+        """Values per tag, NaN where not QC OK or absent."""
+        columns = []
+        for tag_id in tags:
+            if tag_id not in dataset.values:
+                columns.append([_NAN] * dataset.n_samples)
+                continue
+            values, qc = dataset.column(tag_id)
+            columns.append([x if q == QC_OK else _NAN for x, q in zip(values, qc)])
+        return columns
+    
+    def _range_mask(self, dataset: ColumnarDataset) -> bytearray:
+        mask = bytearray(dataset.n_samples)
+        for column, (lo, hi) in zip(
+            self._columns(dataset, list(self.ranges)), self.ranges.values()
+        ):
+            mask = bytearray(m or x < lo or x > hi for m, x in zip(mask, column))
+        return mask
+
+
+def detection_scores(predicted: list[bool], actual: list[bool]) -> dict[str, float]:
+    """Precision, recall and F1 of alarms against labeled cases (KPI-03)."""
+    tp = sum(1 for p, a in zip(predicted, actual) if p and a)
+    fp = sum(1 for p, a in zip(predicted, actual) if p and not a)
+    fn = sum(1 for p, a in zip(predicted, actual) if a and not p)
+    precision = tp / (tp + fp) if tp + fp else 0.0
+    recall = tp / (tp + fn) if tp + fn else 0.0
+    f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+    return {"precision": precision, "recall": recall, "f1": f1}
@@ -0,0 +1,602 @@
+"""
+Evaluation module for ACQC demo.
+
+Lab-vs-prediction KPIs against ssot/kpi_acceptance.csv:
+- Lab results (schemas/lab_result.schema.json) are paired with the
+  predictions in their process window, as align.match_lab_windows pairs
+  them with tags: (t - delay - window, t - delay] for a sample taken at t.
+  The paired estimate is the mean of the valid predictions in the window
+- Predictions are consumed batch by batch in time order; only the lab
+  windows still open are kept, so memory does not grow with the data
+- Streaming accumulators per KPI: residual mean/variance (Welford), MAE,
+  RMSE and MAPE as running means, PI coverage counts, OOD alarm confusion
+  counts (F1). All merge in closed form (Chan et al.) across batches,
+  time buckets and workers
+- check_kpis() compares the metrics with the CSV thresholds (pass / fail /
+  not_evaluated); KPIs of one quality variable (e.g. KPI-01, density) are
+  not evaluated against the predictions of another
+
+Nightly report over a year of predictions without loading them::
+
+    evaluator = Evaluator(iter_lab_results(lab_path), window_ns=15 * 60 * 10**9)
+    for batch in iter_prediction_batches(predictions_path):
+        evaluator.update(batch)
+    report = evaluator.report(load_kpi_thresholds())
+"""
+
+import csv
+import json
+import math
+import re
+from array import array
+from bisect import bisect_right
+from collections import deque
+from dataclasses import dataclass, field, fields
+from pathlib import Path
+from typing import Any, Iterable, Iterator, Sequence
+
+from acqc_demo.dataset import iso_to_ns, ns_to_iso
+from acqc_demo.infer import STATUS_NAMES, STATUS_OOD, PredictionBatch, load_predictions
+from acqc_demo.metrics import LatencyHistogram
+from acqc_demo.tags import ssot_path
+
+
+KPI_ACCEPTANCE_FILE = "kpi_acceptance.csv"  # in ssot/
+DEFAULT_WINDOW_NS = 60 * 1_000_000_000  # one demo sampling interval
+DEFAULT_BUCKET_NS = 86_400 * 1_000_000_000  # daily buckets
+DEFAULT_CHUNK_ROWS = 65_536
+
+# Metric names used in kpi_acceptance.csv -> keys of KpiAccumulators.metrics()
+METRIC_KEYS = {
+    "mae": "mae",
+    "rmse": "rmse",
+    "mape": "mape_pct",
+    "f1": "f1",
+    "p95": "p95_s",
+    "pi 95% coverage": "coverage_pct",
+}
+# KPI qualifiers in kpi_acceptance.csv, e.g. "(densidad)" -> text of the
+# quality variables they apply to (matched in variable_id, case-insensitive)
+KPI_VARIABLES = {
+    "densidad": "DENSITY",
+    "viscosidad": "VISCOSITY",
+}
+_QUALIFIER = re.compile(r"\(([^)]*)\)")
+_THRESHOLD = re.compile(
+    r"^\s*(?P<metric>[A-Za-z][\w-]*)?\s*(?P<op><=|>=|<|>|=)?\s*"
+    r"(?P<value>-?\d+(?:\.\d+)?)\s*(?P<unit>.*?)\s*$"
+)
+_OPS = {
+    "<=": lambda x, t: x <= t,
+    ">=": lambda x, t: x >= t,
+    "<": lambda x, t: x < t,
+    ">": lambda x, t: x > t,
+    "=": lambda x, t: x == t,
+}
+_NAN = float("nan")
+
+
+@dataclass
+class KpiThreshold:
+    """One acceptance criterion of kpi_acceptance.csv."""
+    kpi_id: str
+    kpi: str
+    metric: str  # Metric column
+    threshold: str  # Threshold_Min column, as written
+    key: str | None  # KpiAccumulators.metrics() key; None: not computed here
+    op: str | None = None
+    value: float | None = None
+    unit: str = ""
+    variable: str | None = None  # see KPI_VARIABLES; None: any variable
+    
+    def applies_to(self, variable_id: str | None) -> bool:
+        """Whether the KPI covers a quality variable (None: unknown, assumed)."""
+        return self.variable is None or variable_id is None or self.variable in variable_id.upper()
+    
+    def check(self, metrics: dict[str, Any], variable_id: str | None = None) -> dict[str, Any]:
+        """
+        Result against computed metrics (of `variable_id`): status is pass,
+        fail or not_evaluated.
+        """
+        observed = metrics.get(self.key) if self.key else None
+        if not self.applies_to(variable_id):
+            observed = None
+        evaluable = self.op is not None and observed is not None and observed == observed
+        status = "not_evaluated"
+        if evaluable:
+            status = "pass" if _OPS[self.op](observed, self.value) else "fail"
+        return {
+            "kpi_id": self.kpi_id,
+            "kpi": self.kpi,
+            "metric": self.key or self.metric,
+            "value": observed,
+            "threshold": self.threshold,
+            "status": status,
+        }
+
+
+def parse_threshold(text: str) -> tuple[str | None, str, float, str] | None:
+    """
+    ("MAE", "<=", 5.0, "kg/m3") from "MAE <= 5.0 kg/m3"; a bare value
+    ("100%", "0") means "=". None when the text is not a criterion.
+    """
+    match = _THRESHOLD.match(text or "")
+    if match is None:
+        return None
+    return match["metric"], match["op"] or "=", float(match["value"]), match["unit"]
+
+
+def load_kpi_thresholds(path: Path | None = None) -> list[KpiThreshold]:
+    """Load the KPI acceptance CSV (default: ssot/kpi_acceptance.csv), in file order."""
+    thresholds = []
+    with open(path or ssot_path(KPI_ACCEPTANCE_FILE), newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            kpi_id = row["KPI_ID"].strip()
+            if not kpi_id:
+                continue
+            text = row.get("Threshold_Min", "").strip()
+            metric = row.get("Metric", "").strip()
+            parsed = parse_threshold(text)
+            name, op, value, unit = parsed if parsed else (None, None, None, "")
+            key = METRIC_KEYS.get((name or metric).lower())
+            kpi = row.get("KPI", "").strip()
+            qualifier = _QUALIFIER.search(kpi)
+            thresholds.append(KpiThreshold(
+                kpi_id=kpi_id,
+                kpi=kpi,
+                metric=metric,
+                threshold=text,
+                key=key,
+                op=op if key else None,
+                value=value,
+                unit=unit,
+                variable=KPI_VARIABLES.get(qualifier[1].strip().lower()) if qualifier else None,
+            ))
+    return thresholds
+
+
+def check_kpis(
+    metrics: dict[str, Any],
+    thresholds: Iterable[KpiThreshold],
+    variable_id: str | None = None,
+) -> list[dict[str, Any]]:
+    return [threshold.check(metrics, variable_id) for threshold in thresholds]
+
+
+@dataclass
+class ErrorAccumulator:
+    """
+    Residuals (lab - y_hat) as running means: Welford mean/M2 of the
+    residual, and the means of |r|, r² and |r|/|lab|. merge() combines two
+    accumulators in closed form (Chan et al.), so chunks, buckets and
+    workers can be accumulated apart.
+    """
+    n: int = 0
+    mean: float = 0.0  # bias
+    m2: float = 0.0
+    mean_abs: float = 0.0
+    mean_sq: float = 0.0
+    n_ape: int = 0  # lab values != 0
+    mean_ape: float = 0.0
+    
+    def add(self, residual: float, lab_value: float) -> None:
+        if residual != residual:
+            return
+        self.n += 1
+        n = self.n
+        delta = residual - self.mean
+        self.mean += delta / n
+        self.m2 += delta * (residual - self.mean)
+        a = abs(residual)
+        self.mean_abs += (a - self.mean_abs) / n
+        self.mean_sq += (residual * residual - self.mean_sq) / n
+        if lab_value != 0.0:
+            self.n_ape += 1
+            self.mean_ape += (a / abs(lab_value) - self.mean_ape) / self.n_ape
+    
+    def add_many(self, residuals: Sequence[float], lab_values: Sequence[float]) -> None:
+        """Add residuals (NaN: unpaired, skipped) with their lab values."""
+        for r, y in zip(residuals, lab_values):
+            self.add(r, y)
+    
+    def merge(self, other: "ErrorAccumulator") -> None:
+        if not other.n:
+            return
+        n = self.n + other.n
+        w = other.n / n
+        delta = other.mean - self.mean
+        self.m2 += other.m2 + delta * delta * self.n * w
+        self.mean += delta * w
+        self.mean_abs += (other.mean_abs - self.mean_abs) * w
+        self.mean_sq += (other.mean_sq - self.mean_sq) * w
+        self.n = n
+        if other.n_ape:
+            n_ape = self.n_ape + other.n_ape
+            self.mean_ape += (other.mean_ape - self.mean_ape) * other.n_ape / n_ape
+            self.n_ape = n_ape
+    
+    def summary(self) -> dict[str, Any]:
+        """Pair count, MAE, RMSE, MAPE (%), bias and residual std; NaN without pairs."""
+        n = self.n
+        return {
+            "n_pairs": n,
+            "mae": self.mean_abs if n else _NAN,
+            "rmse": math.sqrt(self.mean_sq) if n else _NAN,
+            "mape_pct": 100.0 * self.mean_ape if self.n_ape else _NAN,
+            "bias": self.mean if n else _NAN,
+            "std": math.sqrt(self.m2 / (n - 1)) if n > 1 else _NAN,
+        }
+
+
+@dataclass
+class CoverageAccumulator:
+    """Lab values inside the prediction interval (KPI-06)."""
+    n: int = 0
+    covered: int = 0
+    
+    def add(self, lab_value: float, lower: float, upper: float) -> None:
+        self.n += 1
+        self.covered += lower <= lab_value <= upper
+    
+    def merge(self, other: "CoverageAccumulator") -> None:
+        self.n += other.n
+        self.covered += other.covered
+    
+    @property
+    def coverage_pct(self) -> float:
+        return 100.0 * self.covered / self.n if self.n else _NAN
+
+
+@dataclass
+class DetectionAccumulator:
+    """Confusion counts of OOD alarms against labeled cases (KPI-03)."""
+    tp: int = 0
+    fp: int = 0
+    fn: int = 0
+    tn: int = 0
+    
+    def add_many(self, predicted: Iterable[bool], actual: Iterable[bool]) -> None:
+        for p, a in zip(predicted, actual):
+            if p:
+                if a:
+                    self.tp += 1
+                else:
+                    self.fp += 1
+            elif a:
+                self.fn += 1
+            else:
+                self.tn += 1
+    
+    def merge(self, other: "DetectionAccumulator") -> None:
+        self.tp += other.tp
+        self.fp += other.fp
+        self.fn += other.fn
+        self.tn += other.tn
+    
+    def scores(self) -> dict[str, float]:
+        """Precision, recall and F1, as drift.detection_scores; NaN without labels."""
+        if not self.tp + self.fp + self.fn + self.tn:
+            return {"precision": _NAN, "recall": _NAN, "f1": _NAN}
+        tp, fp, fn = self.tp, self.fp, self.fn
+        precision = tp / (tp + fp) if tp + fp else 0.0
+        recall = tp / (tp + fn) if tp + fn else 0.0
+        f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+        return {"precision": precision, "recall": recall, "f1": f1}
+
+
+@dataclass
+class KpiAccumulators:
+    """All KPI accumulators of one scope (whole run, batch or time bucket)."""
+    errors: ErrorAccumulator = field(default_factory=ErrorAccumulator)
+    coverage: CoverageAccumulator = field(default_factory=CoverageAccumulator)
+    detection: DetectionAccumulator = field(default_factory=DetectionAccumulator)
+    n_predictions: int = 0
+    n_unpaired: int = 0  # lab results without a valid prediction in their window
+    
+    def merge(self, other: "KpiAccumulators") -> None:
+        self.errors.merge(other.errors)
+        self.coverage.merge(other.coverage)
+        self.detection.merge(other.detection)
+        self.n_predictions += other.n_predictions
+        self.n_unpaired += other.n_unpaired
+    
+    def metrics(self) -> dict[str, Any]:
+        return {
+            "n_predictions": self.n_predictions,
+            "n_unpaired": self.n_unpaired,
+            **self.errors.summary(),
+            "coverage_pct": self.coverage.coverage_pct,
+            **self.detection.scores(),
+        }
+
+
+@dataclass
+class LabResult:
+    """One laboratory result (schemas/lab_result.schema.json)."""
+    sample_id: str
+    ts_sampled: str
+    quality_variable: str
+    value: float | None
+    unit: str
+    method: str
+    batch_id: str | None = None
+    ts_reported: str | None = None
+    lod: float | None = None
+    loq: float | None = None
+    uncertainty: float | None = None
+    analyst: str | None = None
+    meta: dict[str, Any] = field(default_factory=dict)
+
+
+_LAB_FIELDS = frozenset(f.name for f in fields(LabResult))
+
+
+def iter_lab_results(path: Path, quality_variable: str | None = None) -> Iterator[LabResult]:
+    """
+    Lab results from a JSONL file (one record per line, streamed) or a JSON
+    array, optionally of one quality variable. Records without a value
+    (e.g. below LOD) are skipped.
+    """
+    path = Path(path)
+    with open(path, encoding="utf-8") as f:
+        if path.suffix == ".json":
+            records: Iterable[dict[str, Any]] = json.load(f)
+            if not isinstance(records, list):
+                raise ValueError(f"Expected a JSON array of lab results in {path}")
+        else:
+            records = (json.loads(line) for line in f if line.strip())
+        for record in records:
+            unknown = record.keys() - _LAB_FIELDS
+            if unknown:
+                raise ValueError(f"Unknown lab result fields in {path}: {sorted(unknown)}")
+            result = LabResult(**record)
+            if result.value is None:
+                continue
+            if quality_variable is None or result.quality_variable == quality_variable:
+                yield result
+
+
+def iter_prediction_batches(path: Path, chunk_rows: int = DEFAULT_CHUNK_ROWS) -> Iterator[PredictionBatch]:
+    """
+    Saved predictions (infer.save_predictions) as batches of `chunk_rows`:
+    "binary" files are memory-mapped and "ndjson" files read line by line,
+    so neither is loaded whole; "json" documents are.
+    """
+    path = Path(path)
+    if path.suffix == ".acqc":
+        batch = load_predictions(path)
+        for start in range(0, len(batch), chunk_rows):
+            yield batch[start:start + chunk_rows]
+        return
+    with open(path, encoding="utf-8") as f:
+        if path.suffix == ".json":
+            rows: Iterable[dict[str, Any]] = json.load(f)["predictions"]
+        else:
+            rows = (json.loads(line) for line in f if line.strip())
+        chunk: list[dict[str, Any]] = []
+        for row in rows:
+            chunk.append(row)
+            if len(chunk) == chunk_rows:
+                yield _batch_from_rows(chunk)
+                chunk = []
+        if chunk:
+            yield _batch_from_rows(chunk)
+
+
+def _batch_from_rows(rows: list[dict[str, Any]]) -> PredictionBatch:
+    codes = {name: code for code, name in enumerate(STATUS_NAMES)}
+    first = rows[0]
+    return PredictionBatch(
+        timestamps=array("q", [iso_to_ns(r["timestamp"]) for r in rows]),
+        y_hat=array("d", [r["y_hat"] for r in rows]),
+        uncertainty_lower=array("d", [r["uncertainty_lower"] for r in rows]),
+        uncertainty_upper=array("d", [r["uncertainty_upper"] for r in rows]),
+        status=array("B", [codes[r["status"]] for r in rows]),
+        variable_id=first["variable_id"],
+        model_id=first["model_id"],
+        model_hash=first["model_hash"],
+    )
+
+
+class _Window:
+    """Open process window of one lab result, with partial sums."""
+    
+    __slots__ = ("ts", "value", "start", "end", "n", "sum_y", "sum_lower", "sum_upper")
+    
+    def __init__(self, ts: int, value: float, start: int, end: int):
+        self.ts = ts
+        self.value = value
+        self.start = start  # exclusive
+        self.end = end  # inclusive
+        self.n = 0
+        self.sum_y = self.sum_lower = self.sum_upper = 0.0
+
+
+class Evaluator:
+    """
+    Streaming lab-vs-prediction KPI evaluation.
+    
+    Args:
+        lab_results: Lab results in ts_sampled order (LabResult or
+            (epoch ns, value) pairs); consumed lazily as predictions arrive
+        window_ns: Width of the process window matching a lab result
+        delay_ns: Transport delay between the process and the sampling point
+        bucket_ns: Width of the report's time buckets (by lab/prediction
+            timestamp); None disables buckets
+        variable_id: Quality variable evaluated: predictions of another
+            raise ValueError, LabResults of another are skipped
+    """
+    
+    def __init__(
+        self,
+        lab_results: Iterable[LabResult | tuple[int, float]] = (),
+        window_ns: int = DEFAULT_WINDOW_NS,
+        delay_ns: int = 0,
+        bucket_ns: int | None = DEFAULT_BUCKET_NS,
+        variable_id: str | None = None,
+    ):
+        if window_ns <= 0:
+            raise ValueError(f"window_ns must be positive, got {window_ns}")
+        self.window_ns = window_ns
+        self.delay_ns = delay_ns
+        self.bucket_ns = bucket_ns
+        self.variable_id = variable_id
+        self.total = KpiAccumulators()
+        self.buckets: dict[int, KpiAccumulators] = {}
+        self._labs = iter(lab_results)
+        self._next: _Window | None = None
+        self._open: deque[_Window] = deque()
+        self._last_lab_ns: int | None = None
+        self._pull()
+    
+    def _pull(self) -> None:
+        """Read the next lab result into self._next (None when exhausted)."""
+        item = next(self._labs, None)
+        while (
+            isinstance(item, LabResult) and self.variable_id is not None
+            and item.quality_variable != self.variable_id
+        ):
+            item = next(self._labs, None)
+        if item is None:
+            self._next = None
+            return
+        if isinstance(item, LabResult):
+            ts, value = iso_to_ns(item.ts_sampled), item.value
+        else:
+            ts, value = item
+        if self._last_lab_ns is not None and ts < self._last_lab_ns:
+            raise ValueError(f"Lab results out of time order at {ns_to_iso(ts)}")
+        self._last_lab_ns = ts
+        end = ts - self.delay_ns
+        self._next = _Window(ts, value, end - self.window_ns, end)
+    
+    def _bucket(self, ts: int) -> KpiAccumulators:
+        start = ts // self.bucket_ns * self.bucket_ns
+        bucket = self.buckets.get(start)
+        if bucket is None:
+            bucket = self.buckets[start] = KpiAccumulators()
+        return bucket
+    
+    def update(
+        self,
+        batch: PredictionBatch,
+        labels: Sequence[bool] | None = None,
+    ) -> KpiAccumulators:
+        """
+        Consume one batch of predictions (later than the previous ones).
+        
+        Args:
+            labels: Per-row ground truth of abnormal operation, scored
+                against OOD statuses (KPI-03)
+        
+        Returns:
+            Accumulators of this batch alone (lab windows it closed, and
+            its rows); they are also merged into the totals and buckets
+        """
+        result = KpiAccumulators()
+        n = len(batch)
+        if not n:
+            return result
+        if self.variable_id is not None and batch.variable_id != self.variable_id:
+            raise ValueError(f"Predictions of {batch.variable_id}, evaluating {self.variable_id}")
+        timestamps = batch.timestamps
+        last = timestamps[-1]
+        result.n_predictions = n
+        if labels is not None:
+            result.detection.add_many((s == STATUS_OOD for s in batch.status), labels)
+        if self.bucket_ns is not None:
+            self._bucket_rows(batch, labels)
+        
+        # Open every lab window that starts before the end of this batch
+        while self._next is not None and self._next.start < last:
+            self._open.append(self._next)
+            self._pull()
+        
+        y_hat, lower, upper = batch.y_hat, batch.uncertainty_lower, batch.uncertainty_upper
+        for window in self._open:
+            lo = bisect_right(timestamps, window.start)
+            hi = bisect_right(timestamps, window.end, lo)
+            for i in range(lo, hi):
+                y = y_hat[i]
+                if y == y:
+                    window.n += 1
+                    window.sum_y += y
+                    window.sum_lower += lower[i]
+                    window.sum_upper += upper[i]
+        
+        # Rows later than a window's end can only come after it: close it
+        while self._open and self._open[0].end < last:
+            self._close(self._open.popleft(), result)
+        self.total.merge(result)
+        return result
+    
+    def _bucket_rows(self, batch: PredictionBatch, labels: Sequence[bool] | None) -> None:
+        """Per-bucket prediction counts (and OOD confusion when labeled)."""
+        bucket_ns = self.bucket_ns
+        timestamps = batch.timestamps
+        n = len(timestamps)
+        start = 0
+        while start < n:
+            bucket_start = timestamps[start] // bucket_ns * bucket_ns
+            stop = bisect_right(timestamps, bucket_start + bucket_ns - 1, start)
+            scope = self._bucket(bucket_start)
+            scope.n_predictions += stop - start
+            if labels is not None:
+                scope.detection.add_many(
+                    (s == STATUS_OOD for s in batch.status[start:stop]), labels[start:stop]
+                )
+            start = stop
+    
+    def _close(self, window: _Window, result: KpiAccumulators) -> None:
+        targets = [result] if self.bucket_ns is None else [result, self._bucket(window.ts)]
+        for acc in targets:
+            if window.n:
+                n = window.n
+                acc.errors.add(window.value - window.sum_y / n, window.value)
+                acc.coverage.add(window.value, window.sum_lower / n, window.sum_upper / n)
+            else:
+                acc.n_unpaired += 1
+    
+    def finish(self) -> KpiAccumulators:
+        """Close the windows still open (no more predictions); returns their accumulators."""
+        result = KpiAccumulators()
+        while self._next is not None:
+            self._open.append(self._next)
+            self._pull()
+        while self._open:
+            self._close(self._open.popleft(), result)
+        self.total.merge(result)
+        return result
+    
+    def merge(self, other: "Evaluator") -> None:
+        """Add another evaluator's totals and buckets (e.g. from another worker)."""
+        self.total.merge(other.total)
+        for start, bucket in other.buckets.items():
+            self._bucket(start).merge(bucket)
+    
+    def report(
+        self,
+        thresholds: Iterable[KpiThreshold] = (),
+        latency: LatencyHistogram | None = None,
+    ) -> dict[str, Any]:
+        """
+        Metrics, KPI checks and per-bucket metrics. Call finish() first to
+        count the lab results after the last prediction.
+        
+        Args:
+            latency: End-to-end latencies for KPI-04 (e.g. StreamStats.latency)
+        """
+        metrics = self.total.metrics()
+        if latency is not None and latency.count:
+            metrics["p95_s"] = latency.percentile(95) * 1e-9
+        return {
+            "variable_id": self.variable_id,
+            "window_ns": self.window_ns,
+            "delay_ns": self.delay_ns,
+            "metrics": metrics,
+            "kpis": check_kpis(metrics, thresholds, self.variable_id),
+            "buckets": [
+                {"start": ns_to_iso(start), **self.buckets[start].metrics()}
+                for start in sorted(self.buckets)
+            ],
+        }
@@ -0,0 +1,328 @@
+"""
+Feature pipeline module for ACQC demo.
+
+Declarative features between the tag data and the model coefficients:
+- value, lag, rolling mean / std / slope over a sample window, EWMA
+- Streaming: FeatureState.push() updates ring buffers in O(1) per sample
+- Batch: FeaturePipeline.transform() runs the same kernels over whole
+  columns, so training (batch) and serving (streaming) see bit-identical
+  feature values
+
+Windows count samples, so series should be on a regular grid first (see
+align.align_to_grid). Samples that are not QC OK or are NaN count as
+missing: they are skipped by the window statistics, and a window feature
+is missing until it holds `min_count` valid samples.
+"""
+
+import math
+from array import array
+from dataclasses import asdict, dataclass
+from typing import Any
+
+from acqc_demo.dataset import ColumnarDataset, QC_BAD, QC_OK
+from acqc_demo.instrument import timed
+
+
+FEATURE_KINDS = ("value", "lag", "mean", "std", "slope", "ewma")
+# Weight an EWMA may still give to samples before its warm-up (see FeatureSpec.warmup)
+EWMA_WARMUP_WEIGHT = 1e-9
+
+_NAN = float("nan")
+
+
+@dataclass
+class FeatureSpec:
+    """
+    One derived input.
+    
+    Args:
+        tag_id: Source tag
+        kind: One of FEATURE_KINDS
+        window: Samples in the rolling window (mean / std / slope)
+        lag: Samples of delay (lag)
+        alpha: Smoothing factor (ewma)
+        min_count: Valid samples needed in the window (default: window)
+        name: Column name (default: derived, e.g. "TI-101:mean10"); must
+            differ from every source tag, whose column it would replace
+    """
+    tag_id: str
+    kind: str = "value"
+    window: int = 1
+    lag: int = 0
+    alpha: float = 0.1
+    min_count: int | None = None
+    name: str | None = None
+    
+    def __post_init__(self):
+        if self.kind not in FEATURE_KINDS:
+            raise ValueError(f"Unknown feature kind: {self.kind}")
+        if self.window < 1 or self.lag < 0 or not 0.0 < self.alpha <= 1.0:
+            raise ValueError(f"Invalid feature parameters: {self}")
+        if self.name is None:
+            suffix = {
+                "value": ":value",
+                "lag": f":lag{self.lag}",
+                "ewma": f":ewma{self.alpha:g}",
+            }.get(self.kind, f":{self.kind}{self.window}")
+            self.name = self.tag_id + suffix
+    
+    @property
+    def warmup(self) -> int:
+        """
+        Samples of history a fresh kernel needs to reproduce the values of
+        one started earlier (EWMA: until older samples weigh less than
+        EWMA_WARMUP_WEIGHT).
+        """
+        if self.kind == "lag":
+            return self.lag
+        if self.kind == "ewma":
+            if self.alpha >= 1.0:
+                return 0
+            return math.ceil(math.log(EWMA_WARMUP_WEIGHT) / math.log1p(-self.alpha))
+        return 0 if self.kind == "value" else self.window - 1
+    
+    def kernel(self) -> "_Kernel":
+        if self.kind == "value":
+            return _ValueKernel()
+        if self.kind == "lag":
+            return _LagKernel(self.lag)
+        if self.kind == "ewma":
+            return _EwmaKernel(self.alpha)
+        return _WindowKernel(self.kind, self.window, self.min_count)
+
+
+class _Kernel:
+    """Per-feature streaming state: update() consumes one sample."""
+    
+    __slots__ = ()
+    
+    def update(self, x: float, ok: bool) -> float:
+        raise NotImplementedError
+
+
+class _ValueKernel(_Kernel):
+    __slots__ = ()
+    
+    def update(self, x: float, ok: bool) -> float:
+        return x if ok else _NAN
+
+
+class _LagKernel(_Kernel):
+    __slots__ = ("buf", "pos")
+    
+    def __init__(self, lag: int):
+        self.buf = [_NAN] * (lag + 1)
+        self.pos = 0
+    
+    def update(self, x: float, ok: bool) -> float:
+        buf = self.buf
+        buf[self.pos] = x if ok else _NAN
+        self.pos = (self.pos + 1) % len(buf)
+        return buf[self.pos]  # oldest entry: the sample `lag` updates ago
+
+
+class _EwmaKernel(_Kernel):
+    __slots__ = ("alpha", "y")
+    
+    def __init__(self, alpha: float):
+        self.alpha = alpha
+        self.y = _NAN
+    
+    def update(self, x: float, ok: bool) -> float:
+        if ok:
+            y = self.y
+            self.y = x if y != y else y + self.alpha * (x - y)
+        return self.y  # holds through missing samples
+
+
+class _WindowKernel(_Kernel):
+    """
+    Ring buffer with running sums of x, x^2, j, j^2 and j*x over the valid
+    samples (j: sample position). Sums are rebuilt from the buffer every
+    `window` updates, which bounds floating-point drift at amortized O(1).
+    """
+    
+    __slots__ = (
+        "kind", "window", "min_count", "buf", "pos", "t", "base",
+        "count", "s1", "s2", "sj", "sjj", "sjx",
+    )
+    
+    def __init__(self, kind: str, window: int, min_count: int | None):
+        self.kind = kind
+        self.window = window
+        self.min_count = max(window if min_count is None else min_count, 2 if kind != "mean" else 1)
+        self.buf = [_NAN] * window
+        self.pos = 0
+        self.t = 0  # samples seen
+        self.base = 0  # position j is t - base
+        self.count = 0
+        self.s1 = self.s2 = self.sjx = 0.0
+        self.sj = self.sjj = 0  # exact (ints)
+    
+    def update(self, x: float, ok: bool) -> float:
+        buf = self.buf
+        old = buf[self.pos]
+        if old == old:
+            j = self.t - self.window - self.base
+            self.count -= 1
+            self.s1 -= old
+            self.s2 -= old * old
+            self.sj -= j
+            self.sjj -= j * j
+            self.sjx -= j * old
+        if ok:
+            j = self.t - self.base
+            buf[self.pos] = x
+            self.count += 1
+            self.s1 += x
+            self.s2 += x * x
+            self.sj += j
+            self.sjj += j * j
+            self.sjx += j * x
+        else:
+            buf[self.pos] = _NAN
+        self.pos = (self.pos + 1) % self.window
+        self.t += 1
+        if self.t % self.window == 0:
+            self._rebuild()
+        return self._value()
+    
+    def _rebuild(self) -> None:
+        # Oldest sample first; positions restart at 0 for the oldest slot
+        w = self.window
+        self.base = self.t - w
+        ordered = self.buf[self.pos:] + self.buf[:self.pos]
+        valid = [(j, x) for j, x in enumerate(ordered) if x == x]
+        self.count = len(valid)
+        self.s1 = math.fsum(x for _, x in valid)
+        self.s2 = math.fsum(x * x for _, x in valid)
+        self.sj = sum(j for j, _ in valid)
+        self.sjj = sum(j * j for j, _ in valid)
+        self.sjx = math.fsum(j * x for j, x in valid)
+    
+    def _value(self) -> float:
+        n = self.count
+        if n < self.min_count:
+            return _NAN
+        if self.kind == "mean":
+            return self.s1 / n
+        if self.kind == "std":
+            var = (self.s2 - self.s1 * self.s1 / n) / (n - 1)
+            return math.sqrt(var) if var > 0.0 else 0.0
+        # slope per sample (least squares over the valid positions)
+        denom = n * self.sjj - self.sj * self.sj
+        return (n * self.sjx - self.sj * self.s1) / denom if denom else _NAN
+
+
+class FeatureState:
+    """Streaming state of a FeaturePipeline (one kernel per feature)."""
+    
+    def __init__(self, specs: list[FeatureSpec]):
+        self.specs = specs
+        self.kernels = [spec.kernel() for spec in specs]
+    
+    def push(
+        self,
+        tag_values: dict[str, float],
+        qc_flags: dict[str, int] | None = None,
+    ) -> dict[str, float]:
+        """
+        Consume one sample of every tag; returns feature values (NaN: missing).
+        
+        Tags absent from `tag_values`, NaN or not QC OK count as missing.
+        """
+        out = {}
+        for spec, kernel in zip(self.specs, self.kernels):
+            x = tag_values.get(spec.tag_id)
+            ok = (
+                x is not None and x == x
+                and (qc_flags is None or qc_flags.get(spec.tag_id, QC_OK) == QC_OK)
+            )
+            out[spec.name] = kernel.update(x if ok else _NAN, ok)
+        return out
+
+
+class FeaturePipeline:
+    """Declarative feature set, evaluated in batch or streaming mode."""
+    
+    def __init__(self, specs: list[FeatureSpec]):
+        self.specs = list(specs)
+        names = [spec.name for spec in self.specs]
+        if len(set(names)) != len(names):
+            raise ValueError(f"Duplicate feature names: {names}")
+        shadowed = set(names) & set(self.source_tags)
+        if shadowed:
+            raise ValueError(f"Feature names collide with source tags: {sorted(shadowed)}")
+    
+    @classmethod
+    def from_config(cls, specs: list[dict[str, Any]]) -> "FeaturePipeline":
+        """Build from the dicts stored in ModelConfig.features."""
+        return cls([FeatureSpec(**spec) for spec in specs])
+    
+    def to_config(self) -> list[dict[str, Any]]:
+        return [asdict(spec) for spec in self.specs]
+    
+    @property
+    def names(self) -> list[str]:
+        return [spec.name for spec in self.specs]
+    
+    @property
+    def source_tags(self) -> list[str]:
+        return list(dict.fromkeys(spec.tag_id for spec in self.specs))
+    
+    @property
+    def warmup_rows(self) -> int:
+        """Rows to replay before a batch so every feature has its full history."""
+        return max((spec.warmup for spec in self.specs), default=0)
+    
+    def state(self) -> FeatureState:
+        """Fresh streaming state."""
+        return FeatureState(self.specs)
+    
+    @timed("features")
+    def transform(
+        self,
+        dataset: ColumnarDataset,
+        state: FeatureState | None = None,
+    ) -> ColumnarDataset:
+        """
+        Batch mode: feature columns over a whole dataset.
+        
+        Each kernel runs over its column in one pass. Passing a `state`
+        continues from it (and advances it), so consecutive batches give
+        the same values as one batch or as push() row by row.
+        
+        Returns:
+            The dataset's columns plus one column per feature (QC OK where
+            the feature is available, BAD where it is NaN)
+        """
+        state = state or self.state()
+        n = dataset.n_samples
+        values = dict(dataset.values)
+        qc_flags = dict(dataset.qc_flags)
+        
+        for spec, kernel in zip(state.specs, state.kernels):
+            update = kernel.update
+            if spec.tag_id in dataset.values:
+                col, qc = dataset.column(spec.tag_id)
+                out = [
+                    update(x, True) if q == QC_OK and x == x else update(_NAN, False)
+                    for x, q in zip(col, qc)
+                ]
+            else:
+                out = [update(_NAN, False) for _ in range(n)]
+            values[spec.name] = array("d", out)
+            qc_flags[spec.name] = array("B", [QC_OK if v == v else QC_BAD for v in out])
+        
+        return ColumnarDataset(
+            timestamps=dataset.timestamps,
+            values=values,
+            qc_flags=qc_flags,
+            units=dict(dataset.units),
+            metadata=dict(dataset.metadata),
+            quality=dataset.quality,
+            quality_timestamps=dataset.quality_timestamps,
+            quality_variable=dataset.quality_variable,
+            quality_unit=dataset.quality_unit,
+            quality_source=dataset.quality_source,
+        )
@@ -0,0 +1,355 @@
+"""
+Hot swap module for ACQC demo.
+
+Zero-downtime model reload from a watched artifact directory (README
+architecture: MLOps -> REG -> EDGE):
+- A background thread polls the directory for ModelConfig artifacts
+  (save_model_config); the newest one by modification time is the target
+- Loading, validation and precompilation (SoftSensor construction plus a
+  probe evaluation) run on that thread, off the hot path
+- The (active, candidate) pair is one tuple replaced by a single
+  assignment (RCU-style pointer swap): a reader takes the pair once per
+  batch and keeps a consistent model until it is done, so swaps land
+  between batches and never inside one
+- Shadow mode keeps a new model as candidate instead of activating it;
+  it is evaluated next to the active model on the same input matrix and
+  compared (ShadowReport) until promote()
+- Feature history is carried over when the feature specs are unchanged
+
+Artifacts should be published atomically (write to a temporary name that
+does not match the pattern, then rename), so a half-written file is never
+read. Invalid artifacts are rejected and not retried until they change.
+"""
+
+import logging
+import math
+import threading
+from array import array
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any, Callable
+
+from acqc_demo.dataset import QC_BAD, ColumnarDataset
+from acqc_demo.features import FeatureState
+from acqc_demo.infer import (
+    STATUS_DEGRADED,
+    PredictionBatch,
+    SoftSensor,
+    build_columns,
+    load_model_config,
+)
+
+
+_log = logging.getLogger(__name__)
+
+
+@dataclass
+class ShadowReport:
+    """Running comparison of a shadow candidate against the active model."""
+    active_hash: str
+    candidate_hash: str
+    n_rows: int = 0
+    n_compared: int = 0  # rows where both models produced a value
+    status_changes: int = 0
+    sum_abs_diff: float = 0.0
+    max_abs_diff: float = 0.0
+    
+    @property
+    def mean_abs_diff(self) -> float:
+        return self.sum_abs_diff / self.n_compared if self.n_compared else 0.0
+    
+    def update(self, active: PredictionBatch, candidate: PredictionBatch) -> None:
+        """Add one batch of paired predictions."""
+        self.n_rows += len(active)
+        for a, c in zip(active.y_hat, candidate.y_hat):
+            if a == a and c == c:
+                d = abs(a - c)
+                self.n_compared += 1
+                self.sum_abs_diff += d
+                if d > self.max_abs_diff:
+                    self.max_abs_diff = d
+        self.status_changes += sum(a != c for a, c in zip(active.status, candidate.status))
+    
+    def to_dict(self) -> dict[str, Any]:
+        return {**asdict(self), "mean_abs_diff": round(self.mean_abs_diff, 6)}
+
+
+def same_features(a: SoftSensor, b: SoftSensor) -> bool:
+    """True when both sensors compute the same feature columns."""
+    if a.features is None or b.features is None:
+        return a.features is None and b.features is None
+    return a.features.specs == b.features.specs
+
+
+def validate_sensor(sensor: SoftSensor, output_variable: str | None = None) -> None:
+    """
+    Check a freshly built SoftSensor before it may serve; raises ValueError.
+    
+    Runs one probe row (every input BAD) through the batch engine, which
+    also builds the feature and detector code paths ahead of the first swap.
+    """
+    config = sensor.config
+    if output_variable is not None and config.output_variable != output_variable:
+        raise ValueError(
+            f"Model {config.model_id} predicts {config.output_variable}, expected {output_variable}"
+        )
+    if not config.input_tags:
+        raise ValueError(f"Model {config.model_id} has no input tags")
+    terms = [config.intercept, config.uncertainty_factor, *config.coefficients.values()]
+    if not all(isinstance(v, (int, float)) and math.isfinite(v) for v in terms):
+        raise ValueError(f"Model {config.model_id} has non-finite coefficients")
+    if config.uncertainty_factor < 0:
+        raise ValueError(f"Model {config.model_id} has a negative uncertainty_factor")
+    
+    tags = sensor.source_tags
+    probe = ColumnarDataset(
+        timestamps=array("q", [0]),
+        values={t: array("d", [math.nan]) for t in tags},
+        qc_flags={t: array("B", [QC_BAD]) for t in tags},
+        units={},
+    )
+    status = sensor.predict_columns(probe)[3]
+    if status[0] != STATUS_DEGRADED:
+        raise ValueError(f"Model {config.model_id} does not flag missing inputs as DEGRADED")
+
+
+class ModelWatcher:
+    """
+    Serves the newest valid model of a directory, swapping it in between batches.
+    
+    Args:
+        model_dir: Directory of ModelConfig artifacts
+        pattern: Artifact file pattern
+        interval: Seconds between directory polls (start())
+        shadow: Keep new models as shadow candidates until promote()
+            instead of activating them
+        initial: Model served until a valid artifact is found (default:
+            baseline SoftSensor)
+        sensor_factory: Builds a SoftSensor from a ModelConfig (e.g. to
+            attach a cache or calibrator)
+        on_swap: Called with (old, new) from the polling thread after a
+            model becomes active
+    """
+    
+    def __init__(
+        self,
+        model_dir: Path,
+        pattern: str = "*.json",
+        interval: float = 1.0,
+        shadow: bool = False,
+        initial: SoftSensor | None = None,
+        sensor_factory: Callable[..., SoftSensor] = SoftSensor,
+        on_swap: Callable[[SoftSensor, SoftSensor], None] | None = None,
+    ):
+        self.model_dir = Path(model_dir)
+        self.pattern = pattern
+        self.interval = interval
+        self.shadow = shadow
+        self.sensor_factory = sensor_factory
+        self.on_swap = on_swap
+        self.n_swaps = 0
+        self.rejected: dict[str, str] = {}  # artifact name -> reason
+        self.n_errors = 0  # polls of the background thread that raised
+        self.last_error: str | None = None
+        self.shadow_report: ShadowReport | None = None
+        self._seen: tuple[str, int, int] | None = None  # (name, mtime_ns, size)
+        self._shadow_state: FeatureState | None = None  # candidate history when not shared
+        self._lock = threading.Lock()  # serializes writers (poll, promote)
+        self._stop = threading.Event()
+        self._thread: threading.Thread | None = None
+        # The RCU pointer: readers take the whole pair in one attribute read
+        self._slot: tuple[SoftSensor, SoftSensor | None] = (initial or SoftSensor(), None)
+        # The first load activates directly, even in shadow mode
+        shadow, self.shadow = self.shadow, False
+        try:
+            self.poll()
+        finally:
+            self.shadow = shadow
+    
+    @property
+    def active(self) -> SoftSensor:
+        return self._slot[0]
+    
+    @property
+    def candidate(self) -> SoftSensor | None:
+        return self._slot[1]
+    
+    @property
+    def slot(self) -> tuple[SoftSensor, SoftSensor | None]:
+        """The current (active, candidate) pair, read atomically."""
+        return self._slot
+    
+    def _newest(self) -> tuple[Path, tuple[str, int, int]] | None:
+        newest = None
+        for path in self.model_dir.glob(self.pattern):
+            try:
+                st = path.stat()
+            except OSError:
+                continue  # removed while scanning
+            key = (st.st_mtime_ns, path.name)
+            if newest is None or key > newest[0]:
+                newest = (key, path, (path.name, st.st_mtime_ns, st.st_size))
+        return None if newest is None else newest[1:]
+    
+    def poll(self) -> bool:
+        """
+        Check the directory once; returns True when a new model was published
+        (activated, or set as shadow candidate).
+        """
+        with self._lock:
+            found = self._newest()
+            if found is None or found[1] == self._seen:
+                return False
+            path, signature = found
+            self._seen = signature
+            active, candidate = self._slot
+            try:
+                sensor = self.sensor_factory(load_model_config(path))
+                if sensor.model_hash in (active.model_hash, candidate and candidate.model_hash):
+                    return False
+                validate_sensor(sensor, active.config.output_variable)
+            except (OSError, ValueError, TypeError) as exc:
+                self.rejected[path.name] = str(exc)
+                return False
+            if self.shadow:
+                self._publish(active, sensor)
+            else:
+                self._activate(active, sensor)
+            return True
+    
+    def promote(self) -> SoftSensor:
+        """Activate the shadow candidate; returns the new active model."""
+        with self._lock:
+            active, candidate = self._slot
+            if candidate is None:
+                raise ValueError("No shadow candidate to promote")
+            self._activate(active, candidate)
+            return candidate
+    
+    def discard(self) -> None:
+        """Drop the shadow candidate and keep the active model."""
+        with self._lock:
+            self._publish(self._slot[0], None)
+    
+    def _publish(self, active: SoftSensor, candidate: SoftSensor | None) -> None:
+        if candidate is not None and candidate is not self._slot[1]:
+            self.shadow_report = ShadowReport(active.model_hash, candidate.model_hash)
+            self._shadow_state = candidate.features.state() if candidate.features else None
+        self._slot = (active, candidate)
+    
+    def _activate(self, old: SoftSensor, new: SoftSensor) -> None:
+        self._slot = (new, None)
+        self.n_swaps += 1
+        if self.on_swap is not None:
+            self.on_swap(old, new)
+    
+    def carry_state(
+        self,
+        old: SoftSensor,
+        new: SoftSensor,
+        state: FeatureState | None,
+    ) -> FeatureState | None:
+        """
+        Feature history for `new` after a swap from `old`: the current one
+        when the features match, else the history it built in shadow mode,
+        else a fresh one.
+        """
+        if same_features(old, new):
+            return state
+        if new.features is None:
+            return None
+        if self._shadow_state is not None and self._shadow_state.specs == new.features.specs:
+            return self._shadow_state
+        return new.features.state()
+    
+    def predict_batch(
+        self,
+        dataset: ColumnarDataset,
+        feature_state: FeatureState | None = None,
+        slot: tuple[SoftSensor, SoftSensor | None] | None = None,
+    ) -> PredictionBatch:
+        """
+        Predict with the active model, evaluating the shadow candidate (if
+        any) on the same input matrix; returns the active predictions.
+        
+        Args:
+            slot: (active, candidate) pair to use, e.g. the one the caller
+                assembled the batch for (default: the current one)
+        """
+        active, candidate = slot or self._slot  # one read: a consistent pair for the batch
+        if candidate is None:
+            return active.predict_batch(dataset, feature_state)
+        
+        features = active.features
+        transformed = features.transform(dataset, feature_state) if features else dataset
+        if same_features(active, candidate):
+            tags = list(dict.fromkeys([*active.matrix_tags, *candidate.matrix_tags]))
+            columns, column_ok = build_columns(transformed, tags)
+            shadow_input = transformed
+            shadow_columns = (columns, column_ok)
+        else:
+            columns, column_ok = build_columns(transformed, active.matrix_tags)
+            state = self._shadow_state if feature_state is not None else None
+            shadow_input = candidate.features.transform(dataset, state) if candidate.features else dataset
+            shadow_columns = build_columns(shadow_input, candidate.matrix_tags)
+        
+        primary = self._batch(active, dataset, active.evaluate_columns(transformed, columns, column_ok))
+        shadow = self._batch(candidate, dataset, candidate.evaluate_columns(shadow_input, *shadow_columns))
+        report = self.shadow_report
+        if report is not None and report.candidate_hash == candidate.model_hash:
+            report.update(primary, shadow)
+        return primary
+    
+    @staticmethod
+    def _batch(sensor: SoftSensor, dataset: ColumnarDataset, result: tuple) -> PredictionBatch:
+        timestamps = dataset.timestamps
+        y_hat, lower, upper, status = result
+        return PredictionBatch(
+            timestamps=timestamps if isinstance(timestamps, array) else array("q", timestamps),
+            y_hat=y_hat,
+            uncertainty_lower=lower,
+            uncertainty_upper=upper,
+            status=status,
+            variable_id=sensor.config.output_variable,
+            model_id=sensor.config.model_id,
+            model_hash=sensor.model_hash,
+        )
+    
+    def start(self) -> "ModelWatcher":
+        """Poll in a daemon thread every `interval` seconds."""
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="model-watcher", daemon=True)
+            self._thread.start()
+        return self
+    
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+    
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                self.poll()
+            except Exception as exc:  # keep watching: the next poll may succeed
+                self.n_errors += 1
+                self.last_error = f"{type(exc).__name__}: {exc}"
+                _log.exception("Polling model directory %s failed", self.model_dir)
+    
+    def status(self) -> dict[str, Any]:
+        active, candidate = self._slot
+        return {
+            "model_dir": str(self.model_dir),
+            "active": {"model_id": active.config.model_id, "model_hash": active.model_hash},
+            "candidate": (
+                {"model_id": candidate.config.model_id, "model_hash": candidate.model_hash}
+                if candidate is not None else None
+            ),
+            "n_swaps": self.n_swaps,
+            "rejected": dict(self.rejected),
+            "n_errors": self.n_errors,
+            "last_error": self.last_error,
+            "shadow": self.shadow_report.to_dict() if self.shadow_report else None,
+        }
@@ -7,17 +7,39 @@ This is a demonstration - not a production model.
 
 import json
 import hashlib
-from dataclasses import dataclass, asdict
-from datetime import datetime, timezone
+import sys
+import time
+from array import array
+from collections import Counter
+from dataclasses import dataclass, asdict, field
 from pathlib import Path
-from typing import Any
+from typing import Any, Iterable, Iterator
+
+from acqc_demo import serialize
+from acqc_demo.cache import PredictionCache
+from acqc_demo.conformal import ConformalCalibrator, lab_residuals
+from acqc_demo.dataset import ColumnarDataset, QC_OK, ns_to_iso, ns_to_iso_many
+from acqc_demo.drift import DetectorResult, DriftDetector
+from acqc_demo.features import FeaturePipeline, FeatureState
+from acqc_demo.instrument import timed
+from acqc_demo.storage import load_binary, save_binary
+
+
+STATUS_OK = 0
+STATUS_DEGRADED = 1
+STATUS_OOD = 2
+STATUS_NAMES = ("OK", "DEGRADED", "OOD")
+_STATUS_JSON = tuple(json.dumps(name) for name in STATUS_NAMES)
+_BOUND_COLUMNS = ("y_hat", "uncertainty_lower", "uncertainty_upper")
+
+_NAN = float("nan")
 
 
 def _utc_now_iso() -> str:
-    return datetime.now(timezone.utc).isoformat().replace("+00:00", "Z")
+    return ns_to_iso(time.time_ns())
 
 
-@dataclass
+@dataclass(slots=True)
 class Prediction:
     """Single prediction from soft sensor."""
     timestamp: str
@@ -30,6 +52,152 @@ class Prediction:
     status: str  # "OK", "DEGRADED", "OOD"
 
 
+def count_statuses(statuses: Iterable[str]) -> dict[str, int]:
+    """Predictions per status name, in one pass."""
+    counts = Counter(statuses)
+    return {name: counts[name] for name in STATUS_NAMES}
+
+
+@dataclass
+class PredictionBatch:
+    """
+    Predictions of one model over a dataset, stored column-wise.
+    
+    Parallel arrays (epoch-ns timestamps, y_hat and bounds, status codes)
+    plus the model strings once, instead of one Prediction object per row.
+    Behaves as a read-only sequence of Prediction: indexing and iteration
+    build row views on demand; slicing returns a batch over array slices.
+    """
+    timestamps: array  # int64 epoch nanoseconds
+    y_hat: array
+    uncertainty_lower: array
+    uncertainty_upper: array
+    status: array  # codes indexing STATUS_NAMES
+    variable_id: str
+    model_id: str
+    model_hash: str
+    
+    def __post_init__(self) -> None:
+        # Shared by every row dict and view of every batch of the model
+        self.variable_id = sys.intern(self.variable_id)
+        self.model_id = sys.intern(self.model_id)
+        self.model_hash = sys.intern(self.model_hash)
+    
+    def __len__(self) -> int:
+        return len(self.y_hat)
+    
+    def __getitem__(self, index: int | slice) -> "Prediction | PredictionBatch":
+        if isinstance(index, slice):
+            return PredictionBatch(
+                timestamps=self.timestamps[index],
+                y_hat=self.y_hat[index],
+                uncertainty_lower=self.uncertainty_lower[index],
+                uncertainty_upper=self.uncertainty_upper[index],
+                status=self.status[index],
+                variable_id=self.variable_id,
+                model_id=self.model_id,
+                model_hash=self.model_hash,
+            )
+        return self._view(index)
+    
+    def __iter__(self) -> Iterator[Prediction]:
+        return map(self._view, range(len(self.y_hat)))
+    
+    def _view(self, i: int) -> Prediction:
+        return Prediction(
+            ns_to_iso(self.timestamps[i]),
+            self.variable_id,
+            self.y_hat[i],
+            self.uncertainty_lower[i],
+            self.uncertainty_upper[i],
+            self.model_id,
+            self.model_hash,
+            STATUS_NAMES[self.status[i]],
+        )
+    
+    def row(self, i: int) -> dict[str, Any]:
+        """Row i as a dict, same as asdict() of its Prediction."""
+        return {
+            "timestamp": ns_to_iso(self.timestamps[i]),
+            "variable_id": self.variable_id,
+            "y_hat": self.y_hat[i],
+            "uncertainty_lower": self.uncertainty_lower[i],
+            "uncertainty_upper": self.uncertainty_upper[i],
+            "model_id": self.model_id,
+            "model_hash": self.model_hash,
+            "status": STATUS_NAMES[self.status[i]],
+        }
+    
+    def status_counts(self) -> dict[str, int]:
+        """Predictions per status name, in one pass over the status codes."""
+        counts = Counter(self.status)
+        return {name: counts[code] for code, name in enumerate(STATUS_NAMES)}
+    
+    def encode_rows(self, start: int, stop: int, fmt: str = "json") -> list[str]:
+        """
+        Rows [start, stop) as JSON text for serialize.write_document
+        ("json"/"compact") or write_ndjson ("ndjson"), equal to encoding
+        row() but rendered from the arrays without per-row dicts.
+        """
+        template = serialize.record_template(
+            [
+                ("timestamp", None),
+                ("variable_id", json.dumps(self.variable_id)),
+                ("y_hat", None),
+                ("uncertainty_lower", None),
+                ("uncertainty_upper", None),
+                ("model_id", json.dumps(self.model_id)),
+                ("model_hash", json.dumps(self.model_hash)),
+                ("status", None),
+            ],
+            fmt,
+        )
+        return serialize.render_records(template, [
+            [f'"{ts}"' for ts in ns_to_iso_many(self.timestamps[start:stop])],
+            serialize.json_floats(self.y_hat[start:stop]),
+            serialize.json_floats(self.uncertainty_lower[start:stop]),
+            serialize.json_floats(self.uncertainty_upper[start:stop]),
+            [_STATUS_JSON[code] for code in self.status[start:stop]],
+        ])
+    
+    def to_dataset(self) -> ColumnarDataset:
+        """
+        As a ColumnarDataset for the binary container (storage module):
+        value columns y_hat, uncertainty_lower and uncertainty_upper, each
+        with the status codes as its qc_flags column.
+        """
+        return ColumnarDataset(
+            timestamps=self.timestamps,
+            values={name: getattr(self, name) for name in _BOUND_COLUMNS},
+            qc_flags=dict.fromkeys(_BOUND_COLUMNS, self.status),
+            units={},
+            metadata={
+                "content": "predictions",
+                "variable_id": self.variable_id,
+                "model_id": self.model_id,
+                "model_hash": self.model_hash,
+                "status_names": list(STATUS_NAMES),
+            },
+        )
+    
+    @classmethod
+    def from_dataset(cls, dataset: ColumnarDataset) -> "PredictionBatch":
+        """Inverse of to_dataset(); columns of a loaded file stay memory-mapped."""
+        meta = dataset.metadata
+        if meta.get("content") != "predictions":
+            raise ValueError("Dataset does not hold predictions")
+        return cls(
+            timestamps=dataset.timestamps,
+            y_hat=dataset.values["y_hat"],
+            uncertainty_lower=dataset.values["uncertainty_lower"],
+            uncertainty_upper=dataset.values["uncertainty_upper"],
+            status=dataset.qc_flags["y_hat"],
+            variable_id=meta["variable_id"],
+            model_id=meta["model_id"],
+            model_hash=meta["model_hash"],
+        )
+
+
 @dataclass
 class ModelConfig:
     """Configuration for the soft sensor model."""
@@ -40,13 +208,17 @@ class ModelConfig:
     coefficients: dict[str, float]
     intercept: float
     uncertainty_factor: float  # Multiplier for prediction interval
+    # FeatureSpec dicts (features module); coefficients may refer to their names
+    features: list[dict[str, Any]] = field(default_factory=list)
+    # DriftDetector.to_config(); None falls back to the prediction range check
+    detector: dict[str, Any] | None = None
 
 
 def create_baseline_model() -> ModelConfig:
     """
     Create a baseline linear model (simulating PLS/PCR).
     
-    In production, this would be loaded from a trained artifact.
+    Trained artifacts come from train.train_model() (see load_model_config).
     """
     return ModelConfig(
         model_id="soft-sensor-ron-v1",
@@ -64,43 +236,134 @@ def create_baseline_model() -> ModelConfig:
     )
 
 
+def save_model_config(config: ModelConfig, path: Path) -> Path:
+    """Write a ModelConfig artifact as JSON."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w") as f:
+        json.dump(asdict(config), f, indent=2)
+    return path
+
+
+def load_model_config(path: Path) -> ModelConfig:
+    """Read a ModelConfig artifact written by save_model_config()."""
+    with open(path) as f:
+        data = json.load(f)
+    try:
+        return ModelConfig(**data)
+    except TypeError as exc:
+        raise ValueError(f"Invalid model artifact {path}: {exc}") from None
+
+
 def compute_model_hash(config: ModelConfig) -> str:
     """Compute a hash of the model configuration for traceability."""
-    config_str = json.dumps(asdict(config), sort_keys=True)
+    data = asdict(config)
+    # Models without features or detector keep their hash
+    if not data["features"]:
+        del data["features"]
+    if data["detector"] is None:
+        del data["detector"]
+    config_str = json.dumps(data, sort_keys=True)
     return hashlib.sha256(config_str.encode()).hexdigest()[:16]
 
 
 class SoftSensor:
-    """Simple soft sensor for demo purposes."""
+    """
+    Simple soft sensor for demo purposes.
     
-    def __init__(self, config: ModelConfig | None = None):
+    Args:
+        config: Model configuration (default: baseline model)
+        detector: Input OOD/drift checks (default: built from
+            config.detector). Without one, OOD falls back to the fixed
+            80-100 prediction range.
+        calibrator: Conformal interval half-widths from lab residuals
+            (feed it with calibrator.update(lab - y_hat)); without one, or
+            until it has enough residuals, config.uncertainty_factor
+        cache: Memo of predict()'s model evaluation over quantized inputs
+            (one cache per sensor; emptied when the model hash changes)
+    """
+    
+    def __init__(
+        self,
+        config: ModelConfig | None = None,
+        detector: DriftDetector | None = None,
+        calibrator: ConformalCalibrator | None = None,
+        cache: PredictionCache | None = None,
+    ):
         self.config = config or create_baseline_model()
         self.model_hash = compute_model_hash(self.config)
-        self._ood_threshold = 2.0  # Standard deviations
+        if detector is None and self.config.detector is not None:
+            detector = DriftDetector.from_config(self.config.detector)
+        self.detector = detector
+        self.calibrator = calibrator
+        self.last_check: DetectorResult | None = None  # detector result of the last predict()
+        self.features = (
+            FeaturePipeline.from_config(self.config.features) if self.config.features else None
+        )
+        # Inputs that must be present: raw input tags plus every feature
+        self._required = list(self.config.input_tags)
+        if self.features is not None:
+            self._required += [n for n in self.features.names if n not in self._required]
+            self._feature_state = self.features.state()
+        self._input_set = frozenset(self._required)
+        # Opt-in memo of the model evaluation in predict() (cache module)
+        self.cache = cache
+        self._cache_tags = tuple(dict.fromkeys([*self._required, *self.config.coefficients]))
     
+    @property
+    def source_tags(self) -> list[str]:
+        """Raw tags read by the model (inputs, coefficient tags, feature and detector sources)."""
+        names = set(self.features.names) if self.features is not None else set()
+        tags = [*self.config.input_tags, *(t for t in self.config.coefficients if t not in names)]
+        if self.features is not None:
+            tags += self.features.source_tags
+        if self.detector is not None:
+            tags += [t for t in self.detector.tags if t not in names]
+        return list(dict.fromkeys(tags))
+    
+    def reset_features(self) -> None:
+        """Forget the feature history used by predict()."""
+        if self.features is not None:
+            self._feature_state = self.features.state()
+    
+    @timed("predict")
     def predict(
         self,
         tag_values: dict[str, float],
-        timestamp: str | None = None,
+        timestamp: str | int | None = None,
     ) -> Prediction:
         """
         Make a prediction given current tag values.
         
+        Models with features keep their history between calls: each call
+        is the next sample (see reset_features()). So does the detector's
+        drift tests; their result is kept in `last_check`.
+        
         Args:
             tag_values: Dict mapping tag_id to current value
-            timestamp: ISO timestamp (uses now if not provided)
+            timestamp: ISO timestamp or epoch ns (uses now if not provided)
         
         Returns:
             Prediction with estimate, uncertainty, and status
         """
-        ts = timestamp or _utc_now_iso()
+        if isinstance(timestamp, int):
+            ts = ns_to_iso(timestamp)
+        else:
+            ts = timestamp or _utc_now_iso()
+        
+        if self.features is not None:
+            # Streaming mode: one update of the feature ring buffers per call
+            tag_values = {**tag_values, **self._feature_state.push(tag_values)}
+        
+        if self.detector is not None:
+            self.last_check = self.detector.update(tag_values)
         
         # Check for missing or bad inputs
-        missing = set(self.config.input_tags) - set(tag_values.keys())
+        missing = self._input_set.difference(tag_values)
         has_nan = any(
             tag_values.get(t) is None or 
             (isinstance(tag_values.get(t), float) and tag_values.get(t) != tag_values.get(t))
-            for t in self.config.input_tags
+            for t in self._required
         )
         
         if missing or has_nan:
@@ -115,17 +378,35 @@ class SoftSensor:
                 status="DEGRADED",
             )
         
-        # Linear prediction
-        y_hat = self.config.intercept
-        for tag_id, coef in self.config.coefficients.items():
-            y_hat += coef * tag_values.get(tag_id, 0.0)
+        # Linear prediction, memoized on the quantized inputs with a cache
+        key = y_hat = None
+        if self.cache is not None:
+            self.cache.bind(self.model_hash)
+            key = self.cache.key(
+                self.model_hash,
+                self._cache_tags,
+                [tag_values.get(t, 0.0) for t in self._cache_tags],
+            )
+            if key is not None:
+                y_hat = self.cache.get(key)
+        if y_hat is None:
+            y_hat = self.config.intercept
+            for tag_id, coef in self.config.coefficients.items():
+                y_hat += coef * tag_values.get(tag_id, 0.0)
+            if key is not None:
+                self.cache.put(key, y_hat)
         
-        # Simple uncertainty (in production: from calibration)
+        # Interval half-width: conformal when calibrated, else the model's factor
         uncertainty = self.config.uncertainty_factor
+        if self.calibrator is not None:
+            uncertainty = self.calibrator.half_width(uncertainty)
         
-        # OOD check (simplified: based on prediction range)
+        # OOD check: input-space detector, or the prediction range without one
         status = "OK"
-        if y_hat < 80 or y_hat > 100:
+        if (
+            self.last_check.ood if self.detector is not None
+            else y_hat < 80 or y_hat > 100
+        ):
             status = "OOD"
             uncertainty *= 2  # Widen interval when OOD
         
@@ -142,58 +423,269 @@ class SoftSensor:
     
     def predict_batch(
         self,
-        dataset: dict[str, Any],
-    ) -> list[Prediction]:
+        dataset: dict[str, Any] | ColumnarDataset,
+        feature_state: FeatureState | None = None,
+    ) -> PredictionBatch:
         """
         Run predictions on a dataset from data_gen.
         
         Args:
-            dataset: Output from generate_demo_dataset()
+            dataset: Output from generate_demo_dataset(), either the dict
+                format or a ColumnarDataset (dicts are converted once)
+            feature_state: Feature history to continue from (see
+                predict_columns)
         
         Returns:
-            List of predictions
+            PredictionBatch (a sequence of Prediction)
         """
-        predictions = []
-        n_samples = dataset["metadata"]["n_samples"]
-        tags = dataset["tags"]
-        
-        for i in range(n_samples):
-            # Gather tag values for this timestamp
-            tag_values = {}
-            timestamp = None
-            
-            for tag_id, samples in tags.items():
-                if i < len(samples):
-                    sample = samples[i]
-                    timestamp = sample["timestamp"]
-                    if sample["qc_flag"] == "OK":
-                        tag_values[tag_id] = sample["value"]
-            
-            pred = self.predict(tag_values, timestamp)
-            predictions.append(pred)
-        
-        return predictions
+        if not isinstance(dataset, ColumnarDataset):
+            dataset = ColumnarDataset.from_dict(dataset)
+        
+        y_hat, lower, upper, status = self.predict_columns(dataset, feature_state)
+        
+        timestamps = dataset.timestamps
+        return PredictionBatch(
+            timestamps=timestamps if isinstance(timestamps, array) else array("q", timestamps),
+            y_hat=y_hat,
+            uncertainty_lower=lower,
+            uncertainty_upper=upper,
+            status=status,
+            variable_id=self.config.output_variable,
+            model_id=self.config.model_id,
+            model_hash=self.model_hash,
+        )
+    
+    def build_input_matrix(
+        self,
+        dataset: ColumnarDataset,
+    ) -> tuple[dict[str, list[float]], bytearray]:
+        """
+        Build the (n_samples x n_tags) input matrix once, column-major.
+        
+        Non-OK samples read as 0.0, as a tag absent from `tag_values` does
+        in predict(). The validity mask is 0 for rows where any input tag is
+        missing, not OK or NaN (the DEGRADED rows).
+        
+        Returns:
+            (columns keyed by tag_id, validity mask)
+        """
+        columns, column_ok = build_columns(dataset, self.matrix_tags)
+        return columns, combine_validity(column_ok, self._required, dataset.n_samples)
+    
+    @property
+    def matrix_tags(self) -> list[str]:
+        """Columns of the input matrix: required inputs, then coefficient tags."""
+        return list(dict.fromkeys([*self._required, *self.config.coefficients]))
+    
+    @timed("predict")
+    def predict_columns(
+        self,
+        dataset: ColumnarDataset,
+        feature_state: FeatureState | None = None,
+        lab_results: tuple[Any, Any] | None = None,
+    ) -> tuple[array, array, array, array]:
+        """
+        Vectorized batch engine: same results as predict() row by row.
+        
+        Computes y_hat as one matrix-vector product over the input columns
+        (accumulated in coefficient order, so floating-point results are
+        identical to predict()), then applies the DEGRADED/OOD masks and
+        uncertainty bounds column-wise.
+        
+        Models with features first add the feature columns (batch mode of
+        the same kernels). The history starts empty unless `feature_state`
+        is given, e.g. to continue across consecutive micro-batches. With a
+        detector, OOD is its T²/SPE/range mask (DriftDetector.ood_mask).
+        
+        With a calibrator, intervals use its current half-width, or, given
+        `lab_results` (lab timestamps, values) for the batch period, the
+        online conformal half-width of every row (ConformalCalibrator.sweep,
+        which also advances the calibrator).
+        
+        Returns:
+            (y_hat, uncertainty_lower, uncertainty_upper, status codes) arrays;
+            status codes index STATUS_NAMES
+        """
+        if self.features is not None:
+            dataset = self.features.transform(dataset, feature_state)
+        columns, column_ok = build_columns(dataset, self.matrix_tags)
+        return self.evaluate_columns(dataset, columns, column_ok, lab_results)
+    
+    def evaluate_columns(
+        self,
+        dataset: ColumnarDataset,
+        columns: dict[str, list[float]],
+        column_ok: dict[str, bytearray],
+        lab_results: tuple[Any, Any] | None = None,
+    ) -> tuple[array, array, array, array]:
+        """
+        Model stage of predict_columns() over a prebuilt input matrix.
+        
+        `dataset` already carries the feature columns, and `columns` /
+        `column_ok` come from build_columns() over (at least) matrix_tags,
+        so several models can share one matrix (hotswap shadow mode).
+        """
+        valid = combine_validity(column_ok, self._required, dataset.n_samples)
+        y = linear_response(
+            columns, self.config.coefficients, self.config.intercept, dataset.n_samples
+        )
+        ood = self.detector.ood_mask(dataset) if self.detector is not None else None
+        
+        half: float | array = self.config.uncertainty_factor
+        if self.calibrator is not None and lab_results is None:
+            half = self.calibrator.half_width(half)
+        elif self.calibrator is not None:
+            lab_timestamps, lab_values = lab_results
+            # Residuals against the published (rounded) estimates
+            published = [round(v, 3) if ok else _NAN for v, ok in zip(y, valid)]
+            residuals = lab_residuals(dataset.timestamps, published, lab_timestamps, lab_values)
+            half = self.calibrator.sweep(dataset.timestamps, lab_timestamps, residuals, half)
+        return finalize_batch(y, valid, half, ood)
+
 
+def build_columns(
+    dataset: ColumnarDataset,
+    tag_ids: list[str],
+) -> tuple[dict[str, list[float]], dict[str, bytearray]]:
+    """
+    Masked input columns for the given tags, built once per dataset.
+    
+    Non-OK samples read as 0.0, as a tag absent from `tag_values` does in
+    predict(); tags absent from the dataset are all 0.0.
+    
+    Returns:
+        (columns keyed by tag_id, per-column validity: 1 where OK and not NaN)
+    """
+    n = dataset.n_samples
+    columns: dict[str, list[float]] = {}
+    column_ok: dict[str, bytearray] = {}
+    
+    for tag_id in tag_ids:
+        if tag_id not in dataset.values:
+            columns[tag_id] = [0.0] * n
+            column_ok[tag_id] = bytearray(n)
+            continue
+        values, qc_flags = dataset.column(tag_id)
+        columns[tag_id] = [v if q == QC_OK else 0.0 for v, q in zip(values, qc_flags)]
+        column_ok[tag_id] = bytearray(q == QC_OK and v == v for v, q in zip(values, qc_flags))
+    
+    return columns, column_ok
+
+
+def combine_validity(
+    column_ok: dict[str, bytearray],
+    input_tags: list[str],
+    n: int,
+) -> bytearray:
+    """Row validity mask: 0 where any input tag is missing, not OK or NaN (DEGRADED)."""
+    valid = bytearray(b"\x01") * n
+    for tag_id in input_tags:
+        valid = bytearray(a & b for a, b in zip(valid, column_ok[tag_id]))
+    return valid
+
+
+def linear_response(
+    columns: dict[str, list[float]],
+    coefficients: dict[str, float],
+    intercept: float,
+    n: int,
+) -> list[float]:
+    """Matrix-vector product, accumulated in coefficient order like predict()."""
+    y = [intercept] * n
+    for tag_id, coef in coefficients.items():
+        y = [acc + coef * x for acc, x in zip(y, columns[tag_id])]
+    return y
+
+
+def finalize_batch(
+    y: list[float],
+    valid: bytearray,
+    uncertainty_factor: float | array,
+    ood: bytearray | None = None,
+) -> tuple[array, array, array, array]:
+    """
+    Apply DEGRADED/OOD masks, uncertainty bounds and rounding column-wise.
+    
+    `uncertainty_factor` is the interval half-width, either one value or
+    one per row (conformal). `ood` comes from a DriftDetector; without it
+    the prediction range check is used.
+    """
+    if ood is None:
+        ood = [v < 80 or v > 100 for v in y]
+    
+    # Widen interval when OOD
+    if isinstance(uncertainty_factor, (int, float)):
+        u = uncertainty_factor
+        u_ood = u * 2
+        half = [u_ood if o else u for o in ood]
+    else:
+        half = [h * 2 if o else h for h, o in zip(uncertainty_factor, ood)]
+    
+    y_hat = array("d", [round(v, 3) if ok else _NAN for v, ok in zip(y, valid)])
+    lower = array("d", [
+        round(v - h, 3) if ok else _NAN for v, h, ok in zip(y, half, valid)
+    ])
+    upper = array("d", [
+        round(v + h, 3) if ok else _NAN for v, h, ok in zip(y, half, valid)
+    ])
+    status = array("B", [
+        (STATUS_OOD if o else STATUS_OK) if ok else STATUS_DEGRADED
+        for o, ok in zip(ood, valid)
+    ])
+    
+    return y_hat, lower, upper, status
 
+
+@timed("persist")
 def save_predictions(
-    predictions: list[Prediction],
+    predictions: PredictionBatch | list[Prediction],
     output_path: Path,
-) -> None:
-    """Save predictions to JSON file."""
+    fmt: str = "json",
+    chunk_rows: int = serialize.DEFAULT_CHUNK_ROWS,
+) -> Path:
+    """
+    Save predictions to file, `chunk_rows` rows at a time.
+    
+    Formats (serialize.FORMATS): "json" document with status counts,
+    "compact" (the same without whitespace), "ndjson" (one prediction per
+    line, no counts) or "binary" (.acqc container of
+    PredictionBatch.to_dataset(), for a PredictionBatch only).
+    """
+    serialize.check_format(fmt)
+    output_path = Path(output_path)
     output_path.parent.mkdir(parents=True, exist_ok=True)
     
+    if isinstance(predictions, PredictionBatch):
+        if fmt == "binary":
+            return save_binary(predictions.to_dataset(), output_path)
+        counts = predictions.status_counts()
+        encode = predictions.encode_rows
+    elif fmt == "binary":
+        raise ValueError("Binary prediction output needs a PredictionBatch")
+    else:
+        counts = count_statuses(p.status for p in predictions)
+        
+        def encode(start: int, stop: int, fmt: str) -> list[str]:
+            return serialize.encode_items(map(asdict, predictions[start:stop]), fmt)
+    
+    n = len(predictions)
+    chunks = (encode(start, min(start + chunk_rows, n), fmt) for start in range(0, n, chunk_rows))
     with open(output_path, "w") as f:
-        json.dump(
-            {
-                "predictions": [asdict(p) for p in predictions],
-                "n_total": len(predictions),
-                "n_ok": sum(1 for p in predictions if p.status == "OK"),
-                "n_degraded": sum(1 for p in predictions if p.status == "DEGRADED"),
-                "n_ood": sum(1 for p in predictions if p.status == "OOD"),
-            },
-            f,
-            indent=2,
-        )
+        if fmt == "ndjson":
+            serialize.write_ndjson(f, chunks)
+        else:
+            serialize.write_document(f, "predictions", chunks, fmt, after={
+                "n_total": n,
+                "n_ok": counts["OK"],
+                "n_degraded": counts["DEGRADED"],
+                "n_ood": counts["OOD"],
+            })
+    return output_path
+
+
+def load_predictions(path: Path) -> PredictionBatch:
+    """Open predictions saved with fmt="binary" (memory-mapped)."""
+    return PredictionBatch.from_dataset(load_binary(path))
 
 
 if __name__ == "__main__":
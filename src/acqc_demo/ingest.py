@@ -0,0 +1,453 @@
+"""
+Ingestion module for ACQC demo.
+
+Bulk loading of historian exports (CSV or JSONL, one tag sample per row)
+into the columnar dataset format used by inference:
+- Streams the file in chunks, so memory is bounded by the columnar output
+- Validates against schemas/tag_timeseries.schema.json with column-wise
+  checks compiled once from the schema (no per-record jsonschema calls)
+- Reports rejected rows by reason; empty units fall back to the tag
+  dictionary and duplicate (tag_id, ts) rows keep the last one
+"""
+
+import csv
+import json
+import math
+from array import array
+from collections import Counter
+from itertools import islice
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Callable, Iterator
+
+from acqc_demo.dataset import ColumnarDataset, QC_BAD, SCHEMA_QUALITY_CODES, data_dir, iso_to_ns
+from acqc_demo.instrument import timed
+from acqc_demo.tags import load_tag_dictionary
+
+
+SCHEMA_DIR_ENV = "ACQC_SCHEMA_DIR"  # overrides the checkout's schemas/ directory
+
+_MISSING = object()
+_NAN = float("nan")
+
+
+def tag_schema_path() -> Path:
+    """schemas/tag_timeseries.schema.json (see dataset.data_dir)."""
+    return data_dir("schemas", SCHEMA_DIR_ENV) / "tag_timeseries.schema.json"
+
+
+@dataclass
+class IngestReport:
+    """Accepted/rejected row counts of an ingestion run."""
+    n_rows: int = 0
+    n_accepted: int = 0
+    n_rejected: int = 0
+    reasons: Counter = field(default_factory=Counter)
+    examples: list[tuple[int, str]] = field(default_factory=list)  # (row number, reason)
+    max_examples: int = 20
+    
+    def reject(self, row: int, reason: str) -> None:
+        self.n_rejected += 1
+        self.reasons[reason] += 1
+        if len(self.examples) < self.max_examples:
+            self.examples.append((row, reason))
+    
+    def summary(self) -> dict[str, Any]:
+        return {
+            "n_rows": self.n_rows,
+            "n_accepted": self.n_accepted,
+            "n_rejected": self.n_rejected,
+            "reasons": dict(self.reasons),
+            "examples": self.examples,
+        }
+
+
+_PY_TYPES: dict[str, tuple[type, ...]] = {
+    "string": (str,),
+    "number": (int, float),
+    "integer": (int,),
+    "boolean": (bool,),
+    "object": (dict,),
+    "array": (list,),
+    "null": (type(None),),
+}
+
+
+class CompiledSchema:
+    """
+    Column-wise validator compiled once from a JSON Schema.
+    
+    Supports the subset used by the repo schemas: `required`, property
+    `type` (single or list), `enum` and `additionalProperties: false`.
+    Each column is first checked as a whole (set of value types, set of
+    values); rows are only inspected one by one when that check fails.
+    """
+    
+    def __init__(self, schema: dict[str, Any]):
+        self.required = list(schema.get("required", []))
+        self.properties: dict[str, dict[str, Any]] = schema.get("properties", {})
+        self.additional = schema.get("additionalProperties", True)
+        self.types: dict[str, tuple[str, ...]] = {}
+        self.py_types: dict[str, frozenset[type]] = {}
+        self.enums: dict[str, frozenset[Any]] = {}
+        
+        for name, spec in self.properties.items():
+            types = spec.get("type")
+            types = tuple([types] if isinstance(types, str) else types or ())
+            self.types[name] = types
+            if "enum" in spec:
+                self.enums[name] = frozenset(spec["enum"])
+            elif types:
+                # Exact types: bool must not pass as a number
+                self.py_types[name] = frozenset(t for type_name in types for t in _PY_TYPES[type_name])
+    
+    @classmethod
+    def from_file(cls, path: Path | None = None) -> "CompiledSchema":
+        """Compile a schema file (default: tag_schema_path())."""
+        with open(path or tag_schema_path()) as f:
+            return cls(json.load(f))
+    
+    def check_columns(
+        self,
+        columns: dict[str, list[Any]],
+        n: int,
+    ) -> tuple[bytearray, list[tuple[int, str]]]:
+        """
+        Validate a chunk given as columns of typed values.
+        
+        Missing values are represented by the _MISSING sentinel.
+        
+        Returns:
+            (mask with 1 for valid rows, [(row offset, reason)] for rejects)
+        """
+        ok = bytearray(b"\x01") * n
+        rejects: list[tuple[int, str]] = []
+        
+        def fail(col: list[Any], predicate: Callable[[Any], bool], reason: str) -> None:
+            for i, v in enumerate(col):
+                if ok[i] and not predicate(v):
+                    ok[i] = 0
+                    rejects.append((i, reason))
+        
+        for name in self.required:
+            col = columns.get(name)
+            if col is None:
+                fail(range(n), lambda v: False, f"missing column: {name}")
+            elif _MISSING in col:
+                fail(col, lambda v: v is not _MISSING, f"missing required field: {name}")
+        
+        missing_type = type(_MISSING)
+        for name, allowed_types in self.py_types.items():
+            col = columns.get(name)
+            if col is None:
+                continue
+            allowed_types = allowed_types | {missing_type}
+            if not set(map(type, col)) <= allowed_types:
+                fail(col, lambda v: type(v) in allowed_types, f"invalid {name}")
+        
+        for name, allowed in self.enums.items():
+            col = columns.get(name)
+            if col is None:
+                continue
+            allowed = allowed | {_MISSING}
+            try:
+                clean = set(col) <= allowed
+            except TypeError:  # unhashable values (objects, arrays)
+                clean = False
+            if not clean:
+                fail(col, lambda v: _is_hashable(v) and v in allowed, f"invalid {name}")
+        
+        return ok, rejects
+
+
+def _is_hashable(v: Any) -> bool:
+    return not isinstance(v, (dict, list))
+
+
+class _TagAccumulator:
+    """Per-tag typed columns collected across chunks."""
+    
+    __slots__ = ("timestamps", "values", "qc_flags", "unit", "sorted")
+    
+    def __init__(self, unit: str):
+        self.timestamps = array("q")
+        self.values = array("d")
+        self.qc_flags = array("B")
+        self.unit = unit
+        self.sorted = True
+
+
+class ColumnarBuilder:
+    """Pivots accepted long-format rows (ts, tag, value, quality) into a ColumnarDataset."""
+    
+    def __init__(self):
+        self.tags: dict[str, _TagAccumulator] = {}
+        self.n_duplicates = 0  # rows dropped by build() for a repeated (tag_id, ts)
+        self._ts_cache: dict[str, int] = {}
+    
+    def parse_timestamps(
+        self,
+        col: list[Any],
+        ok: bytearray,
+    ) -> tuple[array, list[tuple[int, str]]]:
+        """
+        Parse the `ts` column of a validated chunk to epoch ns.
+        
+        Rows whose timestamp is not ISO-8601 are cleared in `ok`.
+        
+        Returns:
+            (epoch ns per row, 0 for invalid rows; [(row offset, reason)] for rejects)
+        """
+        cache = self._ts_cache
+        if len(cache) > 1_000_000:
+            cache.clear()
+        out = array("q", bytes(8 * len(ok)))
+        rejects: list[tuple[int, str]] = []
+        for i, ts in enumerate(col):
+            if not ok[i]:
+                continue
+            ts_ns = cache.get(ts)
+            if ts_ns is None:
+                try:
+                    ts_ns = cache[ts] = iso_to_ns(ts)
+                except ValueError:
+                    ok[i] = 0
+                    rejects.append((i, "invalid ts"))
+                    continue
+            out[i] = ts_ns
+        return out, rejects
+    
+    def add(self, columns: dict[str, list[Any]], ok: bytearray, timestamps: array) -> int:
+        """Pivot the valid rows of a chunk (see parse_timestamps); returns how many were added."""
+        n = 0
+        for i, ts_ns, tag_id, value, unit, quality in zip(
+            range(len(ok)),
+            timestamps,
+            columns.get("tag_id", ()),
+            columns.get("value", ()),
+            columns.get("unit", ()),
+            columns.get("quality", ()),
+        ):
+            if not ok[i]:
+                continue
+            acc = self.tags.get(tag_id)
+            if acc is None:
+                acc = self.tags[tag_id] = _TagAccumulator(unit)
+            if acc.timestamps and ts_ns < acc.timestamps[-1]:
+                acc.sorted = False
+            acc.timestamps.append(ts_ns)
+            acc.values.append(_NAN if value is None else value)
+            acc.qc_flags.append(SCHEMA_QUALITY_CODES[quality])
+            n += 1
+        return n
+    
+    def build(self, metadata: dict[str, Any] | None = None) -> ColumnarDataset:
+        """
+        Align all tags on the union of their timestamps.
+        
+        Samples a tag does not have at a timestamp are NaN with QC BAD.
+        Of rows repeating a (tag_id, ts), the last one read is kept and
+        the others are counted in n_duplicates.
+        """
+        for acc in self.tags.values():
+            ts = acc.timestamps
+            order = None
+            if not acc.sorted:
+                # Stable sort: repeated timestamps stay in reading order
+                order = sorted(range(len(ts)), key=ts.__getitem__)
+                ts = array("q", (ts[i] for i in order))
+            if any(map(int.__eq__, ts, islice(ts, 1, None))):
+                keep = [j for j in range(len(ts) - 1) if ts[j] != ts[j + 1]] + [len(ts) - 1]
+                self.n_duplicates += len(ts) - len(keep)
+                order = keep if order is None else [order[j] for j in keep]
+            if order is not None:
+                acc.timestamps = array("q", (acc.timestamps[i] for i in order))
+                acc.values = array("d", (acc.values[i] for i in order))
+                acc.qc_flags = array("B", (acc.qc_flags[i] for i in order))
+            acc.sorted = True
+        
+        accs = list(self.tags.values())
+        if accs and all(a.timestamps == accs[0].timestamps for a in accs[1:]):
+            timestamps = accs[0].timestamps
+            values = {t: a.values for t, a in self.tags.items()}
+            qc_flags = {t: a.qc_flags for t, a in self.tags.items()}
+        else:
+            grid = sorted(set().union(*(a.timestamps for a in accs)))
+            timestamps = array("q", grid)
+            position = {ts: i for i, ts in enumerate(grid)}
+            values, qc_flags = {}, {}
+            for tag_id, acc in self.tags.items():
+                col = array("d", [_NAN]) * len(grid)
+                qc = array("B", [QC_BAD]) * len(grid)
+                for ts, v, q in zip(acc.timestamps, acc.values, acc.qc_flags):
+                    j = position[ts]
+                    col[j] = v
+                    qc[j] = q
+                values[tag_id] = col
+                qc_flags[tag_id] = qc
+        
+        meta = dict(metadata or {})
+        meta.setdefault("n_samples", len(timestamps))
+        meta.setdefault("tags", list(self.tags))
+        return ColumnarDataset(
+            timestamps=timestamps,
+            values=values,
+            qc_flags=qc_flags,
+            units={t: a.unit for t, a in self.tags.items()},
+            metadata=meta,
+        )
+
+
+def _csv_chunks(path: Path, chunk_size: int, schema: CompiledSchema) -> Iterator[tuple[int, dict]]:
+    with open(path, newline="", encoding="utf-8") as f:
+        reader = csv.reader(f)
+        header = next(reader, None) or []
+        if not schema.additional:
+            extra = set(header) - set(schema.properties)
+            if extra:
+                raise ValueError(f"Columns not allowed by schema: {sorted(extra)}")
+        number_fields = {n for n, types in schema.types.items() if "number" in types}
+        object_fields = {n for n, types in schema.types.items() if "object" in types}
+        nullable = {n for n, types in schema.types.items() if "null" in types}
+        width = len(header)
+        row_no = 2  # 1-based, after the header
+        while True:
+            rows = [row for _, row in zip(range(chunk_size), reader)]
+            if not rows:
+                return
+            # Short/long rows are padded/cut so columns stay aligned
+            cols = zip(*(r if len(r) == width else (r + [""] * width)[:width] for r in rows))
+            columns: dict[str, list[Any]] = {}
+            for name, col in zip(header, cols):
+                if name in number_fields:
+                    columns[name] = [_parse_number(v) for v in col]
+                elif name in object_fields:
+                    columns[name] = [_parse_object(v) for v in col]
+                else:
+                    empty = None if name in nullable else _MISSING
+                    columns[name] = [v if v != "" else empty for v in col]
+            yield row_no, columns
+            row_no += len(rows)
+
+
+def _parse_number(v: str) -> Any:
+    if v == "":
+        return None
+    try:
+        x = float(v)
+    except ValueError:
+        return v  # left as str, rejected by the type check
+    return x if math.isfinite(x) else v
+
+
+def _parse_object(v: str) -> Any:
+    if v == "":
+        return _MISSING
+    try:
+        return json.loads(v)
+    except ValueError:
+        return v  # rejected by the type check
+
+
+def _jsonl_chunks(path: Path, chunk_size: int, schema: CompiledSchema) -> Iterator[tuple[int, dict]]:
+    names = list(schema.properties)
+    allowed = frozenset(names)
+    with open(path, encoding="utf-8") as f:
+        row_no = 1
+        while True:
+            lines = [line for _, line in zip(range(chunk_size), f)]
+            if not lines:
+                return
+            records = []
+            for line in lines:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    record = None
+                if not isinstance(record, dict) or (
+                    not schema.additional and not record.keys() <= allowed
+                ):
+                    record = None
+                records.append(record)
+            columns = {
+                name: [_MISSING if r is None else r.get(name, _MISSING) for r in records]
+                for name in names
+            }
+            # Malformed lines fail the required checks; kept to label them
+            columns["__record__"] = records
+            yield row_no, columns
+            row_no += len(lines)
+
+
+@timed("ingest")
+def ingest_file(
+    path: Path,
+    schema_path: Path | None = None,
+    chunk_size: int = 100_000,
+    fmt: str | None = None,
+    tag_units: dict[str, str] | None = None,
+) -> tuple[ColumnarDataset, IngestReport]:
+    """
+    Load a historian export into a ColumnarDataset.
+    
+    Args:
+        path: CSV (header row with schema field names) or JSONL file
+        schema_path: Tag record schema (default: tag_schema_path())
+        chunk_size: Rows per validation chunk
+        fmt: "csv" or "jsonl" (default: from the file suffix)
+        tag_units: Unit per tag_id for rows with an empty unit (default:
+            from the tag dictionary, read on the first such row)
+    
+    Returns:
+        (dataset, report of accepted/rejected rows)
+    """
+    path = Path(path)
+    fmt = fmt or ("csv" if path.suffix.lower() == ".csv" else "jsonl")
+    schema = CompiledSchema.from_file(schema_path)
+    chunks = _csv_chunks if fmt == "csv" else _jsonl_chunks
+    
+    report = IngestReport()
+    builder = ColumnarBuilder()
+    for first_row, columns in chunks(path, chunk_size, schema):
+        records = columns.pop("__record__", None)
+        n = len(next(iter(columns.values())))
+        units = columns.get("unit")
+        if units is not None and (_MISSING in units or None in units):
+            if tag_units is None:
+                tag_units = _dictionary_units()
+            _fill_units(units, columns.get("tag_id", ()), tag_units)
+        ok, rejects = schema.check_columns(columns, n)
+        timestamps, bad_ts = builder.parse_timestamps(columns.get("ts", ()), ok)
+        rejects += bad_ts
+        if records is not None:
+            rejects = [
+                (i, "malformed record" if records[i] is None else reason)
+                for i, reason in rejects
+            ]
+        for i, reason in sorted(rejects):
+            report.reject(first_row + i, reason)
+        report.n_rows += n
+        if any(ok):
+            report.n_accepted += builder.add(columns, ok, timestamps)
+    
+    dataset = builder.build(metadata={"source": str(path)})
+    if builder.n_duplicates:
+        report.n_accepted -= builder.n_duplicates
+        report.n_rejected += builder.n_duplicates
+        report.reasons["duplicate (tag_id, ts), last kept"] += builder.n_duplicates
+    return dataset, report
+
+
+def _dictionary_units() -> dict[str, str]:
+    try:
+        tags = load_tag_dictionary()
+    except FileNotFoundError:
+        return {}  # no dictionary: empty units are reported as missing
+    return {tag_id: info.unit for tag_id, info in tags.items() if info.unit}
+
+
+def _fill_units(units: list[Any], tag_ids: list[Any], tag_units: dict[str, str]) -> None:
+    for i, (unit, tag_id) in enumerate(zip(units, tag_ids)):
+        if unit is _MISSING or unit is None:
+            fallback = tag_units.get(tag_id) if isinstance(tag_id, str) else None
+            units[i] = _MISSING if fallback is None else fallback
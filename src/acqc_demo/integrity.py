@@ -0,0 +1,224 @@
+"""
+Integrity module for ACQC demo.
+
+Tamper evidence for the audit log:
+- Hash chain: each entry commits to the digest of the previous entry
+- Merkle checkpoints: a root over every block of entries, so a single entry
+  can be proven in O(log n) and a range checked without scanning the log
+- Streaming, multi-core verification of a whole log
+"""
+
+import hashlib
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from itertools import islice
+from typing import Any, Iterable, Iterator
+
+
+GENESIS_HASH = "0" * 64
+
+_NODE_PREFIX = b"\x01"
+
+
+@dataclass
+class MerkleCheckpoint:
+    """Merkle root over entries [start, end) of the log."""
+    start: int
+    end: int
+    root: str
+    head_hash: str  # entry_hash of the last entry in the block
+
+
+@dataclass
+class ChainVerification:
+    """Result of verifying a hash-chained log."""
+    ok: bool
+    n_entries: int
+    first_invalid: int | None = None
+    reason: str | None = None
+
+
+def compute_entry_hash(entry: dict[str, Any]) -> str:
+    """
+    Chain digest of an entry: SHA-256 over its canonical JSON.
+    
+    The entry dict must include `prev_hash`; any `entry_hash` key is ignored.
+    """
+    body = {k: v for k, v in entry.items() if k != "entry_hash"}
+    canonical = json.dumps(body, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+def _node_hash(left: str, right: str) -> str:
+    return hashlib.sha256(_NODE_PREFIX + left.encode() + right.encode()).hexdigest()
+
+
+def merkle_root(leaves: list[str]) -> str:
+    """Merkle root of leaf digests (an unpaired node is promoted unchanged)."""
+    if not leaves:
+        return GENESIS_HASH
+    level = list(leaves)
+    while len(level) > 1:
+        nxt = [_node_hash(level[i], level[i + 1]) for i in range(0, len(level) - 1, 2)]
+        if len(level) % 2:
+            nxt.append(level[-1])
+        level = nxt
+    return level[0]
+
+
+def merkle_proof(leaves: list[str], index: int) -> list[tuple[str, str]]:
+    """
+    Inclusion proof for leaves[index].
+    
+    Returns:
+        List of (side, sibling_digest) from leaf to root, side "L" or "R"
+    """
+    if not 0 <= index < len(leaves):
+        raise IndexError(f"Leaf index out of range: {index}")
+    proof = []
+    level = list(leaves)
+    while len(level) > 1:
+        sibling = index ^ 1
+        if sibling < len(level):
+            proof.append(("L" if sibling < index else "R", level[sibling]))
+        nxt = [_node_hash(level[i], level[i + 1]) for i in range(0, len(level) - 1, 2)]
+        if len(level) % 2:
+            nxt.append(level[-1])
+        level = nxt
+        index //= 2
+    return proof
+
+
+def verify_merkle_proof(leaf: str, proof: list[tuple[str, str]], root: str) -> bool:
+    """Check an inclusion proof in O(log n)."""
+    digest = leaf
+    for side, sibling in proof:
+        digest = _node_hash(sibling, digest) if side == "L" else _node_hash(digest, sibling)
+    return digest == root
+
+
+def verify_entry(
+    entry: dict[str, Any],
+    proof: list[tuple[str, str]],
+    checkpoint: MerkleCheckpoint,
+) -> bool:
+    """Prove a single persisted entry against a checkpoint without the rest of the log."""
+    digest = compute_entry_hash(entry)
+    return digest == entry.get("entry_hash") and verify_merkle_proof(
+        digest, proof, checkpoint.root
+    )
+
+
+def verify_block(entries: list[Any], prev_hash: str | None = None) -> tuple:
+    """
+    Recompute digests and links for a block of entries.
+    
+    Args:
+        entries: Entry dicts or their raw JSON lines
+        prev_hash: Expected prev_hash of the first entry (None: not checked)
+    
+    Returns:
+        (first_prev_hash, last_entry_hash, merkle_root, bad_offset, reason);
+        bad_offset is None when the block is consistent
+    """
+    leaves = []
+    first_prev = None
+    for i, entry in enumerate(entries):
+        if not isinstance(entry, dict):
+            entry = json.loads(entry)
+        if i == 0:
+            first_prev = entry.get("prev_hash")
+        expected_prev = prev_hash if i == 0 else leaves[-1]
+        if expected_prev is not None and entry.get("prev_hash") != expected_prev:
+            return first_prev, None, None, i, "broken chain link"
+        digest = compute_entry_hash(entry)
+        if digest != entry.get("entry_hash"):
+            return first_prev, None, None, i, "entry hash mismatch"
+        leaves.append(digest)
+    return first_prev, leaves[-1] if leaves else None, merkle_root(leaves), None, None
+
+
+def _blocks(entries: Iterable[Any], size: int) -> Iterator[list[Any]]:
+    it = iter(entries)
+    while block := list(islice(it, size)):
+        yield block
+
+
+def verify_chain(
+    entries: Iterable[Any],
+    checkpoints: list[MerkleCheckpoint] | None = None,
+    block_size: int = 1024,
+    workers: int | None = 1,
+) -> ChainVerification:
+    """
+    Verify a hash-chained log in one streaming pass.
+    
+    Blocks of `block_size` entries are verified independently (in a process
+    pool when `workers` != 1, None meaning all cores) and stitched together
+    by their boundary links. Only a bounded number of blocks is in flight,
+    so memory does not depend on the log size. When checkpoints are given,
+    `block_size` must match the interval they were written with and every
+    block root is compared with its checkpoint.
+    """
+    by_start = {cp.start: cp for cp in checkpoints or []}
+    workers = workers or os.cpu_count() or 1
+    
+    n_entries = 0
+    prev_hash = GENESIS_HASH
+    
+    def check(start: int, n: int, result: tuple) -> ChainVerification | None:
+        nonlocal prev_hash
+        first_prev, last_hash, root, bad, reason = result
+        if bad is None and first_prev != prev_hash:
+            bad, reason = 0, "broken chain link"
+        if bad is None:
+            cp = by_start.get(start)
+            if cp is not None and (cp.end != start + n or cp.root != root):
+                bad, reason = 0, "checkpoint root mismatch"
+        if bad is not None:
+            return ChainVerification(False, start + n, start + bad, reason)
+        prev_hash = last_hash
+        return None
+    
+    if workers == 1:
+        for block in _blocks(entries, block_size):
+            failure = check(n_entries, len(block), verify_block(block))
+            if failure:
+                return failure
+            n_entries += len(block)
+        return _check_truncation(n_entries, by_start)
+    
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        in_flight = []
+        blocks = _blocks(entries, block_size)
+        start = 0
+        while True:
+            while len(in_flight) < 2 * workers:
+                block = next(blocks, None)
+                if block is None:
+                    break
+                in_flight.append((start, len(block), pool.submit(verify_block, block)))
+                start += len(block)
+            if not in_flight:
+                break
+            block_start, n, future = in_flight.pop(0)
+            failure = check(block_start, n, future.result())
+            if failure:
+                for *_, pending in in_flight:
+                    pending.cancel()
+                return failure
+            n_entries += n
+    
+    return _check_truncation(n_entries, by_start)
+
+
+def _check_truncation(
+    n_entries: int,
+    by_start: dict[int, MerkleCheckpoint],
+) -> ChainVerification:
+    """Checkpoints past the end of the log mean entries were removed."""
+    if any(cp.end > n_entries for cp in by_start.values()):
+        return ChainVerification(False, n_entries, n_entries, "log truncated")
+    return ChainVerification(True, n_entries)
@@ -0,0 +1,106 @@
+"""
+Linear algebra module for ACQC demo.
+
+Small dense matrix routines on lists of lists, enough for models with
+tens of inputs (covariances, PCA, regression normal equations) without a
+numerical dependency.
+"""
+
+import math
+
+
+Matrix = list[list[float]]
+Vector = list[float]
+
+
+def identity(n: int) -> Matrix:
+    return [[1.0 if i == j else 0.0 for j in range(n)] for i in range(n)]
+
+
+def transpose(a: Matrix) -> Matrix:
+    return [list(row) for row in zip(*a)]
+
+
+def mat_vec(a: Matrix, x: Vector) -> Vector:
+    return [math.fsum(aij * xj for aij, xj in zip(row, x)) for row in a]
+
+
+def mat_mul(a: Matrix, b: Matrix) -> Matrix:
+    bt = transpose(b)
+    return [[math.fsum(x * y for x, y in zip(row, col)) for col in bt] for row in a]
+
+
+def dot(x: Vector, y: Vector) -> float:
+    return math.fsum(a * b for a, b in zip(x, y))
+
+
+def jacobi_eigh(a: Matrix, tol: float = 1e-12, max_sweeps: int = 100) -> tuple[Vector, Matrix]:
+    """
+    Eigen-decomposition of a symmetric matrix by cyclic Jacobi rotations.
+    
+    Returns:
+        (eigenvalues in descending order, eigenvectors as the matching
+        columns of a k x k matrix)
+    """
+    n = len(a)
+    a = [list(map(float, row)) for row in a]
+    v = identity(n)
+    for _ in range(max_sweeps):
+        off = math.fsum(a[i][j] ** 2 for i in range(n) for j in range(i + 1, n))
+        scale = math.fsum(a[i][i] ** 2 for i in range(n)) or 1.0
+        if off <= tol * tol * scale:
+            break
+        for p in range(n - 1):
+            for q in range(p + 1, n):
+                apq = a[p][q]
+                if apq == 0.0:
+                    continue
+                theta = (a[q][q] - a[p][p]) / (2.0 * apq)
+                t = math.copysign(1.0, theta) / (abs(theta) + math.sqrt(theta * theta + 1.0))
+                c = 1.0 / math.sqrt(t * t + 1.0)
+                s = t * c
+                for k in range(n):
+                    akp, akq = a[k][p], a[k][q]
+                    a[k][p] = c * akp - s * akq
+                    a[k][q] = s * akp + c * akq
+                for k in range(n):
+                    apk, aqk = a[p][k], a[q][k]
+                    a[p][k] = c * apk - s * aqk
+                    a[q][k] = s * apk + c * aqk
+                for k in range(n):
+                    vkp, vkq = v[k][p], v[k][q]
+                    v[k][p] = c * vkp - s * vkq
+                    v[k][q] = s * vkp + c * vkq
+    
+    order = sorted(range(n), key=lambda i: -a[i][i])
+    values = [a[i][i] for i in order]
+    vectors = [[v[k][i] for i in order] for k in range(n)]
+    return values, vectors
+
+
+def cholesky(a: Matrix) -> Matrix:
+    """Lower-triangular L with L Lᵀ = a (a symmetric positive definite)."""
+    n = len(a)
+    low = [[0.0] * n for _ in range(n)]
+    for i in range(n):
+        for j in range(i + 1):
+            s = a[i][j] - math.fsum(low[i][k] * low[j][k] for k in range(j))
+            if i == j:
+                if s <= 0.0:
+                    raise ValueError("Matrix is not positive definite")
+                low[i][i] = math.sqrt(s)
+            else:
+                low[i][j] = s / low[j][j]
+    return low
+
+
+def cholesky_solve(low: Matrix, b: Vector) -> Vector:
+    """Solve (L Lᵀ) x = b given the Cholesky factor L."""
+    n = len(low)
+    y = [0.0] * n
+    for i in range(n):
+        y[i] = (b[i] - math.fsum(low[i][k] * y[k] for k in range(i))) / low[i][i]
+    x = [0.0] * n
+    for i in reversed(range(n)):
+        x[i] = (y[i] - math.fsum(low[k][i] * x[k] for k in range(i + 1, n))) / low[i][i]
+    return x
@@ -0,0 +1,92 @@
+"""
+Metrics module for ACQC demo.
+
+Latency histogram with HDR-style log-linear buckets: constant-time
+recording, bounded memory and a fixed relative error on percentiles
+(KPI-04: end-to-end p95).
+"""
+
+from dataclasses import dataclass, field
+
+
+SUB_BUCKET_BITS = 6  # 32 sub-buckets per power of two: < 3.2% relative error
+_HALF = 1 << (SUB_BUCKET_BITS - 1)
+_LINEAR_LIMIT = 1 << SUB_BUCKET_BITS
+
+
+def _bucket_index(value: int) -> int:
+    if value < _LINEAR_LIMIT:
+        return value
+    shift = value.bit_length() - SUB_BUCKET_BITS
+    return shift * _HALF + (value >> shift)
+
+
+def _bucket_upper(index: int) -> int:
+    """Largest value that maps to a bucket."""
+    if index < _LINEAR_LIMIT:
+        return index
+    shift = index // _HALF - 1
+    sub = index - shift * _HALF
+    return ((sub + 1) << shift) - 1
+
+
+@dataclass
+class LatencyHistogram:
+    """Histogram of latencies in integer nanoseconds."""
+    counts: dict[int, int] = field(default_factory=dict)
+    count: int = 0
+    total_ns: int = 0
+    min_ns: int | None = None
+    max_ns: int = 0
+    
+    def record(self, value_ns: int) -> None:
+        """Record one latency sample."""
+        # _bucket_index inlined: this is on the hot path of every span
+        if value_ns < _LINEAR_LIMIT:
+            value_ns = idx = int(value_ns) if value_ns > 0 else 0
+        else:
+            value_ns = int(value_ns)
+            shift = value_ns.bit_length() - SUB_BUCKET_BITS
+            idx = shift * _HALF + (value_ns >> shift)
+        counts = self.counts
+        counts[idx] = counts.get(idx, 0) + 1
+        self.count += 1
+        self.total_ns += value_ns
+        if value_ns > self.max_ns:
+            self.max_ns = value_ns
+        if self.min_ns is None or value_ns < self.min_ns:
+            self.min_ns = value_ns
+    
+    def merge(self, other: "LatencyHistogram") -> None:
+        """Add another histogram's samples into this one."""
+        for idx, n in other.counts.items():
+            self.counts[idx] = self.counts.get(idx, 0) + n
+        self.count += other.count
+        self.total_ns += other.total_ns
+        if other.min_ns is not None and (self.min_ns is None or other.min_ns < self.min_ns):
+            self.min_ns = other.min_ns
+        self.max_ns = max(self.max_ns, other.max_ns)
+    
+    def percentile(self, q: float) -> int:
+        """Value at percentile q (0-100), as the upper edge of its bucket."""
+        if not self.count:
+            return 0
+        rank = max(1, -(-self.count * q // 100))
+        seen = 0
+        for idx in sorted(self.counts):
+            seen += self.counts[idx]
+            if seen >= rank:
+                return min(_bucket_upper(idx), self.max_ns)
+        return self.max_ns
+    
+    def summary(self) -> dict[str, float]:
+        """Count and latency statistics in milliseconds."""
+        ms = 1e-6
+        return {
+            "count": self.count,
+            "mean_ms": round(self.total_ns / self.count * ms, 3) if self.count else 0.0,
+            "p50_ms": round(self.percentile(50) * ms, 3),
+            "p95_ms": round(self.percentile(95) * ms, 3),
+            "p99_ms": round(self.percentile(99) * ms, 3),
+            "max_ms": round(self.max_ns * ms, 3),
+        }
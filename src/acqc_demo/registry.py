@@ -0,0 +1,239 @@
+"""
+Model registry module for ACQC demo.
+
+Serves several soft sensor models (e.g. one per quality variable in
+ssot/quality_variables.csv) over the same tags:
+- Models keyed by model_hash (compute_model_hash)
+- One shared input matrix over the union of input tags, built once per batch
+- Plain linear models with the same ordered coefficient tags are stacked
+  into one coefficient matrix (StackedModels) and evaluated together in a
+  single pass over the shared columns; models with features, a drift
+  detector or a calibrator take their own SoftSensor batch path
+- Optional process pool to spread heavy model sets across cores
+"""
+
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Iterable
+
+from acqc_demo.dataset import ColumnarDataset
+from acqc_demo.infer import (
+    ModelConfig,
+    Prediction,
+    PredictionBatch,
+    SoftSensor,
+    build_columns,
+    combine_validity,
+    finalize_batch,
+    load_model_config,
+)
+
+
+@dataclass
+class StackedModels:
+    """Plain linear models over one ordered set of tags, as one coefficient matrix."""
+    tags: list[str]
+    model_hashes: list[str] = field(default_factory=list)
+    matrix: list[list[float]] = field(default_factory=list)  # one row per model, one column per tag
+    intercepts: list[float] = field(default_factory=list)
+    configs: list[ModelConfig] = field(default_factory=list)
+    
+    @property
+    def load(self) -> int:
+        return len(self.model_hashes) * max(len(self.tags), 1)
+    
+    def rows(self, lo: int, hi: int) -> "StackedModels":
+        """The models lo..hi as their own stack."""
+        return StackedModels(
+            self.tags,
+            self.model_hashes[lo:hi],
+            self.matrix[lo:hi],
+            self.intercepts[lo:hi],
+            self.configs[lo:hi],
+        )
+    
+    def response(self, columns: dict[str, Any], n: int) -> list[list[float]]:
+        """
+        intercepts + matrix @ X, one pass over the tag columns: each column is
+        applied to every model before the next is read. Each row accumulates
+        in coefficient order, so it equals infer.linear_response().
+        """
+        ys = [[b] * n for b in self.intercepts]
+        for j, tag_id in enumerate(self.tags):
+            x = columns[tag_id]
+            for m, row in enumerate(self.matrix):
+                c = row[j]
+                ys[m] = [acc + c * v for acc, v in zip(ys[m], x)]
+        return ys
+
+
+def stack_models(models: Iterable[tuple[str, ModelConfig]]) -> list[StackedModels]:
+    """Group (model_hash, config) pairs by their ordered coefficient tags."""
+    stacks: dict[tuple[str, ...], StackedModels] = {}
+    for model_hash, config in models:
+        tags = tuple(config.coefficients)
+        stack = stacks.get(tags)
+        if stack is None:
+            stack = stacks[tags] = StackedModels(list(tags))
+        stack.model_hashes.append(model_hash)
+        stack.matrix.append(list(config.coefficients.values()))
+        stack.intercepts.append(config.intercept)
+        stack.configs.append(config)
+    return list(stacks.values())
+
+
+def _evaluate_stacks(
+    columns: dict[str, Any],
+    column_ok: dict[str, bytearray],
+    n: int,
+    stacks: list[StackedModels],
+) -> list[tuple[str, tuple[array, array, array, array]]]:
+    """Evaluate stacked models on the shared input matrix (pool worker)."""
+    results = []
+    validity: dict[tuple[str, ...], bytearray] = {}
+    for stack in stacks:
+        responses = stack.response(columns, n)
+        for model_hash, config, y in zip(stack.model_hashes, stack.configs, responses):
+            key = tuple(config.input_tags)
+            valid = validity.get(key)
+            if valid is None:
+                valid = validity[key] = combine_validity(column_ok, config.input_tags, n)
+            results.append((model_hash, finalize_batch(y, valid, config.uncertainty_factor)))
+    return results
+
+
+class ModelRegistry:
+    """Set of soft sensor models evaluated together on shared inputs."""
+    
+    def __init__(self, configs: Iterable[ModelConfig] = ()):
+        self.models: dict[str, SoftSensor] = {}
+        for config in configs:
+            self.add(config)
+    
+    @classmethod
+    def load_dir(cls, model_dir: Path, pattern: str = "*.json") -> "ModelRegistry":
+        """Load every ModelConfig artifact in a directory."""
+        return cls(load_model_config(p) for p in sorted(Path(model_dir).glob(pattern)))
+    
+    def add(self, config: ModelConfig) -> str:
+        """Register a model; returns its model_hash (duplicates are ignored)."""
+        sensor = SoftSensor(config)
+        self.models.setdefault(sensor.model_hash, sensor)
+        return sensor.model_hash
+    
+    def remove(self, model_hash: str) -> None:
+        del self.models[model_hash]
+    
+    def __len__(self) -> int:
+        return len(self.models)
+    
+    def __contains__(self, model_hash: str) -> bool:
+        return model_hash in self.models
+    
+    @property
+    def input_tags(self) -> list[str]:
+        """Union of the models' source tags (inputs, coefficients, feature and detector sources)."""
+        tags: dict[str, None] = {}
+        for sensor in self.models.values():
+            tags.update(dict.fromkeys(sensor.source_tags))
+        return list(tags)
+    
+    def predict(
+        self,
+        tag_values: dict[str, float],
+        timestamp: str | int | None = None,
+    ) -> dict[str, Prediction]:
+        """Predict every model from one snapshot of tag values."""
+        return {h: s.predict(tag_values, timestamp) for h, s in self.models.items()}
+    
+    def predict_columns(
+        self,
+        dataset: ColumnarDataset,
+        workers: int = 1,
+    ) -> dict[str, tuple[array, array, array, array]]:
+        """
+        Evaluate all models over a dataset, building the input matrix once.
+        
+        Plain linear models are evaluated per StackedModels coefficient
+        matrix in one pass over the shared columns, accumulated in
+        coefficient order, so results are identical to their SoftSensor.
+        Models with features, a detector or a calibrator run
+        SoftSensor.predict_columns() on the dataset.
+        
+        Args:
+            workers: Processes to spread the models over (1: in-process)
+        
+        Returns:
+            model_hash -> (y_hat, lower, upper, status codes) arrays
+        """
+        n = dataset.n_samples
+        columns, column_ok = build_columns(dataset, self.input_tags)
+        # Models with features, a detector or a calibrator run their own batch path
+        standalone = {
+            h: s.predict_columns(dataset)
+            for h, s in self.models.items()
+            if s.features is not None or s.detector is not None or s.calibrator is not None
+        }
+        stacks = stack_models((h, s.config) for h, s in self.models.items() if h not in standalone)
+        n_models = sum(len(stack.model_hashes) for stack in stacks)
+        
+        if workers <= 1 or n_models <= 1:
+            results = dict(_evaluate_stacks(columns, column_ok, n, stacks))
+            results.update(standalone)
+            return {h: results[h] for h in self.models}
+        
+        # Split stacks into row blocks and balance them across workers by terms
+        n_groups = min(workers, n_models)
+        blocks = []
+        for stack in stacks:
+            size = -(-len(stack.model_hashes) // n_groups)
+            blocks.extend(stack.rows(lo, lo + size) for lo in range(0, len(stack.model_hashes), size))
+        groups: list[list[StackedModels]] = [[] for _ in range(n_groups)]
+        loads = [0] * n_groups
+        for block in sorted(blocks, key=lambda b: -b.load):
+            i = loads.index(min(loads))
+            groups[i].append(block)
+            loads[i] += block.load
+        
+        shared = {t: array("d", c) for t, c in columns.items()}  # compact to pickle
+        results: dict[str, tuple[array, array, array, array]] = {}
+        with ProcessPoolExecutor(max_workers=n_groups) as pool:
+            futures = [
+                pool.submit(_evaluate_stacks, shared, column_ok, n, group)
+                for group in groups if group
+            ]
+            for future in futures:
+                results.update(future.result())
+        results.update(standalone)
+        return {h: results[h] for h in self.models}
+    
+    def predict_batch(
+        self,
+        dataset: dict[str, Any] | ColumnarDataset,
+        workers: int = 1,
+    ) -> dict[str, PredictionBatch]:
+        """Run every model on a dataset; returns model_hash -> predictions."""
+        if not isinstance(dataset, ColumnarDataset):
+            dataset = ColumnarDataset.from_dict(dataset)
+        
+        timestamps = dataset.timestamps
+        if not isinstance(timestamps, array):
+            timestamps = array("q", timestamps)
+        out = {}
+        for model_hash, (y_hat, lower, upper, status) in self.predict_columns(
+            dataset, workers
+        ).items():
+            config = self.models[model_hash].config
+            out[model_hash] = PredictionBatch(
+                timestamps=timestamps,
+                y_hat=y_hat,
+                uncertainty_lower=lower,
+                uncertainty_upper=upper,
+                status=status,
+                variable_id=config.output_variable,
+                model_id=config.model_id,
+                model_hash=model_hash,
+            )
+        return out
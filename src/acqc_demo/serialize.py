@@ -0,0 +1,130 @@
+"""
+Serialization module for ACQC demo.
+
+Streaming JSON writers for large outputs (predictions, audit log):
+- Documents are written member by member and their big list chunk by
+  chunk, so memory stays flat whatever the number of rows
+- "json" reproduces json.dump(..., indent=2) byte for byte; "compact"
+  drops the whitespace; "ndjson" writes one record per line
+- Flat records with constant fields (prediction rows) are rendered from
+  a %-template over columns, without building a dict per row
+- Everything else goes through the C encoder of json.dumps (json.dump
+  and any indent fall back to the pure-Python one)
+
+orjson is not used: it writes NaN (the y_hat of DEGRADED rows) as null,
+which changes the values read back and the hashes of audit entries.
+"""
+
+import json
+from typing import IO, Any, Iterable, Sequence
+
+
+FORMATS = ("json", "compact", "ndjson", "binary")
+SUFFIXES = {"json": ".json", "compact": ".json", "ndjson": ".jsonl", "binary": ".acqc"}
+DEFAULT_CHUNK_ROWS = 4096
+
+_COMPACT = (",", ":")
+_PRETTY_ENCODER = json.JSONEncoder(indent=2)
+_COMPACT_ENCODER = json.JSONEncoder(separators=_COMPACT)
+_SPECIAL_FLOATS = {"nan": "NaN", "inf": "Infinity", "-inf": "-Infinity"}
+# Indent of a list item inside a top-level member, for the "json" layout
+_ITEM_INDENT = "\n    "
+
+
+def check_format(fmt: str, allowed: Sequence[str] = FORMATS) -> str:
+    if fmt not in allowed:
+        raise ValueError(f"Unsupported output format {fmt!r} (expected one of {', '.join(allowed)})")
+    return fmt
+
+
+def json_floats(values: Iterable[float]) -> list[str]:
+    """JSON text of floats, as json.dumps writes them (NaN, Infinity)."""
+    return [_SPECIAL_FLOATS.get(s, s) for s in map(float.__repr__, values)]
+
+
+def encode_items(items: Iterable[Any], fmt: str) -> list[str]:
+    """Encode list items for write_document/write_ndjson in the given format."""
+    if fmt == "json":
+        return [_PRETTY_ENCODER.encode(item).replace("\n", _ITEM_INDENT) for item in items]
+    return [_COMPACT_ENCODER.encode(item) for item in items]
+
+
+def record_template(fields: Sequence[tuple[str, str | None]], fmt: str) -> str:
+    """
+    %-template of a flat JSON object in the given format.
+    
+    Args:
+        fields: (key, constant) pairs in output order; the constant is the
+            already encoded JSON value, or None for a per-row %s slot
+    """
+    members = []
+    for key, constant in fields:
+        value = "%s" if constant is None else constant.replace("%", "%%")
+        members.append((json.dumps(key), value))
+    if fmt == "json":
+        inner = ",\n      ".join(f"{k}: {v}" for k, v in members)
+        return "{\n      " + inner + "\n    }"
+    return "{" + ",".join(f"{k}:{v}" for k, v in members) + "}"
+
+
+def render_records(template: str, columns: Sequence[Sequence[str]]) -> list[str]:
+    """Fill a record_template() with one row of encoded columns per record."""
+    return [template % row for row in zip(*columns)]
+
+
+def _member(key: str, value: Any, fmt: str) -> str:
+    if fmt == "json":
+        return f"  {json.dumps(key)}: " + json.dumps(value, indent=2).replace("\n", "\n  ")
+    return json.dumps(key) + ":" + _COMPACT_ENCODER.encode(value)
+
+
+def write_document(
+    f: IO[str],
+    list_key: str,
+    chunks: Iterable[list[str]],
+    fmt: str,
+    before: dict[str, Any] | None = None,
+    after: dict[str, Any] | None = None,
+) -> int:
+    """
+    Write a JSON object whose member `list_key` is streamed chunk by chunk.
+    
+    `chunks` yields lists of items encoded for `fmt` (encode_items or
+    render_records); `before`/`after` are the small members around it, in
+    order. Returns the number of items written.
+    """
+    check_format(fmt, ("json", "compact"))
+    pretty = fmt == "json"
+    members = [_member(k, v, fmt) for k, v in (before or {}).items()]
+    separator = ",\n" if pretty else ","
+    item_separator = "," + _ITEM_INDENT if pretty else ","
+    
+    f.write("{\n" if pretty else "{")
+    for member in members:
+        f.write(member + separator)
+    f.write(f"  {json.dumps(list_key)}: [" if pretty else json.dumps(list_key) + ":[")
+    n = 0
+    for chunk in chunks:
+        if not chunk:
+            continue
+        if n:
+            f.write(item_separator)
+        elif pretty:
+            f.write(_ITEM_INDENT)
+        f.write(item_separator.join(chunk))
+        n += len(chunk)
+    f.write("\n  ]" if pretty and n else "]")
+    for key, value in (after or {}).items():
+        f.write(separator + _member(key, value, fmt))
+    f.write("\n}" if pretty else "}")
+    return n
+
+
+def write_ndjson(f: IO[str], chunks: Iterable[list[str]]) -> int:
+    """Write compact-encoded items one per line; returns the number written."""
+    n = 0
+    for chunk in chunks:
+        if chunk:
+            f.write("\n".join(chunk) + "\n")
+            n += len(chunk)
+    return n
@@ -0,0 +1,310 @@
+"""
+Binary storage module for ACQC demo.
+
+Compact on-disk container for ColumnarDataset (`.acqc`):
+- One contiguous block per column (timestamps, values and QC flags per tag,
+  quality), aligned to 64 bytes
+- JSON footer with metadata, units, hash and the block directory
+- Optional zlib compression in fixed-size row chunks
+
+Uncompressed files are memory-mapped: columns are read-only memoryviews over
+the file, so opening is independent of file size and only the pages that are
+read (e.g. a time range) are loaded. Compressed files decompress only the
+chunks overlapping the requested range.
+
+Layout::
+
+    MAGIC | column blocks ... | footer JSON | footer length (uint64 LE) | MAGIC
+"""
+
+import json
+import mmap
+import struct
+import sys
+import zlib
+from array import array
+from bisect import bisect_left
+from pathlib import Path
+from typing import Any
+
+from acqc_demo.dataset import ColumnarDataset, iso_to_ns
+from acqc_demo.instrument import timed
+
+
+MAGIC = b"ACQCBIN1"
+FORMAT_VERSION = 1
+ALIGNMENT = 64
+DEFAULT_CHUNK_ROWS = 65536
+
+_TRAILER = struct.Struct("<Q8s")
+_NATIVE_LITTLE = sys.byteorder == "little"
+
+
+def _column_keys(dataset: ColumnarDataset) -> list[tuple[str, Any]]:
+    columns = [("timestamps", dataset.timestamps)]
+    for tag_id in dataset.tag_ids:
+        columns.append((f"values/{tag_id}", dataset.values[tag_id]))
+        columns.append((f"qc_flags/{tag_id}", dataset.qc_flags[tag_id]))
+    if dataset.quality is not None:
+        columns.append(("quality", dataset.quality))
+        if dataset.quality_timestamps is not dataset.timestamps:
+            columns.append(("quality_timestamps", dataset.quality_timestamps))
+    return columns
+
+
+def _to_little_endian(column: Any) -> bytes | memoryview:
+    view = memoryview(column)
+    if _NATIVE_LITTLE or view.itemsize == 1:
+        return view.cast("B")
+    swapped = array(view.format, view)
+    swapped.byteswap()
+    return swapped.tobytes()
+
+
+@timed("persist")
+def save_binary(
+    dataset: ColumnarDataset,
+    path: Path,
+    compress: bool = False,
+    chunk_rows: int = DEFAULT_CHUNK_ROWS,
+    level: int = 1,
+) -> Path:
+    """
+    Write a ColumnarDataset to the binary container.
+    
+    Args:
+        compress: zlib-compress every column in chunks of `chunk_rows` rows
+            (smaller files, but columns are decompressed instead of mapped)
+        chunk_rows: Rows per compressed chunk
+        level: zlib compression level
+    
+    Returns:
+        Path of the written file
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    directory: dict[str, dict[str, Any]] = {}
+    
+    with open(path, "wb") as f:
+        f.write(MAGIC)
+        for key, column in _column_keys(dataset):
+            view = memoryview(column)
+            data = _to_little_endian(column)
+            itemsize = view.itemsize
+            rows_per_chunk = chunk_rows if compress else max(1, len(view))
+            chunks = []
+            for start in range(0, max(1, len(view)), rows_per_chunk):
+                block = data[start * itemsize:(start + rows_per_chunk) * itemsize]
+                if compress:
+                    block = zlib.compress(block, level)
+                f.write(b"\0" * (-f.tell() % ALIGNMENT))
+                chunks.append([f.tell(), len(block)])
+                f.write(block)
+            directory[key] = {
+                "typecode": view.format,
+                "length": len(view),
+                "chunk_rows": rows_per_chunk,
+                "chunks": chunks,
+            }
+        
+        timestamps = dataset.timestamps
+        footer = {
+            "format_version": FORMAT_VERSION,
+            "compression": "zlib" if compress else None,
+            "n_samples": dataset.n_samples,
+            "metadata": dataset.metadata,
+            "tags": dataset.tag_ids,
+            "units": dataset.units,
+            "quality": None if dataset.quality is None else {
+                "variable": dataset.quality_variable,
+                "unit": dataset.quality_unit,
+                "source": dataset.quality_source,
+            },
+            # First timestamp of every chunk: locates a time range without reading data
+            "chunk_starts": [
+                timestamps[i]
+                for i in range(0, len(timestamps), directory["timestamps"]["chunk_rows"])
+            ],
+            "columns": directory,
+        }
+        encoded = json.dumps(footer, separators=(",", ":")).encode()
+        f.write(encoded)
+        f.write(_TRAILER.pack(len(encoded), MAGIC))
+    
+    return path
+
+
+class BinaryDataset:
+    """
+    Read-only view of an `.acqc` file.
+    
+    Example: predict on one day of a large replay without loading the rest::
+        
+        with BinaryDataset(path) as source:
+            data = source.select("2026-01-01T00:00:00Z", "2026-01-02T00:00:00Z")
+            predictions = sensor.predict_batch(data)
+    
+    Columns of uncompressed files are views over the mapping: close()
+    unmaps the file once they are no longer referenced.
+    """
+    
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        with open(self.path, "rb") as f:
+            # The mapping keeps its own handle; views over it outlive this object
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        size = len(self._mm)
+        if size < len(MAGIC) + _TRAILER.size or self._mm[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"Not an ACQC binary dataset: {self.path}")
+        footer_len, magic = _TRAILER.unpack_from(self._mm, size - _TRAILER.size)
+        if magic != MAGIC:
+            raise ValueError(f"Truncated ACQC binary dataset: {self.path}")
+        footer_start = size - _TRAILER.size - footer_len
+        self.footer: dict[str, Any] = json.loads(self._mm[footer_start:size - _TRAILER.size])
+        if self.footer.get("format_version") != FORMAT_VERSION:
+            raise ValueError(f"Unsupported format version: {self.footer.get('format_version')}")
+        self.compressed = self.footer["compression"] is not None
+        self._buffer = memoryview(self._mm)
+    
+    def close(self) -> None:
+        self._buffer.release()
+        try:
+            self._mm.close()
+        except BufferError:  # a column view is still in use; unmapped when released
+            pass
+    
+    def __enter__(self) -> "BinaryDataset":
+        return self
+    
+    def __exit__(self, *exc: Any) -> None:
+        self.close()
+    
+    @property
+    def n_samples(self) -> int:
+        return self.footer["n_samples"]
+    
+    @property
+    def metadata(self) -> dict[str, Any]:
+        return self.footer["metadata"]
+    
+    def _chunk(self, key: str, k: int) -> memoryview | array:
+        spec = self.footer["columns"][key]
+        offset, nbytes = spec["chunks"][k]
+        raw = self._buffer[offset:offset + nbytes]
+        if self.compressed:
+            raw = zlib.decompress(raw)
+        typecode = spec["typecode"]
+        if _NATIVE_LITTLE or typecode == "B":
+            return memoryview(raw).cast(typecode)
+        swapped = array(typecode, bytes(raw))
+        swapped.byteswap()
+        return swapped
+    
+    def column(self, key: str, start: int = 0, stop: int | None = None) -> memoryview | array:
+        """
+        Rows [start, stop) of a column ("timestamps", "values/<tag>",
+        "qc_flags/<tag>", "quality", "quality_timestamps").
+        
+        Uncompressed files return a zero-copy view; compressed files
+        decompress the overlapping chunks only.
+        """
+        spec = self.footer["columns"][key]
+        length = spec["length"]
+        stop = length if stop is None else min(stop, length)
+        start = min(start, stop)
+        rows = spec["chunk_rows"]
+        if len(spec["chunks"]) == 1:
+            return self._chunk(key, 0)[start:stop]
+        
+        out = array(spec["typecode"])
+        for k in range(start // rows, -(-stop // rows)):
+            chunk = self._chunk(key, k)
+            lo = max(start - k * rows, 0)
+            out.extend(chunk[lo:stop - k * rows])
+        return out
+    
+    def searchsorted(self, ts_ns: int, key: str = "timestamps") -> int:
+        """Index of the first sample at or after ts_ns (timestamps are sorted)."""
+        spec = self.footer["columns"][key]
+        if len(spec["chunks"]) == 1:
+            return bisect_left(self._chunk(key, 0), ts_ns)
+        if key == "timestamps":
+            # Only the chunk that can contain ts_ns is read
+            k = max(bisect_left(self.footer["chunk_starts"], ts_ns) - 1, 0)
+            return k * spec["chunk_rows"] + bisect_left(self._chunk(key, k), ts_ns)
+        return bisect_left(self.column(key), ts_ns)
+    
+    def select(
+        self,
+        start: str | int | None = None,
+        end: str | int | None = None,
+    ) -> ColumnarDataset:
+        """
+        Dataset over the time range [start, end) (ISO strings or epoch ns).
+        
+        Without bounds the whole file is returned; for uncompressed files
+        this reads nothing but the footer.
+        """
+        start_ns = iso_to_ns(start) if isinstance(start, str) else start
+        end_ns = iso_to_ns(end) if isinstance(end, str) else end
+        lo = 0 if start_ns is None else self.searchsorted(start_ns)
+        hi = self.n_samples if end_ns is None else self.searchsorted(end_ns)
+        
+        footer = self.footer
+        columns = footer["columns"]
+        timestamps = self.column("timestamps", lo, hi)
+        kwargs: dict[str, Any] = {}
+        quality = footer["quality"]
+        if quality is not None:
+            if "quality_timestamps" in columns:
+                q_lo = 0 if start_ns is None else self.searchsorted(start_ns, "quality_timestamps")
+                q_hi = (
+                    columns["quality"]["length"] if end_ns is None
+                    else self.searchsorted(end_ns, "quality_timestamps")
+                )
+                quality_timestamps = self.column("quality_timestamps", q_lo, q_hi)
+            else:
+                q_lo, q_hi = lo, hi
+                quality_timestamps = timestamps
+            kwargs = {
+                "quality": self.column("quality", q_lo, q_hi),
+                "quality_timestamps": quality_timestamps,
+                "quality_variable": quality["variable"],
+                "quality_unit": quality["unit"],
+                "quality_source": quality["source"],
+            }
+        
+        return ColumnarDataset(
+            timestamps=timestamps,
+            values={t: self.column(f"values/{t}", lo, hi) for t in footer["tags"]},
+            qc_flags={t: self.column(f"qc_flags/{t}", lo, hi) for t in footer["tags"]},
+            units=dict(footer["units"]),
+            metadata=dict(footer["metadata"]),
+            **kwargs,
+        )
+
+
+def load_binary(
+    path: Path,
+    start: str | int | None = None,
+    end: str | int | None = None,
+) -> ColumnarDataset:
+    """Open an `.acqc` file as a ColumnarDataset (optionally a time range)."""
+    return BinaryDataset(path).select(start, end)
+
+
+def json_to_binary(json_path: Path, output_path: Path | None = None, **options: Any) -> Path:
+    """Convert a dataset.json from generate_demo_dataset() to `.acqc`."""
+    json_path = Path(json_path)
+    with open(json_path) as f:
+        dataset = ColumnarDataset.from_dict(json.load(f))
+    return save_binary(dataset, output_path or json_path.with_suffix(".acqc"), **options)
+
+
+def binary_to_json(path: Path, output_path: Path | None = None) -> Path:
+    """Convert an `.acqc` file back to the dataset.json format."""
+    path = Path(path)
+    output_path = Path(output_path or path.with_suffix(".json"))
+    with open(output_path, "w") as f:
+        json.dump(load_binary(path).to_dict(), f, indent=2)
+    return output_path
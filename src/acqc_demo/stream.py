@@ -0,0 +1,359 @@
+"""
+Streaming inference module for ACQC demo.
+
+Online soft sensor service for continuous tag updates:
+- Latest value per input tag; a prediction runs when a sensor's snapshot is
+  complete (every input tag updated) or when a tick fires
+- Snapshots are micro-batched per sensor through the vectorized batch engine
+- A bounded queue between source and inference applies backpressure
+- Replay sources (dataset / JSONL file, TCP socket) stand in for OPC-UA
+- End-to-end latency histogram (KPI-04: p95 <= 5 s)
+- A hotswap.ModelWatcher can stand in for a sensor: its active model is
+  re-read between micro-batches, so swaps land without a restart
+"""
+
+import asyncio
+import json
+import math
+import time
+from array import array
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, AsyncIterator, Callable
+
+from acqc_demo import instrument
+from acqc_demo.dataset import (
+    ColumnarDataset,
+    QC_BAD,
+    QC_CODES,
+    QC_OK,
+    SCHEMA_QUALITY_CODES,
+    iso_to_ns,
+)
+from acqc_demo.hotswap import ModelWatcher
+from acqc_demo.infer import Prediction, SoftSensor
+from acqc_demo.metrics import LatencyHistogram
+from acqc_demo.storage import load_binary
+
+
+@dataclass
+class TagUpdate:
+    """A single tag value update from the plant."""
+    tag_id: str
+    value: float
+    timestamp_ns: int  # source timestamp, epoch ns
+    qc_flag: int = QC_OK
+    received_ns: int = 0  # monotonic ns at ingestion, set by the service
+
+
+@dataclass
+class StreamStats:
+    """Counters and latency of a streaming run."""
+    n_updates: int = 0
+    n_snapshots: int = 0
+    n_predictions: int = 0
+    n_batches: int = 0
+    max_queue_depth: int = 0
+    latency: LatencyHistogram = field(default_factory=LatencyHistogram)
+    
+    def summary(self) -> dict[str, Any]:
+        return {
+            "n_updates": self.n_updates,
+            "n_snapshots": self.n_snapshots,
+            "n_predictions": self.n_predictions,
+            "n_batches": self.n_batches,
+            "max_queue_depth": self.max_queue_depth,
+            "latency": self.latency.summary(),
+        }
+
+
+class _SensorState:
+    """Per-sensor snapshot assembly state."""
+    
+    def __init__(self, model: SoftSensor | ModelWatcher):
+        self.watcher = model if isinstance(model, ModelWatcher) else None
+        self.slot: tuple[SoftSensor, SoftSensor | None] = (
+            self.watcher.slot if self.watcher is not None else (model, None)
+        )
+        sensor = self.slot[0]
+        self.sensor = sensor
+        # Feature history carried across micro-batches
+        self.feature_state = sensor.features.state() if sensor.features else None
+        self.fresh: set[str] = set()
+        self.pending_since: int | None = None
+        self.rows: list[tuple[int, int, list[tuple[float, int]]]] = []
+        self._bind()
+    
+    def _bind(self) -> None:
+        active, candidate = self.slot
+        features = active.features
+        self.inputs = frozenset(active.config.input_tags).union(features.source_tags if features else ())
+        # A shadow candidate may read tags the active model does not
+        self.columns = list(dict.fromkeys(
+            [*active.source_tags, *(candidate.source_tags if candidate else ())]
+        ))
+        self.fresh &= self.inputs
+    
+    def refresh(self) -> bool:
+        """Pick up a swapped model between batches; returns True if inputs may have changed."""
+        if self.watcher is None or self.watcher.slot is self.slot:
+            return False
+        old = self.sensor
+        self.slot = self.watcher.slot
+        self.sensor = self.slot[0]
+        if self.sensor is not old:
+            self.feature_state = self.watcher.carry_state(old, self.sensor, self.feature_state)
+        self._bind()
+        return True
+
+
+class StreamingService:
+    """
+    Asyncio soft sensor service over a stream of TagUpdates.
+    
+    Args:
+        sensors: Soft sensors to serve (their input tags may overlap), or
+            ModelWatchers serving the newest model of a directory
+        max_queue: Bound of the update queue; the source waits when full
+        max_batch: Maximum updates drained per inference step
+        tick_interval: Seconds between ticks; on a tick every sensor with
+            updates since its last prediction predicts from the latest
+            values (held tags). None disables ticks.
+        sink: Called with (sensor, prediction) for every prediction
+    """
+    
+    def __init__(
+        self,
+        sensors: list[SoftSensor | ModelWatcher],
+        max_queue: int = 10_000,
+        max_batch: int = 512,
+        tick_interval: float | None = 1.0,
+        sink: Callable[[SoftSensor, Prediction], None] | None = None,
+    ):
+        self.max_queue = max_queue
+        self.max_batch = max_batch
+        self.tick_interval = tick_interval
+        self.sink = sink
+        self.stats = StreamStats()
+        self.latest: dict[str, tuple[float, int, int]] = {}  # tag -> (value, qc, ts_ns)
+        self._states = [_SensorState(s) for s in sensors]
+        self._by_tag: dict[str, list[_SensorState]] = {}
+        self._index()
+    
+    def _index(self) -> None:
+        self._by_tag.clear()
+        for state in self._states:
+            for tag_id in state.inputs:
+                self._by_tag.setdefault(tag_id, []).append(state)
+    
+    async def run(self, source: AsyncIterator[TagUpdate]) -> StreamStats:
+        """Consume the source until it is exhausted; returns run statistics."""
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.max_queue)
+        producer = asyncio.create_task(self._produce(source, queue))
+        try:
+            await self._consume(queue)
+        finally:
+            producer.cancel()
+            await asyncio.gather(producer, return_exceptions=True)
+        return self.stats
+    
+    async def _produce(self, source: AsyncIterator[TagUpdate], queue: asyncio.Queue) -> None:
+        try:
+            async for update in source:
+                update.received_ns = time.monotonic_ns()
+                await queue.put(update)  # waits while the queue is full
+        finally:
+            await queue.put(None)
+    
+    async def _consume(self, queue: asyncio.Queue) -> None:
+        loop = asyncio.get_running_loop()
+        tick = self.tick_interval
+        next_tick = loop.time() + tick if tick else None
+        done = False
+        
+        while not done:
+            batch = []
+            try:
+                timeout = None if next_tick is None else max(0.0, next_tick - loop.time())
+                batch.append(await asyncio.wait_for(queue.get(), timeout))
+            except asyncio.TimeoutError:
+                pass
+            self.stats.max_queue_depth = max(self.stats.max_queue_depth, queue.qsize() + len(batch))
+            while batch and len(batch) < self.max_batch and not queue.empty():
+                batch.append(queue.get_nowait())
+            
+            for update in batch:
+                if update is None:
+                    done = True
+                    break
+                self._apply(update)
+            
+            if done or (next_tick is not None and loop.time() >= next_tick):
+                self._tick()
+                if next_tick is not None:
+                    next_tick = loop.time() + tick
+            self._flush()
+            await asyncio.sleep(0)
+    
+    def _apply(self, update: TagUpdate) -> None:
+        self.stats.n_updates += 1
+        self.latest[update.tag_id] = (update.value, update.qc_flag, update.timestamp_ns)
+        for state in self._by_tag.get(update.tag_id, ()):
+            if state.pending_since is None:
+                state.pending_since = update.received_ns
+            state.fresh.add(update.tag_id)
+            if len(state.fresh) == len(state.inputs):
+                self._snapshot(state)
+    
+    def _tick(self) -> None:
+        for state in self._states:
+            if state.fresh:
+                self._snapshot(state)
+    
+    def _snapshot(self, state: _SensorState) -> None:
+        missing = (math.nan, QC_BAD, 0)
+        values = [self.latest.get(tag_id, missing) for tag_id in state.columns]
+        ts = max(v[2] for v in values)
+        state.rows.append((ts, state.pending_since or time.monotonic_ns(), values))
+        state.fresh.clear()
+        state.pending_since = None
+        self.stats.n_snapshots += 1
+    
+    def _flush(self) -> None:
+        """Run one micro-batch per sensor over its pending snapshots, then pick up swaps."""
+        for state in self._states:
+            if not state.rows:
+                continue
+            rows, state.rows = state.rows, []
+            batch = ColumnarDataset(
+                timestamps=array("q", (r[0] for r in rows)),
+                values={
+                    tag_id: array("d", (r[2][j][0] for r in rows))
+                    for j, tag_id in enumerate(state.columns)
+                },
+                qc_flags={
+                    tag_id: array("B", (r[2][j][1] for r in rows))
+                    for j, tag_id in enumerate(state.columns)
+                },
+                units={},
+            )
+            if state.watcher is not None:
+                predictions = state.watcher.predict_batch(batch, state.feature_state, state.slot)
+            else:
+                predictions = state.sensor.predict_batch(batch, state.feature_state)
+            now = time.monotonic_ns()
+            for (_, received_ns, _), pred in zip(rows, predictions):
+                self.stats.latency.record(now - received_ns)
+                instrument.record("end_to_end", now - received_ns)
+                if self.sink is not None:
+                    self.sink(state.sensor, pred)
+            self.stats.n_predictions += len(predictions)
+            self.stats.n_batches += 1
+        # Swaps land here, between batches: pending rows were all assembled for the old model
+        if any([state.refresh() for state in self._states]):
+            self._index()
+
+
+def record_to_update(record: dict[str, Any]) -> TagUpdate:
+    """
+    Parse a tag record (schemas/tag_timeseries.schema.json fields, or the
+    dataset "timestamp"/"qc_flag" fields) into a TagUpdate. An unknown
+    quality or QC flag is taken as BAD, so the value is not trusted.
+    """
+    if "quality" in record:
+        qc = SCHEMA_QUALITY_CODES.get(record["quality"], QC_BAD)
+    else:
+        qc = QC_CODES.get(record.get("qc_flag", "OK"), QC_BAD)
+    value = record.get("value")
+    return TagUpdate(
+        tag_id=record["tag_id"],
+        value=math.nan if value is None else float(value),
+        timestamp_ns=iso_to_ns(record.get("ts") or record["timestamp"]),
+        qc_flag=qc,
+    )
+
+
+async def _pace(prev_ns: int | None, ts_ns: int, speed: float | None) -> None:
+    if speed and prev_ns is not None and ts_ns > prev_ns:
+        await asyncio.sleep((ts_ns - prev_ns) / 1e9 / speed)
+    else:
+        await asyncio.sleep(0)
+
+
+async def replay_dataset(
+    dataset: ColumnarDataset,
+    speed: float | None = None,
+) -> AsyncIterator[TagUpdate]:
+    """
+    Replay a dataset as tag updates in time order.
+    
+    Args:
+        speed: Replay speed relative to real time (None: as fast as possible)
+    """
+    columns = [(tag_id, *dataset.column(tag_id)) for tag_id in dataset.tag_ids]
+    prev = None
+    for i, ts in enumerate(dataset.timestamps):
+        await _pace(prev, ts, speed)
+        prev = ts
+        for tag_id, values, qc_flags in columns:
+            yield TagUpdate(tag_id, values[i], ts, qc_flags[i])
+
+
+async def replay_file(path: Path, speed: float | None = None) -> AsyncIterator[TagUpdate]:
+    """
+    Replay a local file: a dataset.json or dataset.acqc from data_gen, or
+    JSONL tag records (one schemas/tag_timeseries.schema.json object per line).
+    """
+    path = Path(path)
+    if path.suffix in (".json", ".acqc"):
+        if path.suffix == ".acqc":
+            dataset = load_binary(path)  # memory-mapped, pages read as replayed
+        else:
+            with open(path) as f:
+                dataset = ColumnarDataset.from_dict(json.load(f))
+        async for update in replay_dataset(dataset, speed):
+            yield update
+        return
+    
+    prev = None
+    with open(path) as f:
+        for line in f:
+            if not line.strip():
+                continue
+            update = record_to_update(json.loads(line))
+            if prev is None or update.timestamp_ns != prev:
+                await _pace(prev, update.timestamp_ns, speed)
+                prev = update.timestamp_ns
+            yield update
+
+
+async def socket_source(
+    host: str = "127.0.0.1",
+    port: int = 0,
+    on_listening: Callable[[int], None] | None = None,
+    max_pending: int = 10_000,
+) -> AsyncIterator[TagUpdate]:
+    """
+    Accept JSONL tag records over TCP and yield them as TagUpdates.
+    
+    Runs until cancelled. `on_listening` receives the bound port.
+    """
+    pending: asyncio.Queue = asyncio.Queue(maxsize=max_pending)
+    
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            while line := await reader.readline():
+                if line.strip():
+                    await pending.put(record_to_update(json.loads(line)))
+        finally:
+            writer.close()
+    
+    server = await asyncio.start_server(handle, host, port)
+    if on_listening is not None:
+        on_listening(server.sockets[0].getsockname()[1])
+    try:
+        async with server:
+            while True:
+                yield await pending.get()
+    finally:
+        server.close()
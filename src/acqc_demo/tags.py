@@ -0,0 +1,86 @@
+"""
+Tag dictionary module for ACQC demo.
+
+Loads ssot/tag_dictionary_template.csv: per-tag unit, expected range and
+sampling frequency, used for alignment tolerances and range checks, and
+the input resolution used to quantize prediction cache keys.
+"""
+
+import csv
+from dataclasses import dataclass
+from pathlib import Path
+
+from acqc_demo.dataset import data_dir
+
+
+SSOT_DIR_ENV = "ACQC_SSOT_DIR"  # overrides the checkout's ssot/ directory
+
+_NS_PER_S = 1_000_000_000
+# Without a Resolution column, a tag resolves its expected span in 2**16 steps
+DEFAULT_ADC_BITS = 16
+
+
+@dataclass
+class TagInfo:
+    """One row of the tag dictionary."""
+    tag_id: str
+    signal_name: str
+    unit: str
+    expected_min: float | None
+    expected_max: float | None
+    sampling_hz: float | None
+    source_system: str
+    criticality: str
+    resolution: float | None = None  # smallest meaningful change, in `unit`
+    
+    @property
+    def effective_resolution(self) -> float | None:
+        """Resolution, or the expected span over a 16-bit converter when not given."""
+        if self.resolution:
+            return self.resolution
+        if self.expected_min is None or self.expected_max is None:
+            return None
+        span = self.expected_max - self.expected_min
+        return span / 2**DEFAULT_ADC_BITS if span > 0 else None
+    
+    @property
+    def sampling_interval_ns(self) -> int | None:
+        """Nominal time between samples, in ns."""
+        if not self.sampling_hz:
+            return None
+        return round(_NS_PER_S / self.sampling_hz)
+
+
+def ssot_path(name: str) -> Path:
+    """A file of the ssot/ directory (see dataset.data_dir)."""
+    return data_dir("ssot", SSOT_DIR_ENV) / name
+
+
+def _optional_float(text: str) -> float | None:
+    text = (text or "").strip()
+    return float(text) if text else None
+
+
+def load_tag_dictionary(path: Path | None = None) -> dict[str, TagInfo]:
+    """
+    Load the tag dictionary CSV (default: ssot/tag_dictionary_template.csv);
+    returns tag_id -> TagInfo.
+    """
+    tags = {}
+    with open(path or ssot_path("tag_dictionary_template.csv"), newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            tag_id = row["Tag_ID"].strip()
+            if not tag_id:
+                continue
+            tags[tag_id] = TagInfo(
+                tag_id=tag_id,
+                signal_name=row.get("Signal_Name", ""),
+                unit=row.get("Unit", ""),
+                expected_min=_optional_float(row.get("Expected_Min", "")),
+                expected_max=_optional_float(row.get("Expected_Max", "")),
+                sampling_hz=_optional_float(row.get("Sampling_Frequency_Hz", "")),
+                source_system=row.get("Source_System", ""),
+                criticality=row.get("Criticality", ""),
+                resolution=_optional_float(row.get("Resolution", "")),
+            )
+    return tags
@@ -4,19 +4,39 @@ Traceability module for ACQC demo.
 Provides minimal audit logging for predictions and decisions.
 """
 
+import gzip
 import json
 import hashlib
-from dataclasses import dataclass, asdict
+import os
+import queue
+import re
+import threading
+import time
+from collections import Counter, OrderedDict, deque
+from dataclasses import dataclass, asdict, fields
 from datetime import datetime, timezone
 from pathlib import Path
-from typing import Any
+from typing import Any, Iterator
+
+from acqc_demo import serialize
+from acqc_demo.dataset import ns_to_iso
+from acqc_demo.instrument import timed
+from acqc_demo.integrity import (
+    GENESIS_HASH,
+    ChainVerification,
+    MerkleCheckpoint,
+    compute_entry_hash,
+    merkle_proof,
+    merkle_root,
+    verify_chain,
+)
 
 
 def _utc_now_iso() -> str:
-    return datetime.now(timezone.utc).isoformat().replace("+00:00", "Z")
+    return ns_to_iso(time.time_ns())
 
 
-@dataclass
+@dataclass(slots=True)
 class TraceEntry:
     """Single audit log entry."""
     entry_id: str
@@ -26,21 +46,397 @@ class TraceEntry:
     data_hash: str
     model_hash: str | None
     operator_id: str | None
+    prev_hash: str | None = None  # entry_hash of the previous entry (chain)
+    entry_hash: str | None = None  # SHA-256 over this entry incl. prev_hash
+
+
+_ENTRY_FIELDS = tuple(f.name for f in fields(TraceEntry))
+_EVENT_TYPES = ("PREDICTION", "RECOMMENDATION", "DECISION", "ERROR")
+_STOP = object()
+_FLUSH = object()
+# Uncompressed size of each gzip member of a rotated segment
+GZIP_MEMBER_BYTES = 1024 * 1024
+# event_type as serialized by JsonlAuditWriter (json.dumps default separators)
+_EVENT_TYPE_FIELD = re.compile(rb'"event_type": "([^"]*)"')
+
+
+class JsonlAuditWriter:
+    """
+    Append-only JSONL audit writer with group commit and rotation.
+    
+    Entries are queued and serialized on a background thread, one JSON
+    object per line, through a buffered file. The file is fsync'ed every
+    `fsync_every` entries or `fsync_interval_ms` milliseconds, whichever
+    comes first. The active file is rotated when it reaches `rotate_bytes`
+    or `rotate_seconds`; rotated segments are gzip-compressed if `compress`.
+    
+    `write()` only blocks when `queue_size` entries are waiting (backpressure).
+    """
+    
+    def __init__(
+        self,
+        log_dir: Path,
+        basename: str = "audit_log",
+        fsync_every: int = 256,
+        fsync_interval_ms: float = 1000.0,
+        rotate_bytes: int | None = 64 * 1024 * 1024,
+        rotate_seconds: float | None = None,
+        compress: bool = True,
+        queue_size: int = 65536,
+    ):
+        self.log_dir = Path(log_dir)
+        self.log_dir.mkdir(parents=True, exist_ok=True)
+        self.path = self.log_dir / f"{basename}.jsonl"
+        self.checkpoints_path = self.log_dir / f"{basename}.checkpoints.jsonl"
+        self.basename = basename
+        self.fsync_every = max(1, fsync_every)
+        self.fsync_interval = fsync_interval_ms / 1000.0
+        self.rotate_bytes = rotate_bytes
+        self.rotate_seconds = rotate_seconds
+        self.compress = compress
+        self.segments: list[Path] = []
+        
+        self._queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        self._error: BaseException | None = None
+        self._closed = False
+        self._file = open(self.path, "ab")
+        self._checkpoint_file = open(self.checkpoints_path, "ab")
+        self._size = self._file.tell()
+        self._opened_at = time.monotonic()
+        self._segment_seq = len(audit_log_files(self.log_dir, basename)) - 1
+        self._thread = threading.Thread(
+            target=self._run, name="audit-writer", daemon=True
+        )
+        self._thread.start()
+    
+    def write(self, entry: "TraceEntry") -> None:
+        """Queue an entry for writing; raises RuntimeError after close()."""
+        self._check_open()
+        self._queue.put(entry)
+    
+    def write_checkpoint(self, checkpoint: MerkleCheckpoint) -> None:
+        """Queue a Merkle checkpoint for the sidecar checkpoint file."""
+        self._check_open()
+        self._queue.put(checkpoint)
+    
+    def flush(self) -> None:
+        """Block until every queued entry is written and fsync'ed."""
+        self._raise_error()
+        if self._closed:
+            return  # close() already flushed
+        self._queue.put(_FLUSH)
+        self._queue.join()
+        self._raise_error()
+    
+    def close(self) -> None:
+        """Flush, stop the writer thread and close the active file."""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put(_STOP)
+        self._thread.join()
+        self._raise_error()
+    
+    def _check_open(self) -> None:
+        self._raise_error()
+        if self._closed:
+            raise RuntimeError(f"Audit writer is closed: {self.path}")
+    
+    def _raise_error(self) -> None:
+        if self._error is not None:
+            raise RuntimeError("Audit writer failed") from self._error
+    
+    def _run(self) -> None:
+        pending = 0
+        last_sync = time.monotonic()
+        stop = False
+        
+        while not stop:
+            now = time.monotonic()
+            deadlines = []
+            if pending:
+                deadlines.append(last_sync + self.fsync_interval)
+            if self.rotate_seconds is not None and self._size:
+                # Wake up an idle writer for time-based rotation
+                deadlines.append(self._opened_at + self.rotate_seconds)
+            timeout = max(0.0, min(deadlines) - now) if deadlines else None
+            try:
+                item = self._queue.get(timeout=timeout)
+            except queue.Empty:
+                item = None
+            
+            try:
+                if item is _STOP:
+                    stop = True
+                elif isinstance(item, MerkleCheckpoint):
+                    # Entries of the block go to disk before their checkpoint
+                    self._sync()
+                    self._checkpoint_file.write(json.dumps(asdict(item)).encode() + b"\n")
+                    self._checkpoint_file.flush()
+                    os.fsync(self._checkpoint_file.fileno())
+                    pending = 0
+                elif item is not None and item is not _FLUSH:
+                    line = json.dumps(asdict(item), default=str).encode() + b"\n"
+                    self._file.write(line)
+                    self._size += len(line)
+                    pending += 1
+                
+                # Group commit: fsync when the batch is full, the interval has
+                # elapsed, or on flush()/close()
+                now = time.monotonic()
+                if pending and (
+                    stop
+                    or item is _FLUSH
+                    or pending >= self.fsync_every
+                    or now - last_sync >= self.fsync_interval
+                ):
+                    self._sync()
+                    pending = 0
+                    last_sync = now
+                
+                if not stop and self._should_rotate(now):
+                    self._rotate()
+            except BaseException as exc:  # surfaced on the caller thread
+                self._error = exc
+            finally:
+                if item is not None:
+                    self._queue.task_done()
+        
+        self._file.close()
+        self._checkpoint_file.close()
+    
+    def _sync(self) -> None:
+        self._file.flush()
+        os.fsync(self._file.fileno())
+    
+    def _should_rotate(self, now: float) -> bool:
+        if not self._size:
+            return False
+        if self.rotate_bytes is not None and self._size >= self.rotate_bytes:
+            return True
+        return self.rotate_seconds is not None and now - self._opened_at >= self.rotate_seconds
+    
+    def _rotate(self) -> None:
+        self._sync()
+        self._file.close()
+        
+        self._segment_seq += 1
+        stamp = datetime.now(timezone.utc).strftime("%Y%m%d%H%M%S")
+        segment = self.log_dir / f"{self.basename}-{stamp}-{self._segment_seq:04d}.jsonl"
+        os.replace(self.path, segment)
+        if self.compress:
+            # Independent gzip members cut at line ends: an indexed reader
+            # (audit_query) decompresses one member per entry, not the segment
+            with open(segment, "rb") as src, open(f"{segment}.gz", "wb") as dst:
+                while block := src.read(GZIP_MEMBER_BYTES):
+                    dst.write(gzip.compress(block + src.readline(), mtime=0))
+            segment.unlink()
+            segment = Path(f"{segment}.gz")
+        self.segments.append(segment)
+        
+        self._file = open(self.path, "ab")
+        self._size = 0
+        self._opened_at = time.monotonic()
+
+
+def audit_log_files(log_dir: Path, basename: str = "audit_log") -> list[Path]:
+    """Files of a streaming audit log in write order (rotated segments, then active)."""
+    log_dir = Path(log_dir)
+    files = sorted(
+        p for p in log_dir.glob(f"{basename}-*.jsonl*") if p.name.endswith((".jsonl", ".jsonl.gz"))
+    )
+    active = log_dir / f"{basename}.jsonl"
+    if active.exists():
+        files.append(active)
+    return files
+
+
+def _iter_lines(path: Path) -> Iterator[bytes]:
+    opener = gzip.open if str(path).endswith(".gz") else open
+    with opener(path, "rb") as f:
+        for line in f:
+            if line.strip():
+                yield line
+
+
+def load_checkpoints(path: Path) -> list[MerkleCheckpoint]:
+    """Read a checkpoint sidecar file written by JsonlAuditWriter."""
+    path = Path(path)
+    if not path.exists():
+        return []
+    return [MerkleCheckpoint(**json.loads(line)) for line in _iter_lines(path)]
+
+
+def verify_audit_log(
+    path: Path,
+    basename: str = "audit_log",
+    workers: int | None = 1,
+) -> ChainVerification:
+    """
+    Verify the hash chain and Merkle checkpoints of a persisted audit log.
+    
+    Args:
+        path: An audit_log.json written by save(), or a streaming log
+            directory (all segments and the checkpoint sidecar are read)
+        basename: Streaming log base name
+        workers: Verification processes (None: all cores)
+    """
+    path = Path(path)
+    if path.is_dir():
+        checkpoints = load_checkpoints(path / f"{basename}.checkpoints.jsonl")
+        entries: Any = (
+            line for f in audit_log_files(path, basename) for line in _iter_lines(f)
+        )
+    else:
+        with open(path) as f:
+            doc = json.load(f)
+        checkpoints = [MerkleCheckpoint(**c) for c in doc.get("checkpoints", [])]
+        entries = doc["entries"]
+    
+    block_size = checkpoints[0].end - checkpoints[0].start if checkpoints else 1024
+    return verify_chain(entries, checkpoints, block_size=block_size, workers=workers)
+
+
+def iter_audit_entries(path: Path) -> Iterator[dict[str, Any]]:
+    """Iterate entries of a JSONL audit file (plain or rotated .gz segment)."""
+    opener = gzip.open if str(path).endswith(".gz") else open
+    with opener(path, "rt", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
 
 
 class AuditLog:
-    """Simple audit log for demo traceability."""
+    """
+    Simple audit log for demo traceability.
+    
+    By default entries are kept in memory and written by save(). With a
+    `writer` (streaming mode) each entry is appended to the JSONL log as it
+    is logged and nothing is retained in `entries`.
     
-    def __init__(self, log_dir: Path | None = None):
+    Entries are hash-chained (each commits to the previous entry_hash) and
+    every `checkpoint_every` entries a MerkleCheckpoint is recorded over
+    the block, see acqc_demo.integrity.
+    """
+    
+    def __init__(
+        self,
+        log_dir: Path | None = None,
+        digest_cache_size: int = 1024,
+        writer: JsonlAuditWriter | None = None,
+        checkpoint_every: int = 1024,
+    ):
         self.log_dir = log_dir or Path("./output/audit")
         self.log_dir.mkdir(parents=True, exist_ok=True)
         self.entries: list[TraceEntry] = []
+        self.writer = writer
         self._counter = 0
+        self._counts = dict.fromkeys(_EVENT_TYPES, 0)
+        self._digest_cache: OrderedDict[int, tuple[Any, str]] = OrderedDict()
+        self._digest_cache_size = digest_cache_size
+        self.checkpoint_every = checkpoint_every
+        self.checkpoints: list[MerkleCheckpoint] = []
+        self._n_chained = 0
+        self._last_hash = GENESIS_HASH
+        self._block_leaves: list[str] = []
+    
+    @classmethod
+    def streaming(
+        cls,
+        log_dir: Path | None = None,
+        checkpoint_every: int = 1024,
+        **writer_options: Any,
+    ) -> "AuditLog":
+        """
+        Create an audit log in streaming mode (see JsonlAuditWriter options).
+        
+        If the log directory already holds a streaming log, the chain is
+        resumed from its last entry (one pass over the existing files).
+        """
+        log_dir = log_dir or Path("./output/audit")
+        writer = JsonlAuditWriter(log_dir, **writer_options)
+        log = cls(log_dir=log_dir, writer=writer, checkpoint_every=checkpoint_every)
+        log._resume_chain(audit_log_files(log_dir, writer.basename))
+        return log
+    
+    def _resume_chain(self, files: list[Path]) -> None:
+        """Restore the hash chain, entry counter and event counts of an existing log."""
+        n = 0
+        counts: Counter = Counter()
+        tail: deque[bytes] = deque(maxlen=self.checkpoint_every)
+        for path in files:
+            for line in _iter_lines(path):
+                n += 1
+                tail.append(line)
+                match = _EVENT_TYPE_FIELD.search(line)
+                if match is not None:
+                    counts[match[1].decode()] += 1
+        if not n:
+            return
+        
+        last = json.loads(tail[-1])
+        self._n_chained = n
+        self._last_hash = last["entry_hash"]
+        n_block = n % self.checkpoint_every
+        self._block_leaves = [
+            json.loads(line)["entry_hash"] for line in list(tail)[len(tail) - n_block:]
+        ] if n_block else []
+        
+        # IDs number entries across restarts: no earlier counter exceeds n
+        suffix = last.get("entry_id", "").rpartition("-")[2]
+        self._counter = max(n, int(suffix) if suffix.isdigit() else 0)
+        for event_type, count in counts.items():
+            self._counts[event_type] = self._counts.get(event_type, 0) + count
+    
+    def _chain(self, entry: TraceEntry) -> None:
+        """Link entry to the chain and emit a checkpoint when a block is full."""
+        entry.prev_hash = self._last_hash
+        entry.entry_hash = compute_entry_hash(
+            {name: getattr(entry, name) for name in _ENTRY_FIELDS}
+        )
+        self._last_hash = entry.entry_hash
+        self._n_chained += 1
+        self._block_leaves.append(entry.entry_hash)
+        
+        if len(self._block_leaves) >= self.checkpoint_every:
+            checkpoint = MerkleCheckpoint(
+                start=self._n_chained - len(self._block_leaves),
+                end=self._n_chained,
+                root=merkle_root(self._block_leaves),
+                head_hash=entry.entry_hash,
+            )
+            self._block_leaves = []
+            self.checkpoints.append(checkpoint)
+            if self.writer is not None:
+                self.writer.write_checkpoint(checkpoint)
+    
+    def prove(self, index: int) -> tuple[list[tuple[str, str]], MerkleCheckpoint]:
+        """
+        Inclusion proof for in-memory entry `index` against its checkpoint.
+        
+        Only entries in completed blocks can be proven; verify with
+        acqc_demo.integrity.verify_entry().
+        """
+        block = index // self.checkpoint_every
+        if self.writer is not None or block >= len(self.checkpoints):
+            raise ValueError(f"Entry {index} is not covered by an in-memory checkpoint")
+        checkpoint = self.checkpoints[block]
+        leaves = [e.entry_hash for e in self.entries[checkpoint.start:checkpoint.end]]
+        return merkle_proof(leaves, index - checkpoint.start), checkpoint
     
-    def _generate_id(self) -> str:
-        """Generate unique entry ID."""
+    @timed("audit")
+    def _append(self, entry: TraceEntry) -> None:
+        self._counts[entry.event_type] = self._counts.get(entry.event_type, 0) + 1
+        self._chain(entry)
+        if self.writer is not None:
+            self.writer.write(entry)
+        else:
+            self.entries.append(entry)
+    
+    def _generate_id(self, timestamp: str) -> str:
+        """Generate unique entry ID from the entry's ISO timestamp."""
         self._counter += 1
-        ts = datetime.now(timezone.utc).strftime("%Y%m%d%H%M%S")
+        ts = timestamp[:19].replace("-", "").replace(":", "").replace("T", "")
         return f"TRACE-{ts}-{self._counter:04d}"
     
     def _compute_hash(self, data: Any) -> str:
@@ -49,16 +445,48 @@ class AuditLog:
             json.dumps(data, sort_keys=True, default=str).encode()
         ).hexdigest()[:16]
     
+    def input_digest(self, input_data: Any) -> str:
+        """
+        Content digest of an input window, computed once per object.
+        
+        Digests are cached by object identity (the cache holds a reference,
+        so ids are not reused while cached). Input objects must not be
+        mutated after they have been logged.
+        """
+        key = id(input_data)
+        cached = self._digest_cache.get(key)
+        if cached is not None and cached[0] is input_data:
+            self._digest_cache.move_to_end(key)
+            return cached[1]
+        
+        digest = self._compute_hash(input_data)
+        self._digest_cache[key] = (input_data, digest)
+        if len(self._digest_cache) > self._digest_cache_size:
+            self._digest_cache.popitem(last=False)
+        return digest
+    
+    def verify_input(self, entry: TraceEntry, input_data: Any) -> bool:
+        """Check that input data matches the digest recorded in an entry."""
+        return self._compute_hash(input_data) == entry.data_hash
+    
     def log_prediction(
         self,
         prediction: dict[str, Any],
         input_data: dict[str, Any],
         model_hash: str,
+        input_digest: str | None = None,
     ) -> TraceEntry:
-        """Log a prediction event."""
+        """
+        Log a prediction event.
+        
+        `input_data` should be the window or row the prediction was made
+        from; its digest is cached (see input_digest()) or can be passed
+        precomputed as `input_digest`.
+        """
+        timestamp = _utc_now_iso()
         entry = TraceEntry(
-            entry_id=self._generate_id(),
-            timestamp=_utc_now_iso(),
+            entry_id=self._generate_id(timestamp),
+            timestamp=timestamp,
             event_type="PREDICTION",
             payload={
                 "prediction": prediction,
@@ -67,11 +495,11 @@ class AuditLog:
                     "timestamp": prediction.get("timestamp"),
                 },
             },
-            data_hash=self._compute_hash(input_data),
+            data_hash=input_digest or self.input_digest(input_data),
             model_hash=model_hash,
             operator_id=None,
         )
-        self.entries.append(entry)
+        self._append(entry)
         return entry
     
     def log_recommendation(
@@ -82,9 +510,10 @@ class AuditLog:
         model_hash: str,
     ) -> TraceEntry:
         """Log a recommendation event."""
+        timestamp = _utc_now_iso()
         entry = TraceEntry(
-            entry_id=self._generate_id(),
-            timestamp=_utc_now_iso(),
+            entry_id=self._generate_id(timestamp),
+            timestamp=timestamp,
             event_type="RECOMMENDATION",
             payload={
                 "recommendation": recommendation,
@@ -96,7 +525,7 @@ class AuditLog:
             model_hash=model_hash,
             operator_id=None,
         )
-        self.entries.append(entry)
+        self._append(entry)
         return entry
     
     def log_decision(
@@ -107,9 +536,10 @@ class AuditLog:
         notes: str | None = None,
     ) -> TraceEntry:
         """Log an operator decision."""
+        timestamp = _utc_now_iso()
         entry = TraceEntry(
-            entry_id=self._generate_id(),
-            timestamp=_utc_now_iso(),
+            entry_id=self._generate_id(timestamp),
+            timestamp=timestamp,
             event_type="DECISION",
             payload={
                 "accepted": accepted,
@@ -120,7 +550,7 @@ class AuditLog:
             model_hash=None,
             operator_id=operator_id,
         )
-        self.entries.append(entry)
+        self._append(entry)
         return entry
     
     def log_error(
@@ -130,9 +560,10 @@ class AuditLog:
         context: dict[str, Any] | None = None,
     ) -> TraceEntry:
         """Log an error event."""
+        timestamp = _utc_now_iso()
         entry = TraceEntry(
-            entry_id=self._generate_id(),
-            timestamp=_utc_now_iso(),
+            entry_id=self._generate_id(timestamp),
+            timestamp=timestamp,
             event_type="ERROR",
             payload={
                 "error_type": error_type,
@@ -143,33 +574,64 @@ class AuditLog:
             model_hash=None,
             operator_id=None,
         )
-        self.entries.append(entry)
+        self._append(entry)
         return entry
     
-    def save(self, filename: str = "audit_log.json") -> Path:
-        """Save audit log to file."""
-        output_path = self.log_dir / filename
+    @timed("persist")
+    def save(self, filename: str | None = None, fmt: str = "json") -> Path:
+        """
+        Save audit log to file, entries chunk by chunk.
+        
+        `fmt` is "json" (audit_log.json), "compact" (same document without
+        whitespace) or "ndjson" (audit_log.jsonl with one entry per line
+        and a checkpoint sidecar, the layout of a streaming log, so
+        verify_audit_log takes the directory).
+        
+        In streaming mode this flushes the writer and returns the active
+        JSONL file instead; `filename` and `fmt` are ignored.
+        """
+        if self.writer is not None:
+            self.writer.flush()
+            return self.writer.path
+        
+        serialize.check_format(fmt, ("json", "compact", "ndjson"))
+        output_path = self.log_dir / (filename or f"audit_log{serialize.SUFFIXES[fmt]}")
+        entries = self.entries
+        step = serialize.DEFAULT_CHUNK_ROWS
+        chunks = (
+            serialize.encode_items(
+                ({name: getattr(e, name) for name in _ENTRY_FIELDS} for e in entries[i:i + step]),
+                fmt,
+            )
+            for i in range(0, len(entries), step)
+        )
         
         with open(output_path, "w") as f:
-            json.dump(
-                {
-                    "log_version": "1.0",
+            if fmt == "ndjson":
+                serialize.write_ndjson(f, chunks)
+            else:
+                serialize.write_document(f, "entries", chunks, fmt, before={
+                    "log_version": "1.1",
                     "generated_at": _utc_now_iso(),
-                    "n_entries": len(self.entries),
-                    "entries": [asdict(e) for e in self.entries],
-                },
-                f,
-                indent=2,
-            )
+                    "n_entries": len(entries),
+                    "chain_head": self._last_hash,
+                    "checkpoints": [asdict(c) for c in self.checkpoints],
+                })
+        if fmt == "ndjson":
+            sidecar = output_path.with_name(f"{output_path.stem}.checkpoints.jsonl")
+            with open(sidecar, "w") as f:
+                serialize.write_ndjson(f, [serialize.encode_items(map(asdict, self.checkpoints), fmt)])
         
         return output_path
     
     def summary(self) -> dict[str, int]:
         """Get summary of log entries by type."""
-        counts = {"PREDICTION": 0, "RECOMMENDATION": 0, "DECISION": 0, "ERROR": 0}
-        for entry in self.entries:
-            counts[entry.event_type] = counts.get(entry.event_type, 0) + 1
-        return counts
+        return dict(self._counts)
+    
+    def close(self) -> None:
+        """Flush and close the streaming writer, if any."""
+        if self.writer is not None:
+            self.writer.close()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,408 @@
+"""
+Training module for ACQC demo.
+
+Fits soft sensor models from aligned tag + quality data (e.g.
+align.lab_window_dataset) and writes them as ModelConfig artifacts:
+- One streaming pass accumulates sufficient statistics (means and the
+  cross-products XᵀX, Xᵀy, yᵀy) per block of rows; nothing else is kept
+  in memory, so months of history can be read chunk by chunk
+- Ridge, PCR and PLS (SIMPLS) are solved from the cross-products alone
+- k-fold or time-split (forward-chaining) cross-validation merges the
+  block statistics per fold; held-out errors are also computed from the
+  statistics, so no fold re-reads data
+- uncertainty_factor is calibrated from the cross-validated RMSE
+
+Fitted values are rounded to 12 significant digits, so the same data
+gives the same compute_model_hash regardless of chunking or workers.
+"""
+
+import math
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from statistics import NormalDist
+from typing import Any, Iterable
+
+from acqc_demo.dataset import ColumnarDataset, QC_OK
+from acqc_demo.drift import DriftDetector, PcaMonitor, RunningCovariance
+from acqc_demo.features import FeaturePipeline
+from acqc_demo.infer import ModelConfig
+from acqc_demo.linalg import cholesky, cholesky_solve, jacobi_eigh
+from acqc_demo.storage import load_binary
+
+
+METHODS = ("ridge", "pcr", "pls")
+DEFAULT_ALPHAS = (10.0, 1.0, 0.1, 0.01, 0.001, 0.0001)
+DEFAULT_BLOCK_ROWS = 256
+
+
+def _round(x: Any) -> Any:
+    """Floats (also inside lists/dicts) to 12 significant digits."""
+    if isinstance(x, float):
+        return float(f"{x:.12g}")
+    if isinstance(x, list):
+        return [_round(v) for v in x]
+    if isinstance(x, dict):
+        return {k: _round(v) for k, v in x.items()}
+    return x
+
+
+class TrainingStats:
+    """
+    Sufficient statistics of (inputs, target), one RunningCovariance per
+    block of `block_rows` valid rows in arrival (time) order.
+    
+    Variables are the input columns followed by the target. Rows wait in a
+    buffer until their block is full, so the blocks (and every fit) do not
+    depend on how the data was chunked.
+    """
+    
+    def __init__(self, tags: list[str], block_rows: int = DEFAULT_BLOCK_ROWS):
+        self.tags = list(tags)
+        self.block_rows = block_rows
+        self._full: list[RunningCovariance] = []
+        self._pending: list[list[float]] = [[] for _ in range(len(tags) + 1)]
+    
+    def _block(self, columns: list[list[float]]) -> RunningCovariance:
+        block = RunningCovariance(len(self.tags) + 1)
+        block.update_columns(columns)
+        return block
+    
+    @property
+    def blocks(self) -> list[RunningCovariance]:
+        """Completed blocks, plus the partial one being filled."""
+        if not self._pending[0]:
+            return list(self._full)
+        return [*self._full, self._block(self._pending)]
+    
+    @property
+    def n(self) -> int:
+        return len(self._full) * self.block_rows + len(self._pending[0])
+    
+    def add(self, dataset: ColumnarDataset) -> None:
+        """
+        Accumulate the rows where every input is QC OK and finite and the
+        quality value is finite. The quality column must be row-aligned
+        with the tags (see align.lab_window_dataset).
+        """
+        if dataset.quality is None or (
+            dataset.quality_timestamps is not dataset.timestamps
+            and list(dataset.quality_timestamps) != list(dataset.timestamps)
+        ):
+            raise ValueError("Training needs a quality column aligned with the tag rows")
+        columns = []
+        for tag_id in self.tags:
+            if tag_id not in dataset.values:
+                raise ValueError(f"Training input missing from dataset: {tag_id}")
+            columns.append(dataset.column(tag_id))
+        target = dataset.quality
+        keep = [
+            i for i in range(dataset.n_samples)
+            if target[i] == target[i]
+            and all(qc[i] == QC_OK and values[i] == values[i] for values, qc in columns)
+        ]
+        pending = self._pending
+        for buf, (values, _) in zip(pending, columns):
+            buf.extend(values[i] for i in keep)
+        pending[-1].extend(target[i] for i in keep)
+        
+        rows = self.block_rows
+        while len(pending[0]) >= rows:
+            self._full.append(self._block([buf[:rows] for buf in pending]))
+            self._pending = pending = [buf[rows:] for buf in pending]
+    
+    def extend(self, other: "TrainingStats") -> None:
+        """
+        Append the blocks of a later chunk of data accumulated separately
+        (a partial block on either side stays a short block).
+        """
+        self._full = self.blocks + other.blocks
+        self._pending = [[] for _ in range(len(self.tags) + 1)]
+    
+    def total(self, blocks: Iterable[RunningCovariance] | None = None) -> RunningCovariance:
+        """Merged statistics of the given blocks (default: all), in order."""
+        merged = RunningCovariance(len(self.tags) + 1)
+        for block in self.blocks if blocks is None else blocks:
+            merged.merge(block)
+        return merged
+
+
+def _file_stats(task: tuple[str, list[str], int]) -> TrainingStats:
+    path, tags, block_rows = task
+    stats = TrainingStats(tags, block_rows)
+    stats.add(load_binary(Path(path)))
+    return stats
+
+
+def accumulate_files(
+    paths: list[Path],
+    tags: list[str],
+    block_rows: int = DEFAULT_BLOCK_ROWS,
+    workers: int = 1,
+) -> TrainingStats:
+    """
+    Statistics over `.acqc` files in time order (e.g. the shards of
+    data_gen.generate_sharded_dataset), read in parallel with `workers`
+    processes. Blocks are merged in file order, so the result does not
+    depend on `workers`.
+    """
+    tasks = [(str(p), list(tags), block_rows) for p in paths]
+    if workers <= 1 or len(tasks) <= 1:
+        parts = [_file_stats(task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers, len(tasks))) as pool:
+            parts = list(pool.map(_file_stats, tasks))
+    stats = TrainingStats(tags, block_rows)
+    for part in parts:
+        stats.extend(part)
+    return stats
+
+
+def _standardized(stats: RunningCovariance) -> tuple[list[list[float]], list[float], list[float]]:
+    """(input correlation matrix, input/target cross-covariance, input scales)."""
+    k = stats.k - 1
+    cov = stats.covariance()
+    scale = [math.sqrt(cov[i][i]) or 1.0 for i in range(k)]
+    cxx = [[cov[i][j] / (scale[i] * scale[j]) for j in range(k)] for i in range(k)]
+    cxy = [cov[i][k] / scale[i] for i in range(k)]
+    return cxx, cxy, scale
+
+
+def _solve(cxx: list[list[float]], cxy: list[float], method: str, param: float) -> list[float]:
+    """Standardized coefficients for one method / hyper-parameter."""
+    k = len(cxy)
+    if method == "ridge":
+        ridge = [[c + (param if i == j else 0.0) for j, c in enumerate(row)] for i, row in enumerate(cxx)]
+        return cholesky_solve(cholesky(ridge), cxy)
+    
+    a = int(param)
+    beta = [0.0] * k
+    if method == "pcr":
+        values, vectors = jacobi_eigh(cxx)
+        for c in range(min(a, k)):
+            if values[c] <= 1e-12 * values[0]:
+                break
+            v = [row[c] for row in vectors]
+            w = math.fsum(vi * s for vi, s in zip(v, cxy)) / values[c]
+            beta = [b + w * vi for b, vi in zip(beta, v)]
+        return beta
+    
+    # SIMPLS on the cross-products (single response)
+    s = list(cxy)
+    basis: list[list[float]] = []
+    first = 0.0
+    for _ in range(min(a, k)):
+        r = list(s)
+        cr = [math.fsum(x * y for x, y in zip(row, r)) for row in cxx]
+        tt = math.fsum(x * y for x, y in zip(r, cr))
+        first = first or tt
+        if tt <= 1e-14 * first:
+            break  # remaining covariance with the target is rounding noise
+        norm = math.sqrt(tt)
+        r = [x / norm for x in r]
+        p = [x / norm for x in cr]
+        q = math.fsum(x * y for x, y in zip(r, cxy))
+        beta = [b + q * x for b, x in zip(beta, r)]
+        for _ in range(2):  # twice: keeps the basis orthogonal on collinear inputs
+            for v in basis:
+                d = math.fsum(x * y for x, y in zip(v, p))
+                p = [x - d * y for x, y in zip(p, v)]
+        vnorm = math.sqrt(math.fsum(x * x for x in p)) or 1.0
+        v = [x / vnorm for x in p]
+        basis.append(v)
+        d = math.fsum(x * y for x, y in zip(v, s))
+        s = [x - d * y for x, y in zip(s, v)]
+    return beta
+
+
+def fit_linear(
+    stats: RunningCovariance,
+    method: str,
+    param: float,
+) -> tuple[list[float], float]:
+    """
+    Fit on merged statistics; returns (coefficients, intercept) in raw units.
+    
+    Args:
+        method: "ridge" (param: alpha, relative to unit input variance),
+            "pcr" or "pls" (param: number of components)
+    """
+    if method not in METHODS:
+        raise ValueError(f"Unknown training method: {method}")
+    cxx, cxy, scale = _standardized(stats)
+    beta = _solve(cxx, cxy, method, param)
+    coefficients = [b / s for b, s in zip(beta, scale)]
+    intercept = stats.mean[-1] - math.fsum(c * m for c, m in zip(coefficients, stats.mean))
+    return coefficients, intercept
+
+
+def squared_error(
+    stats: RunningCovariance,
+    coefficients: list[float],
+    intercept: float,
+) -> float:
+    """Sum of squared residuals of a linear model over the rows behind `stats`."""
+    if stats.n == 0:
+        return 0.0
+    k = len(coefficients)
+    cm = stats.comoment
+    b = coefficients
+    centered = (
+        cm[k][k]
+        - 2.0 * math.fsum(b[i] * cm[i][k] for i in range(k))
+        + math.fsum(b[i] * b[j] * cm[i][j] for i in range(k) for j in range(k))
+    )
+    bias = stats.mean[k] - intercept - math.fsum(c * m for c, m in zip(b, stats.mean))
+    return max(centered, 0.0) + stats.n * bias * bias
+
+
+def _fold_errors(
+    task: tuple[RunningCovariance, RunningCovariance, str, list[float]],
+) -> list[float]:
+    """Held-out squared error of every candidate on one fold (pool worker)."""
+    train, held_out, method, params = task
+    return [squared_error(held_out, *fit_linear(train, method, p)) for p in params]
+
+
+def cross_validate(
+    stats: TrainingStats,
+    method: str,
+    params: list[float],
+    folds: int = 5,
+    scheme: str = "time",
+    workers: int = 1,
+) -> tuple[list[float], list[list[float]]]:
+    """
+    Cross-validated RMSE of each candidate hyper-parameter.
+    
+    Folds are contiguous groups of blocks. "kfold" trains on all other
+    folds; "time" trains on the folds before the held-out one only
+    (forward chaining: never on the future).
+    
+    Returns:
+        (RMSE per candidate, RMSE per fold and candidate)
+    """
+    if scheme not in ("kfold", "time"):
+        raise ValueError(f"Unknown cross-validation scheme: {scheme}")
+    blocks = stats.blocks
+    folds = min(folds, len(blocks))
+    if folds < 2:
+        raise ValueError("Cross-validation needs at least 2 blocks of data")
+    bounds = [len(blocks) * f // folds for f in range(folds + 1)]
+    fold_stats = [stats.total(blocks[lo:hi]) for lo, hi in zip(bounds, bounds[1:])]
+    
+    tasks = []
+    for f, held_out in enumerate(fold_stats):
+        train_blocks = fold_stats[:f] if scheme == "time" else fold_stats[:f] + fold_stats[f + 1:]
+        train = stats.total(train_blocks)
+        if train.n > len(stats.tags) + 1:
+            tasks.append((train, held_out, method, list(params)))
+    
+    if workers <= 1 or len(tasks) <= 1:
+        errors = [_fold_errors(task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers, len(tasks))) as pool:
+            errors = list(pool.map(_fold_errors, tasks))
+    
+    counts = [task[1].n for task in tasks]
+    n = sum(counts)
+    rmse = [math.sqrt(math.fsum(e[c] for e in errors) / n) for c in range(len(params))]
+    per_fold = [[math.sqrt(e / m) for e in fold] for fold, m in zip(errors, counts)]
+    return rmse, per_fold
+
+
+@dataclass
+class TrainingResult:
+    """Fitted model plus the cross-validation that selected it."""
+    config: ModelConfig
+    method: str
+    param: float
+    cv_rmse: float
+    n_samples: int
+    cv_scores: dict[float, float] = field(default_factory=dict)  # candidate -> RMSE
+    fold_rmse: list[float] = field(default_factory=list)  # selected candidate
+
+
+def train_model(
+    data: ColumnarDataset | Iterable[ColumnarDataset] | TrainingStats,
+    input_tags: list[str],
+    model_id: str,
+    version: str = "0.1.0",
+    method: str = "pls",
+    params: list[float] | None = None,
+    folds: int = 5,
+    scheme: str = "time",
+    coverage: float = 0.95,
+    features: FeaturePipeline | None = None,
+    output_variable: str | None = None,
+    block_rows: int = DEFAULT_BLOCK_ROWS,
+    workers: int = 1,
+    detector: bool = False,
+) -> TrainingResult:
+    """
+    Fit, cross-validate and package a model.
+    
+    Args:
+        data: A dataset, chunks of one in time order (e.g. days read with
+            storage.BinaryDataset.select) or precomputed TrainingStats
+        input_tags: Raw input tags
+        params: Candidates (default: 1..k components, or DEFAULT_ALPHAS);
+            the one with the lowest cross-validated RMSE is kept
+        coverage: Target coverage of the ±uncertainty_factor interval,
+            assuming normally distributed residuals (KPI-06)
+        features: Derived inputs; computed chunk by chunk with one streaming
+            state, and stored in the artifact
+        workers: Processes for the cross-validation folds
+        detector: Also store a DriftDetector fitted on the inputs
+    
+    Returns:
+        TrainingResult; save result.config with infer.save_model_config()
+    """
+    tags = list(input_tags) + (features.names if features is not None else [])
+    if isinstance(data, TrainingStats):
+        stats = data
+        tags = stats.tags
+    else:
+        stats = TrainingStats(tags, block_rows)
+        chunks = [data] if isinstance(data, ColumnarDataset) else data
+        state = features.state() if features is not None else None
+        for chunk in chunks:
+            if output_variable is None:
+                output_variable = chunk.quality_variable
+            stats.add(features.transform(chunk, state) if features is not None else chunk)
+    
+    k = len(tags)
+    if params is None:
+        params = list(DEFAULT_ALPHAS) if method == "ridge" else list(range(1, k + 1))
+    rmse, per_fold = cross_validate(stats, method, params, folds, scheme, workers)
+    best = min(range(len(params)), key=rmse.__getitem__)
+    
+    total = stats.total()
+    coefficients, intercept = fit_linear(total, method, params[best])
+    z = NormalDist().inv_cdf(0.5 + coverage / 2.0)
+    config = ModelConfig(
+        model_id=model_id,
+        version=version,
+        input_tags=list(input_tags),
+        output_variable=output_variable or "quality",
+        coefficients={t: _round(c) for t, c in zip(tags, coefficients)},
+        intercept=_round(intercept),
+        uncertainty_factor=_round(z * rmse[best]),
+        features=features.to_config() if features is not None else [],
+    )
+    if detector:
+        inputs = RunningCovariance(k)
+        inputs.n = total.n
+        inputs.mean = total.mean[:k]
+        inputs.comoment = [row[:k] for row in total.comoment[:k]]
+        config.detector = _round(DriftDetector(PcaMonitor.from_statistics(tags, inputs)).to_config())
+    
+    return TrainingResult(
+        config=config,
+        method=method,
+        param=params[best],
+        cv_rmse=rmse[best],
+        n_samples=total.n,
+        cv_scores=dict(zip(params, rmse)),
+        fold_rmse=[fold[best] for fold in per_fold],
+    )
@@ -1,16 +1,90 @@
 """Tests for ACQC Demo."""
 
+import asyncio
+import json
 import math
+import os
+import random
+import statistics
+import tempfile
+import threading
+import time
+import urllib.request
+from array import array
+from bisect import bisect_left
+from dataclasses import asdict, replace
+from datetime import datetime, timedelta, timezone
 from pathlib import Path
 
-from acqc_demo.data_gen import generate_demo_dataset, TagSample
-from acqc_demo.infer import SoftSensor, create_baseline_model
-from acqc_demo.trace import AuditLog
+import pytest
+
+from acqc_demo import bench, instrument
+from acqc_demo.align import (
+    StreamingAligner,
+    TagSeries,
+    align_to_grid,
+    asof_indices,
+    make_grid,
+    match_lab_windows,
+    resample,
+    series_from_dataset,
+)
+from acqc_demo.cache import PredictionCache
+from acqc_demo.conformal import ConformalCalibrator, lab_residuals
+from acqc_demo.data_gen import generate_demo_dataset, generate_sharded_dataset, TagSample
+from acqc_demo.dataset import ColumnarDataset, QC_BAD, QC_CODES, QC_OK, iso_to_ns, ns_to_iso, ns_to_iso_many
+from acqc_demo.evaluate import Evaluator, ErrorAccumulator, check_kpis, iter_lab_results, load_kpi_thresholds
+from acqc_demo.drift import (
+    DriftDetector,
+    PcaMonitor,
+    RunningCovariance,
+    detection_scores,
+    ranges_from_dictionary,
+)
+from acqc_demo.ingest import ingest_file
+from acqc_demo.features import FeaturePipeline, FeatureSpec
+from acqc_demo.hotswap import ModelWatcher
+from acqc_demo.infer import (
+    PredictionBatch,
+    SoftSensor,
+    compute_model_hash,
+    create_baseline_model,
+    load_model_config,
+    save_model_config,
+    load_predictions,
+    save_predictions,
+)
+from acqc_demo.registry import ModelRegistry, stack_models
+from acqc_demo.audit_query import AuditQuery, export_jsonl
+from acqc_demo.backtest import concat_datasets, input_files, run_backtest
+from acqc_demo.integrity import verify_entry
+from acqc_demo.storage import binary_to_json, json_to_binary, load_binary, save_binary
+from acqc_demo.stream import StreamingService, TagUpdate, record_to_update, replay_dataset
+from acqc_demo.tags import load_tag_dictionary
+from acqc_demo.train import accumulate_files, train_model
+from acqc_demo import trace
+from acqc_demo.trace import AuditLog, audit_log_files, iter_audit_entries, verify_audit_log
 
 
 class TestDataGeneration:
     """Tests for data generation module."""
     
+    def test_ns_iso_formatting_matches_datetime(self):
+        """Test cached epoch-ns formatting gives datetime.isoformat() text."""
+        rng = random.Random(8)
+        start = 1_767_254_400 * 10**9
+        timestamps = [rng.randrange(-10**18, 4 * 10**18) for _ in range(2000)]
+        timestamps += [0, -1, 999, 1000, -10**9, *range(start, start + 3 * 10**9, 10**8)]
+        
+        expected = [
+            (datetime(1970, 1, 1, tzinfo=timezone.utc) + timedelta(microseconds=t // 1000))
+            .isoformat().replace("+00:00", "Z")
+            for t in timestamps
+        ]
+        assert [ns_to_iso(t) for t in timestamps] == expected
+        assert ns_to_iso_many(timestamps) == expected
+        assert [iso_to_ns(s) for s in expected[-30:]] == timestamps[-30:]
+    
     def test_generate_dataset_structure(self):
         """Test that generated dataset has correct structure."""
         dataset = generate_demo_dataset(n_samples=10)
@@ -45,6 +119,137 @@ class TestDataGeneration:
         sample = dataset["quality"][0]
         assert sample["variable_id"] == "RON"
         assert sample["source"] == "SIMULATED"
+    
+    def test_seeded_generation_is_reproducible(self, tmp_path: Path):
+        """Test seeded data and worker-independent sharded generation."""
+        first = generate_demo_dataset(n_samples=30, columnar=True, seed=11)
+        second = generate_demo_dataset(n_samples=30, columnar=True, seed=11)
+        assert first.values["TI-101"].tobytes() == second.values["TI-101"].tobytes()
+        assert first.quality == second.quality
+        assert first.metadata["hash"] == second.metadata["hash"]
+        
+        serial = generate_sharded_dataset(tmp_path / "serial", n_samples=250, n_tags=6,
+                                          seed=11, shard_rows=100, workers=1)
+        parallel = generate_sharded_dataset(tmp_path / "parallel", n_samples=250, n_tags=6,
+                                            seed=11, shard_rows=100, workers=2)
+        assert len(serial["shards"]) == 3
+        assert serial["shards"] == parallel["shards"]
+        assert serial["hash"] == parallel["hash"]
+        
+        shard = load_binary(tmp_path / "serial" / "shard-00002.acqc")
+        assert shard.n_samples == 50
+        assert len(shard.tag_ids) == 6
+    
+    def test_columnar_dataset_round_trip(self):
+        """Test conversion between columnar and dict formats."""
+        columnar = generate_demo_dataset(n_samples=20, columnar=True)
+        
+        assert isinstance(columnar, ColumnarDataset)
+        assert columnar.n_samples == 20
+        assert columnar.values["TI-101"].typecode == "d"
+        assert columnar.timestamps.typecode == "q"
+        assert columnar.qc_flags["TI-101"].typecode == "B"
+        
+        as_dict = columnar.to_dict()
+        assert as_dict["tags"]["TI-101"][1]["timestamp"] == "2026-01-01T08:01:00Z"
+        
+        restored = ColumnarDataset.from_dict(as_dict)
+        assert restored.timestamps == columnar.timestamps
+        assert restored.qc_flags == columnar.qc_flags
+        assert restored.to_dict()["quality"] == as_dict["quality"]
+    
+    def test_binary_dataset_round_trip(self, tmp_path: Path):
+        """Test the binary format: full load, time range and JSON converters."""
+        dataset = generate_demo_dataset(n_samples=50, columnar=True)
+        expected = json.dumps(dataset.to_dict())
+        
+        for compress in (False, True):
+            path = save_binary(dataset, tmp_path / f"dataset-{compress}.acqc",
+                               compress=compress, chunk_rows=16)
+            assert json.dumps(load_binary(path).to_dict()) == expected
+            
+            window = load_binary(path, start=dataset.timestamps[10], end="2026-01-01T08:30:00Z")
+            assert window.timestamps == dataset.timestamps[10:30]
+            # Compared as bytes so NaN (BAD samples) compares equal
+            assert bytes(window.values["FI-301"]) == dataset.values["FI-301"][10:30].tobytes()
+            assert window.quality == dataset.quality[10:30]
+        
+        json_path = binary_to_json(tmp_path / "dataset-False.acqc", tmp_path / "dataset.json")
+        converted = json_to_binary(json_path, tmp_path / "converted.acqc")
+        assert json.dumps(load_binary(converted).to_dict()) == expected
+    
+    def test_ingest_historian_export(self, tmp_path: Path):
+        """Test schema-validated ingestion of a long-format export."""
+        dataset = generate_demo_dataset(n_samples=10, columnar=True)
+        schema_quality = {"OK": "GOOD", "SUSPECT": "UNCERTAIN", "BAD": "BAD"}
+        path = tmp_path / "export.jsonl"
+        with open(path, "w") as f:
+            for record in dataset.to_dict()["tags"].values():
+                for sample in record:
+                    value = sample["value"]
+                    f.write(json.dumps({
+                        "ts": sample["timestamp"],
+                        "tag_id": sample["tag_id"],
+                        "value": None if math.isnan(value) else value,
+                        "unit": sample["unit"],
+                        "quality": schema_quality[sample["qc_flag"]],
+                    }) + "\n")
+            f.write('{"ts": "2026-01-01T08:00:00Z", "tag_id": "TI-101", "value": "hot", '
+                    '"unit": "degC", "quality": "GOOD"}\n')
+            f.write("not json\n")
+        
+        loaded, report = ingest_file(path, chunk_size=7)
+        
+        assert report.n_accepted == 40
+        assert report.reasons == {"invalid value": 1, "malformed record": 1}
+        assert loaded.timestamps == dataset.timestamps
+        assert loaded.qc_flags == dataset.qc_flags
+        for tag_id in dataset.tag_ids:
+            # json.dumps so NaN (missing values) compares equal
+            assert json.dumps(list(loaded.values[tag_id])) == json.dumps(list(dataset.values[tag_id]))
+    
+    def test_ingest_rejects_invalid_timestamp(self, tmp_path: Path):
+        """Test a bad ts mid-file is rejected with a reason and the rest still loads."""
+        path = tmp_path / "export.jsonl"
+        with open(path, "w") as f:
+            for i in range(9):
+                ts = "not-a-time" if i == 4 else f"2026-01-01T08:0{i}:00Z"
+                f.write(json.dumps({
+                    "ts": ts, "tag_id": "TI-101", "value": 350.0 + i, "unit": "degC", "quality": "GOOD",
+                }) + "\n")
+        
+        loaded, report = ingest_file(path, chunk_size=3)
+        
+        assert (report.n_rows, report.n_accepted) == (9, 8)
+        assert report.reasons == {"invalid ts": 1}
+        assert report.examples == [(5, "invalid ts")]
+        assert list(loaded.values["TI-101"]) == [350.0 + i for i in range(9) if i != 4]
+    
+    def test_ingest_csv_missing_column_empty_unit_duplicates(self, tmp_path: Path):
+        """Test a missing column, empty units and repeated (tag_id, ts) rows are reported."""
+        path = tmp_path / "no_unit.csv"
+        path.write_text("ts,tag_id,value,quality\n2026-01-01T08:00:00Z,TI-101,350.0,GOOD\n")
+        loaded, report = ingest_file(path)
+        assert (report.n_rows, report.n_accepted) == (1, 0)
+        assert report.reasons == {"missing column: unit": 1}
+        assert loaded.tag_ids == []
+        
+        path = tmp_path / "export.csv"
+        path.write_text(
+            "ts,tag_id,value,unit,quality\n"
+            "2026-01-01T08:00:00Z,TI-101,350.0,,GOOD\n"
+            "2026-01-01T08:01:00Z,TI-101,351.0,degC,GOOD\n"
+            "2026-01-01T08:00:00Z,TI-101,352.0,degC,GOOD\n"
+            "2026-01-01T08:00:00Z,XX-999,1.0,,GOOD\n"
+        )
+        loaded, report = ingest_file(path, tag_units={"TI-101": "degC"})
+        assert (report.n_rows, report.n_accepted, report.n_rejected) == (4, 2, 2)
+        assert report.reasons == {
+            "missing required field: unit": 1,
+            "duplicate (tag_id, ts), last kept": 1,
+        }
+        assert loaded.units == {"TI-101": "degC"}
+        assert list(loaded.values["TI-101"]) == [352.0, 351.0]
 
 
 class TestInference:
@@ -102,6 +307,323 @@ class TestInference:
         
         assert len(predictions) == 10
         assert all(p.model_id == sensor.config.model_id for p in predictions)
+    
+    def test_prediction_batch_views(self, tmp_path: Path):
+        """Test the columnar PredictionBatch keeps the list-of-Prediction API."""
+        dataset = generate_demo_dataset(n_samples=40, columnar=True, seed=4)
+        dataset.qc_flags["TI-101"][3] = QC_CODES["BAD"]
+        batch = SoftSensor().predict_batch(dataset)
+        rows = list(batch)
+        
+        assert isinstance(batch, PredictionBatch)
+        assert not hasattr(rows[0], "__dict__")
+        assert batch[-1].timestamp == rows[-1].timestamp and batch[3].status == "DEGRADED"
+        assert [asdict(p) for p in batch[5:9]] == [batch.row(i) for i in range(5, 9)]
+        assert batch.status_counts() == {
+            name: sum(p.status == name for p in rows) for name in ("OK", "DEGRADED", "OOD")
+        }
+        
+        save_predictions(batch, tmp_path / "batch.json")
+        save_predictions(rows, tmp_path / "rows.json")
+        assert (tmp_path / "batch.json").read_text() == (tmp_path / "rows.json").read_text()
+    
+    def test_save_predictions_formats(self, tmp_path: Path):
+        """Test streamed json matches json.dump and the other formats agree."""
+        dataset = generate_demo_dataset(n_samples=30, columnar=True, seed=5)
+        dataset.qc_flags["PI-201"][7] = QC_CODES["BAD"]  # NaN y_hat
+        batch = SoftSensor().predict_batch(dataset)
+        expected = {
+            "predictions": [batch.row(i) for i in range(len(batch))],
+            "n_total": 30,
+            **{f"n_{k.lower()}": v for k, v in batch.status_counts().items()},
+        }
+        
+        path = save_predictions(batch, tmp_path / "p.json", chunk_rows=7)
+        assert path.read_text() == json.dumps(expected, indent=2)
+        compact = save_predictions(list(batch), tmp_path / "c.json", fmt="compact", chunk_rows=7)
+        assert compact.read_text() == json.dumps(expected, separators=(",", ":"))
+        ndjson = save_predictions(batch, tmp_path / "p.jsonl", fmt="ndjson", chunk_rows=7)
+        assert ndjson.read_text() == "".join(
+            json.dumps(row, separators=(",", ":")) + "\n" for row in expected["predictions"]
+        )
+        
+        loaded = load_predictions(save_predictions(batch, tmp_path / "p.acqc", fmt="binary"))
+        assert json.dumps([loaded.row(i) for i in range(len(loaded))]) == json.dumps(
+            expected["predictions"]
+        )
+        with pytest.raises(ValueError):
+            save_predictions(list(batch), tmp_path / "x.acqc", fmt="binary")
+    
+    def test_prediction_cache(self):
+        """Test the quantized LRU/TTL memo: hits, eviction, expiry and model changes."""
+        now = [0.0]
+        dictionary = load_tag_dictionary()
+        cache = PredictionCache.from_tag_dictionary(
+            dictionary, aliases={"TI-101": "TIC-201.PV"}, max_entries=2, ttl_s=10.0,
+            clock=lambda: now[0],
+        )
+        assert cache.resolution == {"TI-101": 500 / 2**16}
+        cached, plain = SoftSensor(cache=cache), SoftSensor()
+        snapshot = {"TI-101": 350.0, "PI-201": 12.5, "FI-301": 1500.0, "AI-401": 0.85}
+        
+        first = cached.predict(snapshot, "2026-01-01T08:00:00Z")
+        assert asdict(first) == asdict(plain.predict(snapshot, "2026-01-01T08:00:00Z"))
+        # Held values and noise below TI-101's resolution hit the same entry
+        assert cached.predict({**snapshot, "TI-101": 350.001}).y_hat == first.y_hat
+        assert (cache.stats.hits, cache.stats.misses) == (1, 1)
+        
+        cached.predict({**snapshot, "PI-201": 12.6})
+        cached.predict({**snapshot, "PI-201": 12.7})  # third key: evicts the first
+        assert len(cache) == 2 and cache.stats.evictions == 1
+        now[0] = 11.0
+        cached.predict({**snapshot, "PI-201": 12.7})
+        assert cache.stats.expirations == 1
+        
+        other = create_baseline_model()
+        other.intercept += 1.0
+        moved = SoftSensor(other, cache=cache).predict(snapshot)
+        assert moved.y_hat == round(first.y_hat + 1.0, 3)
+        assert cache.stats.invalidations == 1 and cache.model_hash == compute_model_hash(other)
+        assert cache.stats.to_dict()["hit_rate"] == round(1 / 6, 4)
+    
+    def test_soft_sensor_batch_columnar_matches_dict(self):
+        """Test batch prediction gives the same result for both formats."""
+        columnar = generate_demo_dataset(n_samples=50, columnar=True)
+        sensor = SoftSensor()
+        
+        from_columns = sensor.predict_batch(columnar)
+        from_dict = sensor.predict_batch(columnar.to_dict())
+        
+        assert [p.status for p in from_columns] == [p.status for p in from_dict]
+        assert [p.timestamp for p in from_columns] == [p.timestamp for p in from_dict]
+        assert [p.y_hat for p in from_columns if p.status != "DEGRADED"] == [
+            p.y_hat for p in from_dict if p.status != "DEGRADED"
+        ]
+    
+    def test_vectorized_batch_matches_predict(self):
+        """Test the vectorized batch engine reproduces predict() exactly."""
+        dataset = generate_demo_dataset(n_samples=500, columnar=True)
+        sensor = SoftSensor()
+        
+        batch = sensor.predict_batch(dataset)
+        
+        for i, pred in enumerate(batch):
+            tag_values = {
+                tag_id: dataset.values[tag_id][i]
+                for tag_id in dataset.tag_ids
+                if dataset.qc_flags[tag_id][i] == QC_OK
+            }
+            expected = sensor.predict(tag_values, ns_to_iso(dataset.timestamps[i]))
+            
+            assert pred.status == expected.status
+            assert pred.timestamp == expected.timestamp
+            if expected.status != "DEGRADED":
+                assert pred.y_hat == expected.y_hat
+                assert pred.uncertainty_lower == expected.uncertainty_lower
+                assert pred.uncertainty_upper == expected.uncertainty_upper
+    
+    def test_feature_pipeline_batch_matches_streaming(self):
+        """Test rolling features give identical values in batch and streaming mode."""
+        dataset = generate_demo_dataset(n_samples=300, columnar=True, seed=5)
+        pipeline = FeaturePipeline([
+            FeatureSpec("TI-101", "mean", window=10),
+            FeatureSpec("TI-101", "std", window=10, min_count=5),
+            FeatureSpec("FI-301", "slope", window=20, min_count=10),
+            FeatureSpec("PI-201", "ewma", alpha=0.2),
+            FeatureSpec("AI-401", "lag", lag=3),
+        ])
+        batch = pipeline.transform(dataset)
+        
+        window = dataset.values["TI-101"][40:50]  # all OK with this seed
+        assert math.isclose(batch.values["TI-101:mean10"][49], sum(window) / 10)
+        
+        state = pipeline.state()
+        for i in range(dataset.n_samples):
+            row = dataset.row(i)
+            features = state.push(
+                {t: v["value"] for t, v in row.items()},
+                {t: QC_CODES[v["qc_flag"]] for t, v in row.items()},
+            )
+            for name, value in features.items():
+                # Compared as bytes so NaN (feature not available) compares equal
+                assert array("d", [value]).tobytes() == array("d", [batch.values[name][i]]).tobytes()
+        
+        config = create_baseline_model()
+        config.features = pipeline.to_config()
+        config.coefficients["TI-101:mean10"] = 0.001
+        sensor = SoftSensor(config)
+        assert sensor.model_hash != SoftSensor().model_hash
+        assert compute_model_hash(create_baseline_model()) == SoftSensor().model_hash
+        
+        expected = [json.dumps(asdict(p)) for p in sensor.predict_batch(dataset)]
+        state = sensor.features.state()
+        chunked = []
+        for start in range(0, dataset.n_samples, 64):
+            chunk = ColumnarDataset(
+                timestamps=dataset.timestamps[start:start + 64],
+                values={t: v[start:start + 64] for t, v in dataset.values.items()},
+                qc_flags={t: q[start:start + 64] for t, q in dataset.qc_flags.items()},
+                units=dataset.units,
+            )
+            chunked += [json.dumps(asdict(p)) for p in sensor.predict_batch(chunk, state)]
+        assert chunked == expected
+    
+    def test_feature_names_do_not_replace_source_tags(self):
+        """Test a value feature gets its own column and a colliding name is refused."""
+        dataset = generate_demo_dataset(n_samples=20, columnar=True, seed=5)
+        batch = FeaturePipeline([FeatureSpec("TI-101")]).transform(dataset)
+        assert batch.values["TI-101"] is dataset.values["TI-101"]
+        assert batch.qc_flags["TI-101:value"].tobytes() == dataset.qc_flags["TI-101"].tobytes()
+        
+        with pytest.raises(ValueError, match="collide"):
+            FeaturePipeline([FeatureSpec("TI-101", "mean", window=5, name="PI-201"), FeatureSpec("PI-201")])
+    
+    def test_train_model_artifact(self, tmp_path: Path):
+        """Test streaming training gives a stable, calibrated ModelConfig."""
+        tags = ["TI-101", "PI-201", "FI-301", "AI-401"]
+        dataset = generate_demo_dataset(n_samples=3000, columnar=True, seed=7)
+        result = train_model(dataset, tags, "soft-sensor-ron-trained", method="pls")
+        chunks = [
+            ColumnarDataset(
+                timestamps=dataset.timestamps[start:start + 700],
+                values={t: v[start:start + 700] for t, v in dataset.values.items()},
+                qc_flags={t: q[start:start + 700] for t, q in dataset.qc_flags.items()},
+                units=dataset.units,
+                quality=dataset.quality[start:start + 700],
+            )
+            for start in range(0, dataset.n_samples, 700)
+        ]
+        chunked = train_model(iter(chunks), tags, "soft-sensor-ron-trained", method="pls",
+                              output_variable="RON", workers=2)
+        assert compute_model_hash(chunked.config) == compute_model_hash(result.config)
+        
+        path = save_model_config(result.config, tmp_path / "ron.json")
+        sensor = SoftSensor(load_model_config(path))
+        assert result.cv_rmse < 0.35  # lab noise of the generator: 0.3
+        predictions = sensor.predict_batch(dataset)
+        u = sensor.config.uncertainty_factor
+        covered = [
+            abs(p.y_hat - y) <= u
+            for p, y in zip(predictions, dataset.quality) if p.status != "DEGRADED"
+        ]
+        assert sum(covered) / len(covered) >= 0.90  # KPI-06
+        
+        generate_sharded_dataset(tmp_path / "shards", 2000, seed=1, shard_rows=500)
+        shards = sorted((tmp_path / "shards").glob("*.acqc"))
+        serial = train_model(accumulate_files(shards, tags), tags, "m", method="ridge")
+        parallel = train_model(accumulate_files(shards, tags, workers=2), tags, "m", method="ridge")
+        assert compute_model_hash(serial.config) == compute_model_hash(parallel.config)
+    
+    def test_conformal_intervals_streaming_matches_batch(self):
+        """Test sliding-window conformal half-widths, online batch = streaming."""
+        rng = random.Random(0)
+        calibrator = ConformalCalibrator(coverage=0.9, window=50)
+        history = []
+        for _ in range(300):
+            r = rng.gauss(0, 1)
+            calibrator.update(r)
+            history.append(abs(r))
+            window = sorted(history[-50:])
+            rank = math.ceil((len(window) + 1) * 0.9 - 1e-9)
+            expected = window[rank - 1] if rank <= len(window) else -1.0
+            assert calibrator.half_width(-1.0) == expected
+        
+        dataset = generate_demo_dataset(n_samples=400, columnar=True, seed=11)
+        lab_ts, lab_values = dataset.timestamps[::10], dataset.quality[::10]
+        batch = SoftSensor(calibrator=ConformalCalibrator(coverage=0.9, window=20))
+        _, lower, upper, _ = batch.predict_columns(dataset, lab_results=(lab_ts, lab_values))
+        
+        streaming = SoftSensor(calibrator=ConformalCalibrator(coverage=0.9, window=20))
+        rows = []
+        for i in range(dataset.n_samples):
+            row = dataset.row(i)
+            p = streaming.predict(
+                {t: v["value"] for t, v in row.items() if v["qc_flag"] == "OK"}
+            )
+            rows.append(p)
+            if i % 10 == 0:
+                streaming.calibrator.update(dataset.quality[i] - p.y_hat)
+        assert array("d", [p.uncertainty_lower for p in rows]).tobytes() == lower.tobytes()
+        assert array("d", [p.uncertainty_upper for p in rows]).tobytes() == upper.tobytes()
+        assert batch.calibrator.to_dict() == streaming.calibrator.to_dict()
+        widths = {round(p.uncertainty_upper - p.y_hat, 3) for p in rows if p.status == "OK"}
+        assert len(widths) > 2  # calibrated intervals, not one constant
+    
+    def test_backtest_chunks_match_sequential_run(self, tmp_path: Path, monkeypatch):
+        """Test parallel chunked backtests match one sequential pass, whatever the workers."""
+        generate_sharded_dataset(tmp_path, n_samples=300, seed=5, shard_rows=120)
+        baseline = create_baseline_model()
+        config = replace(
+            baseline,
+            features=[
+                asdict(FeatureSpec("TI-101", "mean", window=5)),
+                asdict(FeatureSpec("PI-201", "lag", lag=2)),
+                asdict(FeatureSpec("FI-301", "ewma", alpha=0.5)),
+            ],
+            coefficients={
+                **baseline.coefficients, "TI-101:mean5": 0.001, "PI-201:lag2": 0.01, "FI-301:ewma0.5": 1e-5,
+            },
+        )
+        files = input_files(tmp_path, tmp_path)
+        assert len(files) == 3
+        
+        serial = run_backtest(files, config, chunk_rows=50)
+        parallel = run_backtest(files, config, chunk_rows=50, workers=2)
+        dataset = concat_datasets([load_binary(f) for f in files])
+        expected = SoftSensor(config).predict_batch(dataset)
+        rows = lambda batch: [json.dumps(batch.row(i)) for i in range(len(batch))]
+        assert serial.n_chunks == 6 and serial.warmup_rows == 30
+        assert rows(serial.predictions) == rows(parallel.predictions) == rows(expected)
+        
+        errors = ErrorAccumulator()
+        errors.add_many(
+            lab_residuals(dataset.timestamps, expected.y_hat, dataset.quality_timestamps, dataset.quality),
+            dataset.quality,
+        )
+        assert serial.errors == parallel.errors
+        assert serial.errors.n == errors.n > 0
+        for key, value in errors.summary().items():
+            assert serial.errors.summary()[key] == pytest.approx(value)
+        
+        window = run_backtest(files, config, "2026-01-01T09:00:00Z", "2026-01-01T11:30:00Z", chunk_rows=7)
+        assert len(window.predictions) == 150
+        
+        # dataset.json inputs are converted in a temporary directory removed afterwards
+        json_path = binary_to_json(files[0], tmp_path / "shard.json")
+        monkeypatch.setattr(tempfile, "tempdir", str(tmp_path / "tmp"))
+        (tmp_path / "tmp").mkdir()
+        converted = run_backtest([json_path], config, chunk_rows=50)
+        assert converted.n_files == 1
+        assert rows(converted.predictions) == rows(run_backtest(files[:1], config, chunk_rows=50).predictions)
+        assert list((tmp_path / "tmp").iterdir()) == []
+    
+    def test_model_registry_matches_sensors(self, tmp_path: Path):
+        """Test registry evaluation matches each model's own SoftSensor."""
+        baseline = create_baseline_model()
+        density = create_baseline_model()
+        density.model_id = "soft-sensor-density-v1"
+        density.output_variable = "DENSITY"
+        density.input_tags = ["TI-101", "FI-301"]
+        density.coefficients = {"FI-301": 0.002, "TI-101": 0.01}
+        shifted = replace(baseline, model_id="soft-sensor-ron-v2", intercept=86.0)
+        save_model_config(baseline, tmp_path / "ron.json")
+        save_model_config(density, tmp_path / "density.json")
+        save_model_config(shifted, tmp_path / "ron2.json")
+        
+        registry = ModelRegistry.load_dir(tmp_path)
+        dataset = generate_demo_dataset(n_samples=200, columnar=True)
+        
+        assert len(registry) == 3
+        assert registry.input_tags[:4] == ["TI-101", "FI-301", "PI-201", "AI-401"]
+        stacks = stack_models((h, s.config) for h, s in registry.models.items())
+        assert sorted(len(stack.matrix) for stack in stacks) == [1, 2]  # both RON models share one matrix
+        
+        serial = registry.predict_batch(dataset)
+        parallel = registry.predict_batch(dataset, workers=2)
+        for model_hash, sensor in registry.models.items():
+            expected = [json.dumps(asdict(p)) for p in sensor.predict_batch(dataset)]
+            assert [json.dumps(asdict(p)) for p in serial[model_hash]] == expected
+            assert [json.dumps(asdict(p)) for p in parallel[model_hash]] == expected
 
 
 class TestTraceability:
@@ -135,6 +657,13 @@ class TestTraceability:
         
         assert path.exists()
         assert path.name == "test_log.json"
+        
+        compact = log.save("compact.json", fmt="compact")
+        assert json.loads(compact.read_text())["entries"] == json.loads(path.read_text())["entries"]
+        assert "\n" not in compact.read_text()
+        ndjson = log.save(fmt="ndjson")
+        assert ndjson.name == "audit_log.jsonl"
+        assert verify_audit_log(tmp_path).ok
     
     def test_audit_log_summary(self, tmp_path: Path):
         """Test audit log summary."""
@@ -148,6 +677,593 @@ class TestTraceability:
         
         assert summary["PREDICTION"] == 2
         assert summary["DECISION"] == 1
+    
+    def test_audit_log_input_digest_cached(self, tmp_path: Path):
+        """Test input digests are computed once per object and verifiable."""
+        log = AuditLog(log_dir=tmp_path)
+        window = {"timestamp": "2026-01-01T08:00:00Z", "tags": {"TI-101": 350.0}}
+        
+        calls = []
+        compute = log._compute_hash
+        log._compute_hash = lambda data: calls.append(data) or compute(data)
+        
+        first = log.log_prediction({"y_hat": 92.5}, window, "abc")
+        second = log.log_prediction({"y_hat": 92.6}, window, "abc")
+        
+        assert len(calls) == 1
+        assert first.data_hash == second.data_hash
+        assert log.verify_input(first, dict(window))
+        assert not log.verify_input(first, {"tags": {"TI-101": 351.0}})
+    
+    def test_audit_log_streaming(self, tmp_path: Path):
+        """Test streaming mode appends JSONL without keeping entries."""
+        log = AuditLog.streaming(log_dir=tmp_path, fsync_every=2)
+        
+        log.log_prediction({"y_hat": 92.5}, {}, "abc")
+        log.log_prediction({"y_hat": 93.0}, {}, "abc")
+        log.log_decision(True, "ref", "OP001")
+        path = log.save()
+        
+        assert log.entries == []
+        assert log.summary()["PREDICTION"] == 2
+        assert [e["event_type"] for e in iter_audit_entries(path)] == [
+            "PREDICTION", "PREDICTION", "DECISION",
+        ]
+        log.close()
+    
+    def test_audit_log_streaming_rotation(self, tmp_path: Path):
+        """Test rotated segments are compressed and keep every entry."""
+        log = AuditLog.streaming(log_dir=tmp_path, rotate_bytes=600, compress=True)
+        
+        for i in range(20):
+            log.log_prediction({"y_hat": 90.0 + i}, {}, "abc")
+        log.close()
+        
+        segments = log.writer.segments
+        assert segments and all(p.suffix == ".gz" for p in segments)
+        
+        entries = [e for p in [*segments, log.writer.path] for e in iter_audit_entries(p)]
+        assert [e["payload"]["prediction"]["y_hat"] for e in entries] == [
+            90.0 + i for i in range(20)
+        ]
+    
+    def test_audit_log_idle_time_rotation(self, tmp_path: Path):
+        """Test an idle writer rotates when rotate_seconds elapses, without new entries."""
+        log = AuditLog.streaming(log_dir=tmp_path, rotate_seconds=0.05, compress=False)
+        try:
+            log.log_prediction({"y_hat": 90.0}, {}, "abc")
+            deadline = time.monotonic() + 5
+            while not log.writer.segments and time.monotonic() < deadline:
+                time.sleep(0.01)
+            assert len(log.writer.segments) == 1
+        finally:
+            log.close()
+    
+    def test_audit_log_hash_chain(self, tmp_path: Path):
+        """Test chained entries verify, prove and detect tampering."""
+        log = AuditLog(log_dir=tmp_path, checkpoint_every=8)
+        for i in range(30):
+            log.log_prediction({"y_hat": 90.0 + i}, {}, "abc")
+        path = log.save()
+        
+        assert log.entries[1].prev_hash == log.entries[0].entry_hash
+        assert len(log.checkpoints) == 3
+        assert verify_audit_log(path).ok
+        assert verify_audit_log(path, workers=2).ok
+        
+        proof, checkpoint = log.prove(13)
+        assert verify_entry(asdict(log.entries[13]), proof, checkpoint)
+        assert not verify_entry(asdict(log.entries[12]), proof, checkpoint)
+        
+        doc = json.loads(path.read_text())
+        doc["entries"][20]["payload"]["prediction"]["y_hat"] = 0.0
+        path.write_text(json.dumps(doc))
+        result = verify_audit_log(path)
+        assert not result.ok
+        assert result.first_invalid == 20
+    
+    def test_audit_log_streaming_chain_resumes(self, tmp_path: Path):
+        """Test the chain, entry IDs and counts continue across sessions and rotations."""
+        for _ in range(2):
+            log = AuditLog.streaming(log_dir=tmp_path, checkpoint_every=8, rotate_bytes=2000)
+            for i in range(25):
+                log.log_decision(True, f"ref-{i}", "OP001")
+            log.close()
+        
+        result = verify_audit_log(tmp_path)
+        assert result.ok
+        assert result.n_entries == 50
+        assert log.summary()["DECISION"] == 50
+        ids = [e["entry_id"] for p in audit_log_files(tmp_path) for e in iter_audit_entries(p)]
+        assert len(set(ids)) == 50
+        with pytest.raises(RuntimeError, match="closed"):
+            log.log_decision(True, "late", "OP001")
+    
+    def test_audit_query_indexes(self, tmp_path: Path):
+        """Test indexed queries by type, model, operator, time and id."""
+        log = AuditLog(log_dir=tmp_path)
+        for i in range(40):
+            log.log_prediction({"y_hat": 90.0 + i}, {}, "model-a" if i % 4 else "model-b")
+            if i % 10 == 0:
+                log.log_decision(True, f"ref-{i}", "OP001" if i % 20 else "OP002")
+        path = export_jsonl(log.save())
+        
+        query = AuditQuery(path)
+        decisions = list(query.find(event_type="DECISION", operator_id="OP002"))
+        assert [d["payload"]["recommendation_ref"] for d in decisions] == ["ref-0", "ref-20"]
+        assert query.count(model_hash="model-b") == 10
+        
+        entries = [asdict(e) for e in log.entries]
+        start = entries[10]["timestamp"]
+        expected = [
+            e for e in entries
+            if e["model_hash"] == "model-a" and e["timestamp"] >= start
+        ]
+        assert list(query.find(model_hash="model-a", start=start)) == expected
+        assert query.get(entries[7]["entry_id"]) == entries[7]
+        
+        # Appended entries are picked up incrementally by a reopened index
+        with open(path, "a") as f:
+            f.write(json.dumps({**entries[0], "entry_id": "X", "operator_id": "OP003"}) + "\n")
+        assert AuditQuery(path).count(operator_id="OP003") == 1
+    
+    def test_audit_query_compressed_segments(self, tmp_path: Path, monkeypatch):
+        """Test queries across rotated .gz segments and the active file of a log directory."""
+        monkeypatch.setattr(trace, "GZIP_MEMBER_BYTES", 500)
+        log = AuditLog.streaming(log_dir=tmp_path, rotate_bytes=3000, compress=True)
+        for i in range(60):
+            log.log_prediction({"y_hat": 90.0 + i}, {}, "model-a" if i % 3 else "model-b")
+        log.close()
+        assert len(log.writer.segments) > 1
+        
+        entries = [e for p in audit_log_files(tmp_path) for e in iter_audit_entries(p)]
+        query = AuditQuery(tmp_path)
+        assert list(query.find(model_hash="model-b")) == [
+            e for e in entries if e["model_hash"] == "model-b"
+        ]
+        assert query.get(entries[31]["entry_id"]) == entries[31]
+        assert AuditQuery(audit_log_files(tmp_path)).count(start=entries[10]["timestamp"]) == sum(
+            e["timestamp"] >= entries[10]["timestamp"] for e in entries
+        )
+
+
+class TestStreaming:
+    """Tests for streaming inference module."""
+    
+    def test_stream_replay_matches_batch(self):
+        """Test complete snapshots reproduce batch predictions."""
+        dataset = generate_demo_dataset(n_samples=30, columnar=True)
+        sensor = SoftSensor()
+        streamed = []
+        
+        service = StreamingService(
+            sensors=[sensor],
+            max_queue=8,
+            tick_interval=None,
+            sink=lambda _, pred: streamed.append(pred),
+        )
+        stats = asyncio.run(service.run(replay_dataset(dataset)))
+        
+        assert stats.n_predictions == 30
+        assert stats.latency.count == 30
+        assert stats.max_queue_depth <= 8
+        expected = sensor.predict_batch(dataset)
+        assert [json.dumps(asdict(p)) for p in streamed] == [
+            json.dumps(asdict(p)) for p in expected
+        ]
+    
+    def test_stream_tick_uses_held_values(self):
+        """Test a tick predicts from held values of slow tags."""
+        sensor = SoftSensor()
+        streamed = []
+        initial = {"TI-101": 350.0, "PI-201": 12.5, "FI-301": 1500.0, "AI-401": 0.85}
+        
+        async def source():
+            for tag_id, value in initial.items():
+                yield TagUpdate(tag_id, value, 0)
+            await asyncio.sleep(0.05)
+            yield TagUpdate("TI-101", 351.0, 60_000_000_000)
+        
+        service = StreamingService(
+            sensors=[sensor],
+            tick_interval=0.01,
+            sink=lambda _, pred: streamed.append(pred),
+        )
+        asyncio.run(service.run(source()))
+        
+        assert len(streamed) == 2
+        assert streamed[1] == sensor.predict(
+            {**initial, "TI-101": 351.0}, "1970-01-01T00:01:00Z"
+        )
+    
+    def test_record_unknown_quality_is_bad(self):
+        """Test an unknown quality string flags the value BAD instead of failing."""
+        record = {"tag_id": "TI-101", "ts": "2026-01-01T00:00:00Z", "value": 350.0}
+        assert record_to_update({**record, "quality": "GOOD"}).qc_flag == QC_OK
+        assert record_to_update({**record, "quality": "STALE"}).qc_flag == QC_BAD
+        assert record_to_update({**record, "qc_flag": "??"}).qc_flag == QC_BAD
+    
+    def test_hot_swap_between_batches(self, tmp_path: Path):
+        """Test a watched model directory swaps models between batches and shadows candidates."""
+        def publish(name: str, intercept: float, mtime: int) -> str:
+            config = replace(create_baseline_model(), version=name, intercept=intercept)
+            path = save_model_config(config, tmp_path / f"{name}.json")
+            os.utime(path, ns=(mtime, mtime))
+            return compute_model_hash(config)
+        
+        first = publish("m1", 85.5, 10**18)
+        watcher = ModelWatcher(tmp_path)
+        assert watcher.active.model_hash == first
+        
+        dataset = generate_demo_dataset(20, columnar=True, seed=3)
+        hashes = []
+        
+        async def source():
+            async for update in replay_dataset(dataset):
+                yield update
+                if update.timestamp_ns == dataset.timestamps[9] and update.tag_id == "AI-401":
+                    await asyncio.sleep(0)  # let the first half flush
+                    publish("m2", 86.0, 2 * 10**18)
+                    assert watcher.poll()
+        
+        service = StreamingService(
+            sensors=[watcher],
+            max_batch=4,
+            tick_interval=None,
+            sink=lambda sensor, pred: hashes.append(pred.model_hash),
+        )
+        asyncio.run(service.run(source()))
+        second = watcher.active.model_hash
+        assert len(hashes) == 20 and second != first
+        switch = hashes.index(second)
+        assert 0 < switch and set(hashes[:switch]) == {first} and set(hashes[switch:]) == {second}
+        
+        # Invalid artifacts are rejected, valid ones become shadow candidates
+        (tmp_path / "bad.json").write_text('{"model_id": "x"}')
+        os.utime(tmp_path / "bad.json", ns=(3 * 10**18, 3 * 10**18))
+        watcher.shadow = True
+        assert not watcher.poll() and "bad.json" in watcher.rejected
+        third = publish("m3", 85.0, 4 * 10**18)
+        assert watcher.poll() and watcher.candidate.model_hash == third
+        
+        predictions = watcher.predict_batch(dataset)
+        assert predictions.model_hash == second
+        assert list(predictions.status) == list(watcher.active.predict_batch(dataset).status)
+        report = watcher.shadow_report
+        assert report.n_rows == 20 and report.n_compared > 0
+        assert report.max_abs_diff == pytest.approx(1.0, abs=2e-3)
+        assert watcher.promote().model_hash == third and watcher.candidate is None
+    
+    def test_model_watcher_survives_poll_errors(self, tmp_path: Path, monkeypatch):
+        """Test the polling thread logs a failed poll and keeps watching."""
+        watcher = ModelWatcher(tmp_path, interval=0.005)
+        newest = watcher._newest
+        failures = iter([PermissionError("denied")])
+        
+        def flaky():
+            for exc in failures:
+                raise exc
+            return newest()
+        
+        monkeypatch.setattr(watcher, "_newest", flaky)
+        config = replace(create_baseline_model(), version="m2", intercept=86.0)
+        save_model_config(config, tmp_path / "m2.json")
+        watcher.start()
+        try:
+            deadline = time.monotonic() + 5
+            while watcher.n_swaps == 0 and time.monotonic() < deadline:
+                time.sleep(0.005)
+        finally:
+            watcher.stop()
+        assert watcher.active.model_hash == compute_model_hash(config)
+        assert watcher.status()["last_error"] == "PermissionError: denied"
+
+
+class TestInstrumentation:
+    """Tests for latency instrumentation module."""
+    
+    def test_stage_spans_and_export(self, tmp_path: Path):
+        """Test per-thread stage histograms, exports and the disabled no-op."""
+        dataset = generate_demo_dataset(n_samples=50, columnar=True, seed=1)
+        sensor = SoftSensor()
+        try:
+            instrument.reset()
+            sensor.predict_batch(dataset)
+            assert instrument.snapshot() == {}  # disabled: nothing recorded
+            assert not hasattr(SoftSensor.predict, "__wrapped__")  # disabled: no wrapper frame
+            
+            instrument.enable()
+            assert SoftSensor.predict.__wrapped__ is not None
+            sensor.predict_batch(dataset)
+            sensor.predict({"TI-101": 350.0, "PI-201": 12.5, "FI-301": 1500.0, "AI-401": 0.85})
+            worker = threading.Thread(target=instrument.record, args=("end_to_end", 2_000_000))
+            worker.start()
+            worker.join()
+            
+            stages = instrument.snapshot()
+            assert stages["predict"].count == 2
+            assert stages["end_to_end"].max_ns == 2_000_000
+            report = instrument.to_json()
+            assert report["kpi_04"]["pass"] is True
+            assert 'acqc_stage_latency_seconds_count{stage="predict"} 2' in instrument.to_prometheus()
+            
+            path = instrument.write_metrics(tmp_path / "metrics.json")
+            assert json.loads(path.read_text())["stages"]["predict"]["count"] == 2
+            server = instrument.serve(port=0)
+            try:
+                url = f"http://127.0.0.1:{server.server_address[1]}/metrics"
+                with urllib.request.urlopen(url) as response:
+                    assert b'stage="end_to_end",quantile="0.95"' in response.read()
+            finally:
+                server.shutdown()
+        finally:
+            instrument.disable()
+            instrument.reset()
+        assert not hasattr(SoftSensor.predict, "__wrapped__")
+
+
+class TestBenchmarks:
+    """Tests for benchmark module."""
+    
+    def test_sweep_and_regression_check(self):
+        """Test a tiny in-process sweep, budget skips and baseline comparison."""
+        results = bench.run_benchmarks(
+            samples=(50,), tags=(4, 20), repeat=1, max_values=400, trace_alloc=False, isolate=False,
+        )
+        assert [(r["case"], r["n_tags"]) for r in results if r.get("skipped")] == [
+            (name, 20) for name in bench.CASES
+        ]
+        measured = [r for r in results if not r.get("skipped")]
+        assert all(r["rows_per_s"] > 0 and r["alloc_peak_mb"] is None for r in measured)
+        
+        baseline = bench.make_baseline(json.loads(json.dumps(results)))
+        assert bench.compare(results, baseline) == []
+        faster = [dict(r, rows_per_s=r["rows_per_s"] * 2) for r in measured]
+        regressions = bench.compare(results, {"results": faster}, threshold=0.25)
+        assert len(regressions) == len(measured)
+        assert regressions[0].startswith("generate[n=50, tags=4]: ")
+
+
+class TestAlignment:
+    """Tests for time alignment module."""
+    
+    def test_asof_join_and_resampling(self):
+        """Test as-of joins with tolerance and the resampling methods."""
+        s = 1_000_000_000
+        series = TagSeries(
+            timestamps=array("q", [0, 5 * s, 10 * s, 30 * s]),
+            values=array("d", [1.0, 2.0, 3.0, 7.0]),
+            qc_flags=array("B", [QC_OK, QC_OK, 2, QC_OK]),
+        )
+        grid = make_grid(0, 31 * s, 10 * s)
+        
+        assert list(asof_indices(grid, series.timestamps)) == [0, 2, 2, 3]
+        assert list(asof_indices(grid, series.timestamps, tolerance_ns=5 * s)) == [0, 2, -1, 3]
+        assert list(asof_indices(array("q", [6 * s]), series.timestamps, direction="nearest")) == [1]
+        
+        last, last_qc = resample(series, grid, "last", tolerance_ns=5 * s)
+        assert list(last_qc) == [QC_OK, 2, 2, QC_OK] and math.isnan(last[2])
+        mean, _ = resample(series, grid, "mean", window_ns=10 * s)
+        assert mean[1] == 2.0  # BAD sample at 10 s excluded
+        interp, _ = resample(series, grid, "interpolate")
+        assert list(interp) == [1.0, 3.0, 5.0, 7.0]
+        
+        starts, stops = match_lab_windows(array("q", [12 * s]), series.timestamps, 10 * s, delay_ns=2 * s)
+        assert (starts[0], stops[0]) == (1, 3)
+    
+    def test_streaming_aligner_matches_batch(self):
+        """Test that chunked alignment gives the same rows as the batch one."""
+        s = 1_000_000_000
+        fast = generate_demo_dataset(n_samples=200, columnar=True, seed=3)
+        slow = TagSeries(
+            timestamps=array("q", fast.timestamps[::7]),
+            values=array("d", fast.values["AI-401"][::7]),
+            qc_flags=array("B", fast.qc_flags["AI-401"][::7]),
+        )
+        series = {"TI-101": series_from_dataset(fast)["TI-101"], "AI-401": slow}
+        grid = make_grid(fast.timestamps[0], fast.timestamps[-1] + 1, 150 * s)
+        
+        for method in ("last", "mean", "interpolate"):
+            expected = align_to_grid(series, grid, method, tolerances=600 * s)
+            aligner = StreamingAligner(list(series), 150 * s, start_ns=grid[0],
+                                       method=method, tolerances=600 * s)
+            rows = []
+            bounds = [*fast.timestamps[::30], fast.timestamps[-1] + 1]
+            for lo, hi in zip(bounds, bounds[1:]):
+                for tag_id, tag in series.items():
+                    a, b = bisect_left(tag.timestamps, lo), bisect_left(tag.timestamps, hi)
+                    aligner.push(tag_id, tag.timestamps[a:b], tag.values[a:b], tag.qc_flags[a:b])
+                rows.append(aligner.emit())
+            rows.append(aligner.emit(final=True))
+            
+            emitted = [r for r in rows if r is not None]
+            assert len(emitted) > 2  # rows are released before the end of the stream
+            assert [t for r in emitted for t in r.timestamps] == list(grid)
+            for tag_id in series:
+                values = array("d", [v for r in emitted for v in r.values[tag_id]])
+                assert values.tobytes() == expected.values[tag_id].tobytes()
+
+
+class TestDriftDetection:
+    """Tests for OOD/drift detection module."""
+    
+    TAGS = ["TI-101", "PI-201", "FI-301", "AI-401"]
+    
+    @classmethod
+    def correlated_dataset(cls, n: int, seed: int) -> ColumnarDataset:
+        """Two latent factors driving the four demo tags."""
+        rng = random.Random(seed)
+        u = [rng.gauss(0, 1) for _ in range(n)]
+        v = [rng.gauss(0, 1) for _ in range(n)]
+        columns = [
+            [350 + 5 * a + rng.gauss(0, 0.5) for a in u],
+            [15 + 0.5 * a + rng.gauss(0, 0.05) for a in u],
+            [1000 + 20 * b + rng.gauss(0, 2) for b in v],
+            [0.5 - 0.02 * b + rng.gauss(0, 0.002) for b in v],
+        ]
+        return ColumnarDataset(
+            timestamps=array("q", range(n)),
+            values={t: array("d", c) for t, c in zip(cls.TAGS, columns)},
+            qc_flags={t: array("B", bytes(n)) for t in cls.TAGS},
+            units={},
+        )
+    
+    def test_detector_flags_labeled_faults(self):
+        """Test T²/SPE/CUSUM on injected faults, streaming equal to batch."""
+        reference = self.correlated_dataset(2000, seed=1)
+        monitor = PcaMonitor.fit(reference, self.TAGS)
+        assert len(monitor.eigenvalues) == 2
+        
+        stats = RunningCovariance(4)
+        for i in range(reference.n_samples):
+            stats.update([reference.values[t][i] for t in self.TAGS])
+        assert all(math.isclose(a, b) for a, b in zip(stats.mean, monitor.mean))
+        
+        test = self.correlated_dataset(1000, seed=2)
+        labels = [300 <= i < 400 or 600 <= i < 700 for i in range(1000)]
+        for i in range(300, 400):
+            test.values["TI-101"][i] += 4.0  # breaks the TI-101/PI-201 correlation
+        for i in range(600, 700):
+            test.values["FI-301"][i] += 150.0  # far outside the reference spread
+            test.values["AI-401"][i] -= 0.15
+        for i in range(800, 1000):
+            # Sustained 1-sigma shift along the reference correlation: within T² limits
+            test.values["TI-101"][i] += 5.0
+            test.values["PI-201"][i] += 0.5
+        
+        detector = DriftDetector(monitor)
+        checks = detector.evaluate(test)
+        assert detection_scores([bool(o) for o in checks.ood], labels)["f1"] >= 0.80
+        assert any(checks.drift[800:]) and not any(checks.drift[:300])
+        
+        results = [
+            detector.update({t: test.values[t][i] for t in self.TAGS})
+            for i in range(test.n_samples)
+        ]
+        assert bytearray(r.ood for r in results) == checks.ood
+        assert bytearray(bool(r.drift) for r in results) == checks.drift
+        assert "PI-201" in results[-1].drift
+    
+    def test_soft_sensor_uses_detector(self, tmp_path: Path):
+        """Test detector-based OOD in predict/predict_batch and the model artifact."""
+        monitor = PcaMonitor.fit(self.correlated_dataset(1000, seed=3), self.TAGS)
+        dictionary = load_tag_dictionary()
+        ranges = ranges_from_dictionary(dictionary, {"TI-101": "TIC-201.PV"})
+        assert ranges["TI-101"] == (
+            dictionary["TIC-201.PV"].expected_min, dictionary["TIC-201.PV"].expected_max
+        )
+        
+        config = create_baseline_model()
+        config.detector = DriftDetector(monitor, {"TI-101": (0.0, 360.0)}).to_config()
+        path = save_model_config(config, tmp_path / "model.json")
+        sensor = SoftSensor(load_model_config(path))
+        assert sensor.model_hash == compute_model_hash(config) != SoftSensor().model_hash
+        
+        dataset = self.correlated_dataset(300, seed=4)
+        dataset.values["FI-301"][10] = 2000.0
+        batch = sensor.predict_batch(dataset)
+        rows = [
+            sensor.predict({t: dataset.values[t][i] for t in self.TAGS}, p.timestamp)
+            for i, p in enumerate(batch)
+        ]
+        assert [asdict(p) for p in rows] == [asdict(p) for p in batch]
+        assert batch[10].status == "OOD" and not sensor.last_check.drift
+        assert all(
+            p.status == "OOD" for p, x in zip(batch, dataset.values["TI-101"]) if x > 360.0
+        )
+
+
+class TestEvaluation:
+    """Tests for KPI evaluation module."""
+    
+    def test_kpi_thresholds(self):
+        """Test the acceptance CSV maps to computed metrics and checks."""
+        thresholds = {t.kpi_id: t for t in load_kpi_thresholds()}
+        criteria = {k: (t.key, t.op, t.value) for k, t in thresholds.items()}
+        assert criteria["KPI-01"] == ("mae", "<=", 5.0)
+        assert criteria["KPI-06"] == ("coverage_pct", ">=", 90.0)
+        assert thresholds["KPI-05"].key is None
+        
+        results = {r["kpi_id"]: r["status"] for r in check_kpis(
+            {"mae": 4.0, "mape_pct": 12.0, "f1": math.nan}, thresholds.values()
+        )}
+        assert results["KPI-01"] == "pass" and results["KPI-02"] == "fail"
+        assert results["KPI-03"] == results["KPI-05"] == "not_evaluated"
+    
+    def test_kpis_and_lab_rows_of_one_variable(self, tmp_path: Path):
+        """Test density/viscosity KPIs and other variables' lab rows stay out of a RON evaluation."""
+        thresholds = {t.kpi_id: t for t in load_kpi_thresholds()}
+        assert (thresholds["KPI-01"].variable, thresholds["KPI-02"].variable) == ("DENSITY", "VISCOSITY")
+        metrics = {"mae": 4.0, "mape_pct": 12.0}
+        results = {r["kpi_id"]: r["status"] for r in check_kpis(metrics, thresholds.values(), "RON")}
+        assert results["KPI-01"] == results["KPI-02"] == "not_evaluated"
+        results = {r["kpi_id"]: r["status"] for r in check_kpis(metrics, thresholds.values(), "LAB.DENSITY_15C")}
+        assert (results["KPI-01"], results["KPI-02"]) == ("pass", "not_evaluated")
+        
+        predictions = SoftSensor().predict_batch(generate_demo_dataset(20, columnar=True, seed=4))
+        labs = [
+            {"sample_id": f"S{i}", "ts_sampled": ns_to_iso(predictions.timestamps[i]), "quality_variable": variable,
+             "value": 90.0, "unit": "-", "method": "lab"}
+            for i, variable in ((5, "RON"), (6, "DENSITY"), (10, "RON"))
+        ]
+        path = tmp_path / "labs.json"
+        path.write_text(json.dumps(labs))
+        evaluator = Evaluator(iter_lab_results(path), variable_id="RON")
+        evaluator.update(predictions)
+        evaluator.finish()
+        metrics = evaluator.total.metrics()
+        assert metrics["n_pairs"] + metrics["n_unpaired"] == 2
+        
+        path.write_text(json.dumps({"results": labs}))
+        with pytest.raises(ValueError, match="labs.json"):
+            list(iter_lab_results(path))
+    
+    def test_streaming_evaluation_matches_direct(self):
+        """Test chunked, bucketed and merged evaluation against direct statistics."""
+        dataset = generate_demo_dataset(600, columnar=True, seed=4)
+        predictions = SoftSensor().predict_batch(dataset)
+        labs = list(zip(dataset.quality_timestamps[::5], dataset.quality[::5]))
+        labels = [i % 7 == 0 for i in range(len(predictions))]
+        hour = 3600 * 10**9
+        
+        # One-sample windows: each lab result pairs with the prediction at its time
+        rows = {t: i for i, t in enumerate(predictions.timestamps)}
+        pairs = [(v, predictions[rows[t]]) for t, v in labs]
+        residuals = [v - p.y_hat for v, p in pairs if not math.isnan(p.y_hat)]
+        
+        evaluator = Evaluator(iter(labs), bucket_ns=hour)
+        for start in range(0, len(predictions), 64):
+            evaluator.update(predictions[start:start + 64], labels[start:start + 64])
+        evaluator.finish()
+        metrics = evaluator.total.metrics()
+        
+        assert metrics["n_pairs"] == len(residuals)
+        assert metrics["n_unpaired"] == len(pairs) - len(residuals)
+        assert metrics["mae"] == pytest.approx(sum(map(abs, residuals)) / len(residuals))
+        assert metrics["rmse"] == pytest.approx(math.sqrt(sum(r * r for r in residuals) / len(residuals)))
+        assert metrics["std"] == pytest.approx(statistics.stdev(residuals))
+        covered = sum(p.uncertainty_lower <= v <= p.uncertainty_upper for v, p in pairs)
+        assert metrics["coverage_pct"] == pytest.approx(100 * covered / metrics["n_pairs"])
+        ood = [p.status == "OOD" for p in predictions]
+        assert metrics["f1"] == pytest.approx(detection_scores(ood, labels)["f1"])
+        
+        # Buckets add up to the totals; halves evaluated apart merge to the whole
+        report = evaluator.report(load_kpi_thresholds())
+        assert len(report["buckets"]) == 10
+        assert sum(b["n_pairs"] for b in report["buckets"]) == metrics["n_pairs"]
+        cut = 300
+        first = Evaluator([x for x in labs if x[0] <= predictions.timestamps[cut - 1]], bucket_ns=hour)
+        second = Evaluator([x for x in labs if x[0] > predictions.timestamps[cut - 1]], bucket_ns=hour)
+        first.update(predictions[:cut], labels[:cut])
+        second.update(predictions[cut:], labels[cut:])
+        first.finish()
+        second.finish()
+        first.merge(second)
+        for key, value in first.total.metrics().items():
+            assert value == pytest.approx(metrics[key], nan_ok=True)
+        for merged, whole in zip(first.report()["buckets"], report["buckets"], strict=True):
+            assert merged.pop("start") == whole.pop("start")
+            assert merged == pytest.approx(whole, nan_ok=True)
 
 
 def test_end_to_end():